@@ -5,6 +5,9 @@ import numpy as np
 import signac
 import unyt as u
 
+from src.utils.bulk_init import get_statepoint_product
+from src.utils.bulk_init import init_jobs_in_bulk
+
 # *******************************************
 # the main user varying state points (start)
 # *******************************************
@@ -30,18 +33,22 @@ pr = signac.get_project(pr_root)
 
 # ignore statepoints that are not being tested (gemc only for methane, pentane)
 # filter the list of dictionaries
-total_statepoints = list()
-
-for prod_temp_i in production_temperatures:
-    for replica_i in replicas:
-        statepoint = {
-            "production_temperature_K": np.round(prod_temp_i.to_value("K"), ).item(),
-            "replica_number_int": replica_i,
-        }
-
-        total_statepoints.append(statepoint)
-
-for sp in total_statepoints:
-    pr.open_job(
-        statepoint=sp,
-    ).init()
+total_statepoints = get_statepoint_product(
+    {
+        "production_temperature_K": [
+            np.round(
+                prod_temp_i.to_value("K"),
+            ).item()
+            for prod_temp_i in production_temperatures
+        ],
+        "replica_number_int": replicas,
+    }
+)
+
+number_of_new_jobs, number_of_existing_jobs = init_jobs_in_bulk(
+    pr, total_statepoints
+)
+print(
+    f"initialized jobs = {number_of_new_jobs}, existing jobs = "
+    f"{number_of_existing_jobs}"
+)
@@ -2,22 +2,43 @@
 # project.py
 
 import os
+import shlex
 import subprocess
+import sys
 
 import flow
 
-import mbuild as mb
-import mosdef_gomc.formats.gmso_charmm_writer as mf_charmm
-import mosdef_gomc.formats.gmso_gomc_conf_writer as gomc_control
 import numpy as np
 import signac
-import unyt as u
-import pandas as pd
 import math
-from scipy import stats
+
 from flow import FlowProject, aggregator
 from flow.environment import DefaultSlurmEnvironment
 
+from src.utils.blk_statistics import get_blk_equilibrated_statistics
+from src.utils.console_output import gomc_console_output_completed
+from src.utils.convergence_controller import convergence_record_filename
+from src.utils.convergence_controller import gomc_run_converged
+from src.utils.label_cache import LabelCache
+from src.utils.label_prefetch import LabelPrefetch
+from src.utils.live_analysis import live_analysis_snapshot_current
+from src.utils.live_analysis import update_live_analysis_snapshot
+from src.utils.output_manifest import output_files_written
+from src.utils.output_manifest import output_manifest_has_files
+from src.utils.output_manifest import write_output_manifest
+from src.utils.process_pool import get_process_pool_size
+from src.utils.process_pool import map_in_process_pool
+from src.utils.readiness_index import ProjectReadinessIndex
+
+# the heavy scientific packages (mbuild, mosdef_gomc, unyt, pandas, and scipy)
+# are imported in the operations that use them, so the label only commands
+# (i.e., status and submit --pretend) start fast
+
+
+# the label results, which are evaluated for all the jobs on a thread pool
+# for the status and submit when label_prefetch_threads_int > 0
+label_prefetch = LabelPrefetch()
+
 
 class Project(FlowProject):
     """Subclass of FlowProject to provide custom methods and attributes."""
@@ -25,6 +46,39 @@ class Project(FlowProject):
     def __init__(self):
         super().__init__()
 
+    @classmethod
+    def label(cls, label_name_or_func=None):
+        """Designate a function as a label function, which uses the prefetched
+        results if available.
+        """
+        if callable(label_name_or_func):
+            return super().label(label_prefetch.memoized(label_name_or_func))
+
+        def label_func(func):
+            return super(Project, cls).label(label_name_or_func)(
+                label_prefetch.memoized(func)
+            )
+
+        return label_func
+
+    def print_status(self, jobs=None, *args, **kwargs):
+        """Print the status, with the labels prefetched on
+        label_prefetch_threads_int threads.
+        """
+        with label_prefetch.prefetch(
+            self, jobs, max_workers=label_prefetch_threads_int
+        ):
+            return super().print_status(jobs, *args, **kwargs)
+
+    def submit(self, bundle_size=1, jobs=None, *args, **kwargs):
+        """Submit the operations, with the labels prefetched on
+        label_prefetch_threads_int threads.
+        """
+        with label_prefetch.prefetch(
+            self, jobs, max_workers=label_prefetch_threads_int
+        ):
+            return super().submit(bundle_size, jobs, *args, **kwargs)
+
 
 class Grid(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     """Subclass of DefaultSlurmEnvironment for WSU's Grid cluster."""
@@ -33,6 +87,12 @@ class Grid(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     template = "grid.sh"
 
 
+# the label results are cached in each job's "label_cache.json" file, and are
+# only recomputed when the (path, size, mtime) of the files the label reads
+# change.
+label_cache = LabelCache()
+
+
 
 # ******************************************************
 # users typical variables, but not all (start)
@@ -97,6 +157,84 @@ walltime_gomc_production_hr = 368
 walltime_gomc_analysis_hr = 4
 memory_needed = 16
 
+# the number of threads used to evaluate the labels for all the jobs in parallel
+# for the status and submit, which is useful on networked file systems (i.e.,
+# Lustre).  Set to 0 to evaluate the labels serially (signac-flow's default).
+# Note: 'python project.py run' always evaluates the labels serially.
+label_prefetch_threads_int = 0
+
+# the number of processes used to calculate the individual simulation averages
+# (part_5a).  If 1, each job is analyzed in its own part_5a operation
+# (signac-flow's default).  If > 1, or -1 for all the cores available to the
+# process (i.e., the Slurm allocation), the jobs of each
+# statepoint_without_replica group (i.e., the replicas) are analyzed in a single
+# part_5a operation, with the per-job calculations spread over a process pool,
+# and the files are written after all the calculations finish.  Only the group's
+# jobs with completed production runs, which are not analyzed yet, are analyzed,
+# so an unfinished job does not hold back the group's other jobs, and a new
+# replica does not re-analyze the group's analyzed jobs.
+part_5a_processes_int = 1
+
+# the step window (the first and last steps) of the Blk file blocks used in the
+# individual simulation averages (part_5a).  The window can be set for a single
+# job with the job document's "part_5a_step_start_int" and
+# "part_5a_step_finish_int" values.  If the window is moved, part_5a is run
+# again, which uses the Blk files' cache (the text is not re-read).
+part_5a_step_start_int = 0 * 10**6
+part_5a_step_finish_int = 1 * 10**12
+
+# detect the start of each box's and property's equilibrated (production) data
+# in the part_5a step window, and subsample the blocks every statistical
+# inefficiency (g) blocks, so the individual simulation averages are over the
+# equilibrated and uncorrelated blocks, and are written with their standard
+# error (sem) and number of uncorrelated blocks (Neff).  The start of the
+# equilibrated data (t0_step) is recorded in the job document's
+# "part_5a_equilibration".  If False, all the blocks in the step window are
+# averaged.
+part_5a_detect_equilibration_bool = True
+
+# the live analysis of the running production simulations
+# (part_3c_live_analysis_of_production_run), which reads only the data appended
+# to the Blk files since the last snapshot, and writes the running (Welford)
+# averages to each job's "live_analysis_snapshot.json" file.  Set to True to run
+# it while the production simulations are running (i.e., 'python project.py run
+# -o part_3c_live_analysis_of_production_run').
+live_analysis_of_production_run_bool = False
+
+# the convergence controller of the production runs
+# (src/utils/convergence_controller.py), which runs GOMC and stops it when the
+# standard error (sem) of the liquid and vapor box densities (TOT_DENS),
+# relative to their means, is at or below the target sem, with at least the
+# minimum number of uncorrelated blocks (Neff) and equilibrated fraction of the
+# blocks (after the detected start of the equilibrated data), so the quickly
+# converging statepoints do not run all the gomc_steps_production steps.  The
+# sem is checked every check interval, after the start of the equilibrated data
+# is detected.  The stopped runs are completed, as recorded in their
+# "convergence_gomc_production_run.json" file.  If False, the production runs
+# run all their steps.
+production_run_convergence_controller_bool = False
+production_run_target_relative_sem_density = 0.002
+production_run_convergence_minimum_neff = 50
+production_run_convergence_minimum_equilibrated_fraction = 0.8
+production_run_convergence_check_interval_s = 600
+
+# the stationarity controller of the equilibration runs
+# (src/utils/convergence_controller.py), which runs GOMC and stops it when the
+# liquid and vapor box densities and energies (TOT_DENS and TOT_EN) have been
+# stationary (after the detected start of their equilibrated data) for the
+# stationary window steps, so the quickly equilibrating statepoints start their
+# production runs without running all the gomc_steps_equilb_design_ensemble
+# steps.  Only the stationary steps are checked (there is no target sem).  GOMC
+# is only stopped after the restart files, which the production runs start from,
+# are written again (every RestartFreq steps, which can be less often than the
+# Blk file rows) after the run is stationary, and are completely written.  The
+# stopped runs are completed, as recorded in their
+# "convergence_gomc_equilb_design_ensemble.json" file.  If False, the
+# equilibration runs run all their steps.
+equilb_run_stationarity_controller_bool = False
+equilb_run_stationary_window_steps = 10 * 10**6
+equilb_run_stationarity_check_interval_s = 600
+
 # ******************************************************
 # users typical variables, but not all (end)
 # ******************************************************
@@ -141,6 +279,10 @@ def part_1a_initial_data_input_to_json(job):
 @flow.with_job
 def initial_parameters(job):
     """Set the initial job parameters into the jobs doc json file."""
+    # the parameters are set in memory and written to the job document in one
+    # write, so the job document is only created if all the parameters are set
+    initial_doc = {}
+
     # select
 
     # set free energy data in doc
@@ -172,20 +314,20 @@ def initial_parameters(job):
         20: 20,
     }
 
-    job.doc.replica_number_int = replica_no_to_seed_dict.get(
+    initial_doc["replica_number_int"] = replica_no_to_seed_dict.get(
         int(job.sp.replica_number_int)
     )
 
     # gomc core and CPU or GPU
-    job.doc.gomc_ncpu = 1  # 1 is optimal
-    job.doc.gomc_ngpu = 0
+    initial_doc["gomc_ncpu"] = 1  # 1 is optimal
+    initial_doc["gomc_ngpu"] = 0
 
     # get the gomc binary paths
-    if job.doc.gomc_ngpu == 0:
-        job.doc.gomc_cpu_or_gpu = "CPU"
+    if initial_doc["gomc_ngpu"] == 0:
+        initial_doc["gomc_cpu_or_gpu"] = "CPU"
 
-    elif job.doc.gomc_ngpu == 1:
-        job.doc.gomc_cpu_or_gpu = "GPU"
+    elif initial_doc["gomc_ngpu"] == 1:
+        initial_doc["gomc_cpu_or_gpu"] = "GPU"
 
     else:
         raise ValueError(
@@ -194,8 +336,14 @@ def initial_parameters(job):
         )
 
     # only for GEMC-NVT
-    job.doc.gomc_equilb_design_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_GEMC"
-    job.doc.gomc_production_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_GEMC"
+    initial_doc["gomc_equilb_design_ensemble_gomc_binary_file"] = (
+        f"GOMC_{initial_doc['gomc_cpu_or_gpu']}_GEMC"
+    )
+    initial_doc["gomc_production_ensemble_gomc_binary_file"] = (
+        f"GOMC_{initial_doc['gomc_cpu_or_gpu']}_GEMC"
+    )
+
+    job.doc.update(initial_doc)
 
 
 # ******************************************************
@@ -238,19 +386,16 @@ def statepoint_without_temperature(job):
 @flow.with_job
 def mosdef_input_written(job):
     """Check that the mosdef files (psf, pdb, and force field (FF) files) are written ."""
-    file_written_bool = False
-    if (
-        job.isfile(f"{gomc_ff_filename_str}.inp")
-        and job.isfile(
-            f"{mosdef_structure_box_0_name_str}.psf"
-        )
-        and job.isfile(
-            f"{mosdef_structure_box_0_name_str}.pdb"
-        )
-    ):
-        file_written_bool = True
-
-    return file_written_bool
+    # the files recorded in the output manifest are only checked for their
+    # recorded sizes, not read
+    return output_files_written(
+        job,
+        [
+            f"{gomc_ff_filename_str}.inp",
+            f"{mosdef_structure_box_0_name_str}.psf",
+            f"{mosdef_structure_box_0_name_str}.pdb",
+        ],
+    )
 
 
 # ******************************************************
@@ -267,6 +412,21 @@ def mosdef_input_written(job):
 # function for checking if the GOMC control file is written
 def gomc_control_file_written(job, control_filename_str):
     """General check that the gomc control files are written."""
+    # the control files recorded in the output manifest (with their recorded
+    # sizes) were completely written by the build_psf_pdb_ff_gomc_conf operation
+    if output_manifest_has_files(job, [f"{control_filename_str}.conf"]):
+        return True
+
+    return gomc_control_file_has_output_name(job, control_filename_str)
+
+
+@label_cache.cached(
+    lambda job, control_filename_str: [f"{control_filename_str}.conf"]
+)
+def gomc_control_file_has_output_name(job, control_filename_str):
+    """Check that the gomc control file is written, with its 'OutputName'
+    line.
+    """
     file_written_bool = False
     control_file = f"{control_filename_str}.conf"
 
@@ -343,29 +503,24 @@ def part_3b_output_gomc_production_run_started(job):
 # ******************************************************
 # ******************************************************
 # function for checking if GOMC simulations are completed properly
+@label_cache.cached(
+    lambda job, control_filename_str: [
+        f"out_{control_filename_str}.dat",
+        convergence_record_filename(control_filename_str),
+    ]
+)
 def gomc_sim_completed_properly(job, control_filename_str):
-    """General check to see if the gomc simulation was completed properly."""
-    job_run_properly_bool = False
+    """General check to see if the gomc simulation was completed properly,
+    or was stopped by the convergence controller when it converged."""
     output_log_file = "out_{}.dat".format(control_filename_str)
-    if job.isfile(output_log_file):
-        # with open(f"workspace/{job.id}/{output_log_file}", "r") as fp:
-        #print(f"job.id = {job.id}")
-        with open(job.fn(output_log_file), "r") as fp:
-            out_gomc = fp.readlines()
-            for i, line in enumerate(out_gomc):
-                if "Move" in line:
-                    split_move_line = line.split()
-                    if (
-                        split_move_line[0] == "Move"
-                        and split_move_line[1] == "Type"
-                        and split_move_line[2] == "Mol."
-                        and split_move_line[3] == "Kind"
-                    ):
-                        job_run_properly_bool = True
-    else:
-        job_run_properly_bool = False
 
-    return job_run_properly_bool
+    # only the end of the GOMC console file is read to find the 'Move Type Mol.
+    # Kind' footer
+    return gomc_console_output_completed(
+        job.fn(output_log_file)
+    ) or gomc_run_converged(
+        job.fn(convergence_record_filename(control_filename_str))
+    )
 
 # check if equilb selected ensemble GOMC run completed by checking the end of the GOMC consol file
 @Project.label
@@ -383,24 +538,97 @@ def part_4b_job_production_run_completed_properly(job):
 
 
 
+def get_part_5a_step_window(job):
+    """Get the job's part_5a step window, which is the project's window unless
+    set in the job document.
+    """
+    return [
+        int(job.doc.get("part_5a_step_start_int", part_5a_step_start_int)),
+        int(job.doc.get("part_5a_step_finish_int", part_5a_step_finish_int)),
+    ]
+
+
 # check if analysis is done for the individual replicates wrote the gomc files
 @Project.pre(part_4b_job_production_run_completed_properly)
 @Project.label
 @flow.with_job
 def part_5a_analysis_individual_simulation_averages_completed(job):
-    """Check that the individual simulation averages files are written ."""
-    file_written_bool = False
-    if (
-        job.isfile(
-            f"{output_replicate_txt_file_name_liq}"
-        )
-        and job.isfile(
-            f"{output_replicate_txt_file_name_vap}"
-        )
+    """Check that the individual simulation averages files are written, for the
+    current step window.
+    """
+    # the files recorded in the output manifest are only checked for their
+    # recorded sizes, not read
+    if not output_files_written(
+        job,
+        [
+            output_replicate_txt_file_name_liq,
+            output_replicate_txt_file_name_vap,
+        ],
     ):
-        file_written_bool = True
+        return False
+
+    # the jobs analyzed before the step window (or the equilibration detection)
+    # was recorded are taken as completed
+    analyzed_step_window = job.doc.get("part_5a_analyzed_step_window")
+    if analyzed_step_window is not None and list(
+        analyzed_step_window
+    ) != get_part_5a_step_window(job):
+        return False
+
+    analyzed_detect_equilibration = job.doc.get(
+        "part_5a_analyzed_detect_equilibration"
+    )
 
-    return file_written_bool
+    return (
+        analyzed_detect_equilibration is None
+        or analyzed_detect_equilibration == part_5a_detect_equilibration_bool
+    )
+
+
+# index of the jobs without the individual simulation averages written, so the
+# project wide precondition of the replicate averages does not check every job
+# for every aggregate
+part_5a_readiness_index = ProjectReadinessIndex(
+    part_5a_analysis_individual_simulation_averages_completed
+)
+
+
+# check if the individual simulation averages are written for all the jobs in
+# the project
+def part_5a_analysis_all_project_jobs_completed(*jobs):
+    """Check that the individual simulation averages files are written for all
+    the jobs in the project.
+    """
+    return part_5a_readiness_index.all_ready(*jobs)
+
+
+def part_5a_analysis_individual_simulation_averages_completed_for_jobs(*jobs):
+    """Check that the individual simulation averages files are written for all
+    the jobs in the aggregate.
+    """
+    return all(
+        part_5a_analysis_individual_simulation_averages_completed(job)
+        for job in jobs
+    )
+
+
+def get_part_5a_jobs_to_analyze(*jobs):
+    """Get the aggregate's jobs with completed production runs, whose individual
+    simulation averages are not written.
+    """
+    return [
+        job
+        for job in jobs
+        if part_4b_job_production_run_completed_properly(job)
+        and not part_5a_analysis_individual_simulation_averages_completed(job)
+    ]
+
+
+def part_5a_analysis_individual_simulation_averages_ready_for_jobs(*jobs):
+    """Check that any job in the aggregate is ready for its individual
+    simulation averages.
+    """
+    return len(get_part_5a_jobs_to_analyze(*jobs)) > 0
 
 
 # check if analysis for averages of all the replicates is completed
@@ -505,6 +733,9 @@ def part_5d_analysis_critical_and_boiling_points_avg_std_data_completed(*jobs):
 # build system
 def build_charmm(job, write_files=True):
     """Build the Charmm object and potentially write the pdb, psd, and force field (FF) files."""
+    import mbuild as mb
+    import mosdef_gomc.formats.gmso_charmm_writer as mf_charmm
+
     print("#**********************")
     print("Started: GOMC Charmm Object")
     print("#**********************")
@@ -735,6 +966,9 @@ def build_charmm(job, write_files=True):
 @flow.with_job
 def build_psf_pdb_ff_gomc_conf(job):
     """Build the Charmm object and write the pdb, psd, and force field (FF) files for all the simulations in the workspace."""
+    import mosdef_gomc.formats.gmso_gomc_conf_writer as gomc_control
+    import unyt as u
+
     gomc_charmm_object_with_files = build_charmm(job, write_files=True)
 
     # ******************************************************
@@ -989,6 +1223,22 @@ def build_psf_pdb_ff_gomc_conf(job):
     # ******************************************************
 
 
+    # record the written files in the output manifest, which the labels read
+    write_output_manifest(
+        job,
+        "build_psf_pdb_ff_gomc_conf",
+        [
+            f"{gomc_ff_filename_str}.inp",
+            f"{mosdef_structure_box_0_name_str}.psf",
+            f"{mosdef_structure_box_0_name_str}.pdb",
+            f"{mosdef_structure_box_1_name_str}.psf",
+            f"{mosdef_structure_box_1_name_str}.pdb",
+            f"{gomc_equilb_design_ensemble_control_file_name_str}.conf",
+            f"{gomc_production_control_file_name_str}.conf",
+        ],
+    )
+
+
 # ******************************************************
 # ******************************************************
 # Creating GOMC files (pdb, psf, force field (FF), and gomc control files (end)
@@ -1001,6 +1251,48 @@ def build_psf_pdb_ff_gomc_conf(job):
 # equilb NPT or GEMC-NVT - starting the GOMC simulation (start)
 # ******************************************************
 # ******************************************************
+def get_convergence_controller_command(
+    gomc_command,
+    control_file_name_str,
+    targets,
+    minimum_neff,
+    minimum_equilibrated_fraction,
+    minimum_stationary_steps,
+    check_interval_s,
+    restart_filenames=None,
+):
+    """Get the command running the GOMC command with the convergence controller.
+
+    The targets are the (file name, column name, target sem, target sem type) of
+    each followed file's target column, and the other arguments are the
+    convergence criteria (see src/utils/convergence_controller.py).  If the
+    restart file names are given (the restart files the next simulation starts
+    from), GOMC is only stopped after they are written again after the targets
+    converged.
+    """
+    target_arguments = " ".join(
+        f"--target {filename} {shlex.quote(column_name)} {target_sem} "
+        f"{target_sem_type}"
+        for filename, column_name, target_sem, target_sem_type in targets
+    )
+    restart_arguments = " ".join(
+        f"--restart-file {restart_filename}"
+        for restart_filename in (restart_filenames or [])
+    )
+
+    return (
+        f"PYTHONPATH={shlex.quote(project_directory_path)}:$PYTHONPATH "
+        f"{shlex.quote(sys.executable)} -m src.utils.convergence_controller "
+        f"--record {convergence_record_filename(control_file_name_str)} "
+        f"{target_arguments} "
+        f"--minimum-neff {minimum_neff} "
+        f"--minimum-equilibrated-fraction {minimum_equilibrated_fraction} "
+        f"--minimum-stationary-steps {minimum_stationary_steps} "
+        f"--check-interval-s {check_interval_s} "
+        f"{restart_arguments} "
+        f"-- {gomc_command}"
+    )
+
 
 @Project.pre(mosdef_input_written)
 @Project.pre(part_2a_gomc_equilb_design_ensemble_control_file_written)
@@ -1021,11 +1313,41 @@ def run_equilb_ensemble_gomc_command(job):
     control_file_name_str = gomc_equilb_design_ensemble_control_file_name_str
 
     print(f"Running simulation job id {job}")
-    run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+    gomc_command = "{}/{} +p{} {}.conf".format(
         str(gomc_binary_path),
         str(job.doc.gomc_equilb_design_ensemble_gomc_binary_file),
         str(job.doc.gomc_ncpu),
         str(control_file_name_str),
+    )
+    if equilb_run_stationarity_controller_bool:
+        # the liquid (box 0) and vapor (box 1) densities and energies
+        gomc_command = get_convergence_controller_command(
+            gomc_command,
+            control_file_name_str,
+            [
+                (
+                    f"Blk_{control_file_name_str}_BOX_{box_i}.dat",
+                    column_name,
+                    float("inf"),
+                    "absolute",
+                )
+                for box_i in [0, 1]
+                for column_name in ["TOT_DENS", "TOT_EN"]
+            ],
+            minimum_neff=0,
+            minimum_equilibrated_fraction=0.0,
+            minimum_stationary_steps=equilb_run_stationary_window_steps,
+            check_interval_s=equilb_run_stationarity_check_interval_s,
+            # the production run starts from the equilibration run's restart
+            # files
+            restart_filenames=[
+                f"{control_file_name_str}_BOX_{box_i}_restart.{extension}"
+                for box_i in [0, 1]
+                for extension in ["pdb", "psf", "coor", "xsc"]
+            ],
+        )
+    run_command = "{} > out_{}.dat".format(
+        gomc_command,
         str(control_file_name_str),
     )
 
@@ -1068,11 +1390,33 @@ def run_production_run_gomc_command(job):
     control_file_name_str = gomc_production_control_file_name_str
 
     print(f"Running simulation job id {job}")
-    run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+    gomc_command = "{}/{} +p{} {}.conf".format(
         str(gomc_binary_path),
         str(job.doc.gomc_production_ensemble_gomc_binary_file),
         str(job.doc.gomc_ncpu),
         str(control_file_name_str),
+    )
+    if production_run_convergence_controller_bool:
+        # the liquid (box 0) and vapor (box 1) densities
+        gomc_command = get_convergence_controller_command(
+            gomc_command,
+            control_file_name_str,
+            [
+                (
+                    f"Blk_{control_file_name_str}_BOX_{box_i}.dat",
+                    "TOT_DENS",
+                    production_run_target_relative_sem_density,
+                    "relative",
+                )
+                for box_i in [0, 1]
+            ],
+            minimum_neff=production_run_convergence_minimum_neff,
+            minimum_equilibrated_fraction=production_run_convergence_minimum_equilibrated_fraction,
+            minimum_stationary_steps=0,
+            check_interval_s=production_run_convergence_check_interval_s,
+        )
+    run_command = "{} > out_{}.dat".format(
+        gomc_command,
         str(control_file_name_str),
     )
 
@@ -1088,349 +1432,525 @@ def run_production_run_gomc_command(job):
 
 # ******************************************************
 # ******************************************************
-# data analysis - get the average data from each replicate (start)
+# production run - live analysis of the running GOMC simulation (start)
 # ******************************************************
 # ******************************************************
+def get_live_analysis_filenames(job):
+    """Get the growing GOMC production run Blk files, which are followed in the
+    live analysis.
+    """
+    return [
+        f"Blk_{gomc_production_control_file_name_str}_BOX_{box_i}.dat"
+        for box_i in [0, 1]
+    ]
+
+
+def live_analysis_of_production_run_snapshot_current(job):
+    """Check that the live analysis snapshot has all the data written to the
+    production run files.
+    """
+    return live_analysis_snapshot_current(job, get_live_analysis_filenames(job))
 
 
+@Project.pre(lambda job: live_analysis_of_production_run_bool)
+@Project.pre(part_3b_output_gomc_production_run_started)
+@Project.pre(lambda job: not part_4b_job_production_run_completed_properly(job))
+@Project.post(live_analysis_of_production_run_snapshot_current)
 @Project.operation.with_directives(
-     {
-         "np": 1,
-         "ngpu": 0,
-         "memory": memory_needed,
-         "walltime": walltime_gomc_analysis_hr,
-     }
-)
-@FlowProject.pre(
-     lambda * jobs: all(
-         part_4b_job_production_run_completed_properly(job, gomc_production_control_file_name_str)
-         for job in jobs
-     )
+    {
+        "np": 1,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }
 )
-@Project.pre(part_4b_job_production_run_completed_properly)
-@Project.post(part_5a_analysis_individual_simulation_averages_completed)
 @flow.with_job
-def part_5a_analysis_individual_simulation_averages(*jobs):
-    # remove the total averged replicate data and all analysis data after this,
-    # as it is no longer valid when adding more simulations
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}')
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}')
-    if os.path.isfile(f'../../analysis/{output_critical_data_replicate_txt_file_name}'):
-        os.remove(f'../../analysis/{output_critical_data_replicate_txt_file_name}')
-    if os.path.isfile(f'../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}'):
-        os.remove(f'../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}')
-    if os.path.isfile(f'../../analysis/{output_boiling_data_replicate_txt_file_name}'):
-        os.remove(f'../../analysis/{output_boiling_data_replicate_txt_file_name}')
-    if os.path.isfile(f'../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}'):
-        os.remove(f'../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}')
-
-
-    # this is set to basically use all values.  However, allows the ability to set if needed
-    step_start = 0 * 10 ** 6
-    step_finish = 1 * 10 ** 12
-
-    # get the averages from each individual simulation and write the csv's.
-    for job in jobs:
+def part_3c_live_analysis_of_production_run(job):
+    """Write the running averages of the production run's growing Blk files to
+    the live analysis snapshot.
+    """
+    # only the data appended since the last snapshot is read, so this can be run
+    # repeatedly while the simulation is running to spot the drifting or
+    # non-converging jobs early
+    update_live_analysis_snapshot(job, get_live_analysis_filenames(job))
 
-        reading_file_box_0 = job.fn(f'Blk_{gomc_production_control_file_name_str}_BOX_0.dat')
-        reading_file_box_1 = job.fn(f'Blk_{gomc_production_control_file_name_str}_BOX_1.dat')
-
-        output_column_temp_title = 'temp_K'  # column title title for temp
-        output_column_no_step_title = 'Step'  # column title title for iter value
-        output_column_no_pressure_title = 'P_bar'  # column title title for PRESSURE
-        output_column_total_molecules_title = "No_mol"  # column title title for TOT_MOL
-        output_column_Rho_title = 'Rho_kg_per_m_cubed'  # column title title for TOT_DENS
-        output_column_box_volume_title = 'V_ang_cubed'  # column title title for VOLUME
-        output_column_box_length_if_cubed_title = 'L_m_if_cubed'  # column title title for VOLUME
-        output_column_box_Hv_title = 'Hv_kJ_per_mol'  # column title title for HEAT_VAP
-        output_column_box_Z_title = 'Z'  # column title title for  compressiblity (Z)
-
-        # custom section
-        output_column_box_molfract_ICT_title = 'mol_fract_ICT'  # column title for liq molfract_ICT
-        output_column_box_molfract_IOT_title = 'mol_fract_IOT'  # column title for liq  molfract_IOT
-        output_column_box_molfract_NDO_title = 'mol_fract_NDO'  # column title for liq  molfract_NDO
-        output_column_box_molfract_NDE_title = 'mol_fract_NDE'  # column title for liq  molfract_NDE
-
-        blk_file_reading_column_no_step_title = '#STEP'  # column title title for iter value
-        blk_file_reading_column_no_pressure_title = 'PRESSURE'  # column title title for PRESSURE
-        blk_file_reading_column_total_molecules_title = "TOT_MOL"  # column title title for TOT_MOL
-        blk_file_reading_column_Rho_title = 'TOT_DENS'  # column title title for TOT_DENS
-        blk_file_reading_column_box_volume_title = 'VOLUME'  # column title title for VOLUME
-        blk_file_reading_column_box_Hv_title = 'HEAT_VAP'  # column title title for HEAT_VAP
-        blk_file_reading_column_box_Z_title = 'COMPRESSIBILITY'  # column title title for compressiblity (Z)
-
-        blk_file_reading_column_box_x_liq_molfract_NDO_title = 'MOLFRACT_ICT'  # column title for compressiblity (Z)
-
-        blk_file_reading_column_box_molfract_ICT_title = 'MOLFRACT_ICT'  # column title for liq molfract_ICT
-        blk_file_reading_column_box_molfract_IOT_title = 'MOLFRACT_IOT'  # column title for liq  molfract_IOT
-        blk_file_reading_column_box_molfract_NDO_title = 'MOLFRACT_NDO'  # column title for liq  molfract_NDO
-        blk_file_reading_column_box_molfract_NDE_title = 'MOLFRACT_NDE'  # column title for liq  molfract_NDE
-
-        # Programmed data
-        step_start_string = str(int(step_start))
-        step_finish_string = str(int(step_finish))
 
-        # *************************
-        # drawing in data from single file and extracting specific rows for the liquid box (start)
-        # *************************
-        data_box_0 = pd.read_csv(reading_file_box_0, sep='\s+', header=0, na_values='NaN', index_col=False)
+# ******************************************************
+# ******************************************************
+# production run - live analysis of the running GOMC simulation (end)
+# ******************************************************
+# ******************************************************
 
-        data_box_0 = pd.DataFrame(data_box_0)
-        step_no_title_mod = blk_file_reading_column_no_step_title[1:]
-        header_list = list(data_box_0.columns)
-        header_list[0] = step_no_title_mod
-        data_box_0.columns = header_list
 
-        data_box_0 = data_box_0.query(step_start_string + ' <= ' + step_no_title_mod + ' <= ' + step_finish_string)
+# ******************************************************
+# ******************************************************
+# data analysis - get the average data from each replicate (start)
+# ******************************************************
+# ******************************************************
 
-        iter_no_box_0 = data_box_0.loc[:, step_no_title_mod]
-        iter_no_box_0 = list(iter_no_box_0)
-        iter_no_box_0 = np.transpose(iter_no_box_0)
 
-        pressure_box_0 = data_box_0.loc[:, blk_file_reading_column_no_pressure_title]
-        pressure_box_0 = list(pressure_box_0)
-        pressure_box_0 = np.transpose(pressure_box_0)
-        pressure_box_0_mean = np.nanmean(pressure_box_0)
+def get_individual_simulation_averages(
+    reading_file_box_0,
+    reading_file_box_1,
+    step_start,
+    step_finish,
+    detect_equilibration,
+):
+    """Get the liquid and vapor box averages from a simulation's Blk files.
+
+    The averages only depend on the Blk files, so this is a module level
+    function with plain arguments, which can be run on a process pool
+    (part_5a_processes_int).
+
+    Parameters
+    ----------
+    reading_file_box_0 : str
+        The box 0 Blk file name, including the path.
+    reading_file_box_1 : str
+        The box 1 Blk file name, including the path.
+    step_start : int
+        The first step used in the averages.
+    step_finish : int
+        The last step used in the averages.
+    detect_equilibration : bool
+        Average each property's equilibrated and uncorrelated blocks
+        (part_5a_detect_equilibration_bool), or all the blocks in the step
+        window.
+
+    Returns
+    -------
+    dict
+        The liquid and vapor box averages ('_mean'), with their standard errors
+        ('_sem') and numbers of uncorrelated blocks ('_Neff'), and the
+        'equilibration' of each box's properties, {box: {column: {'t0_step',
+        'g', 'Neff'}}}.
+    """
+    blk_file_reading_column_no_pressure_title = (
+        "PRESSURE"  # column title title for PRESSURE
+    )
+    blk_file_reading_column_total_molecules_title = (
+        "TOT_MOL"  # column title title for TOT_MOL
+    )
+    blk_file_reading_column_Rho_title = (
+        "TOT_DENS"  # column title title for TOT_DENS
+    )
+    blk_file_reading_column_box_volume_title = (
+        "VOLUME"  # column title title for VOLUME
+    )
+    blk_file_reading_column_box_Hv_title = (
+        "HEAT_VAP"  # column title title for HEAT_VAP
+    )
+    blk_file_reading_column_box_Z_title = (
+        "COMPRESSIBILITY"  # column title title for compressiblity (Z)
+    )
 
-        total_molecules_box_0 = data_box_0.loc[:, blk_file_reading_column_total_molecules_title]
-        total_molecules_box_0 = list(total_molecules_box_0)
-        total_molecules_box_0 = np.transpose(total_molecules_box_0)
-        total_molecules_box_0_mean = np.nanmean(total_molecules_box_0)
+    blk_file_reading_column_box_molfract_ICT_title = (
+        "MOLFRACT_ICT"  # column title for liq molfract_ICT
+    )
+    blk_file_reading_column_box_molfract_IOT_title = (
+        "MOLFRACT_IOT"  # column title for liq  molfract_IOT
+    )
+    blk_file_reading_column_box_molfract_NDO_title = (
+        "MOLFRACT_NDO"  # column title for liq  molfract_NDO
+    )
+    blk_file_reading_column_box_molfract_NDE_title = (
+        "MOLFRACT_NDE"  # column title for liq  molfract_NDE
+    )
 
-        Rho_box_0 = data_box_0.loc[:, blk_file_reading_column_Rho_title]
-        Rho_box_0 = list(Rho_box_0)
-        Rho_box_0 = np.transpose(Rho_box_0)
-        Rho_box_0_mean = np.nanmean(Rho_box_0)
+    blk_file_statistics_column_titles = [
+        blk_file_reading_column_no_pressure_title,
+        blk_file_reading_column_total_molecules_title,
+        blk_file_reading_column_Rho_title,
+        blk_file_reading_column_box_volume_title,
+        blk_file_reading_column_box_Hv_title,
+        blk_file_reading_column_box_Z_title,
+        blk_file_reading_column_box_molfract_ICT_title,
+        blk_file_reading_column_box_molfract_IOT_title,
+        blk_file_reading_column_box_molfract_NDO_title,
+        blk_file_reading_column_box_molfract_NDE_title,
+    ]
 
-        volume_box_0 = data_box_0.loc[:, blk_file_reading_column_box_volume_title]
-        volume_box_0 = list(volume_box_0)
-        volume_box_0 = np.transpose(volume_box_0)
-        volume_box_0_mean = np.nanmean(volume_box_0)
-        length_if_cube_box_0_mean = (volume_box_0_mean) ** (1 / 3)
+    # *************************
+    # calculating the statistics of all the columns for box 0 and box 1 (start)
+    # *************************
+    # the statistics (count, mean, std, sem, min, and max) of all the columns
+    # are calculated in one vectorized pass over each Blk file, which is
+    # memory-mapped from its binary cache, for each column's equilibrated and
+    # uncorrelated blocks (t0_step, g, and Neff)
+    box_statistics = np.stack(
+        [
+            get_blk_equilibrated_statistics(
+                reading_file_box_i,
+                blk_file_statistics_column_titles,
+                step_start,
+                step_finish,
+                detect_equilibration=detect_equilibration,
+            )
+            for reading_file_box_i in [reading_file_box_0, reading_file_box_1]
+        ]
+    )
 
-        Hv_box_0 = data_box_0.loc[:, blk_file_reading_column_box_Hv_title]
-        Hv_box_0 = list(Hv_box_0)
-        Hv_box_0 = np.transpose(Hv_box_0)
-        Hv_box_0_mean = np.nanmean(Hv_box_0)
+    # sort boxes based on density to liquid or vapor (box 0 is the liquid box
+    # if the densities are equal)
+    if (
+        box_statistics[0][blk_file_reading_column_Rho_title]["mean"]
+        < box_statistics[1][blk_file_reading_column_Rho_title]["mean"]
+    ):
+        box_statistics = box_statistics[::-1]
+    box_liq_statistics, box_vap_statistics = box_statistics
 
-        Z_box_0 = data_box_0.loc[:, blk_file_reading_column_box_Z_title]
-        Z_box_0 = list(Z_box_0)
-        Z_box_0 = np.transpose(Z_box_0)
-        Z_box_0_mean = np.nanmean(Z_box_0)
+    # *************************
+    # calculating the statistics of all the columns for box 0 and box 1 (end)
+    # *************************
 
-        # box 0 mol fractions (custom to system)
-        molfract_ICT_box_0 = np.transpose(list(data_box_0.loc[:, blk_file_reading_column_box_molfract_ICT_title]))
-        molfract_ICT_box_0_mean = np.nanmean(molfract_ICT_box_0)
+    # the job averages' names for each column
+    job_averages_column_names = {
+        blk_file_reading_column_no_pressure_title: "pressure_box_{box_name}",
+        blk_file_reading_column_total_molecules_title: "total_molecules_box_{box_name}",
+        blk_file_reading_column_Rho_title: "Rho_box_{box_name}",
+        blk_file_reading_column_box_volume_title: "volume_box_{box_name}",
+        blk_file_reading_column_box_Hv_title: "Hv_box_{box_name}",
+        blk_file_reading_column_box_Z_title: "Z_box_{box_name}",
+        # custom mol fractions section
+        blk_file_reading_column_box_molfract_ICT_title: "molfract_ICT_{box_name}",
+        blk_file_reading_column_box_molfract_IOT_title: "molfract_IOT_{box_name}",
+        blk_file_reading_column_box_molfract_NDO_title: "molfract_NDO_{box_name}",
+        blk_file_reading_column_box_molfract_NDE_title: "molfract_NDE_{box_name}",
+    }
 
-        molfract_IOT_box_0 = np.transpose(list(data_box_0.loc[:, blk_file_reading_column_box_molfract_IOT_title]))
-        molfract_IOT_box_0_mean = np.nanmean(molfract_IOT_box_0)
+    job_averages = {"equilibration": {}}
+    for box_name, box_i_statistics in [
+        ("liq", box_liq_statistics),
+        ("vap", box_vap_statistics),
+    ]:
+        job_averages["equilibration"][box_name] = {}
+        for (
+            column_title,
+            job_averages_column_name,
+        ) in job_averages_column_names.items():
+            job_averages_column_name = job_averages_column_name.format(
+                box_name=box_name
+            )
+            job_averages[f"{job_averages_column_name}_mean"] = box_i_statistics[
+                column_title
+            ]["mean"]
+            job_averages[f"{job_averages_column_name}_sem"] = box_i_statistics[
+                column_title
+            ]["sem"]
+            job_averages[f"{job_averages_column_name}_Neff"] = box_i_statistics[
+                column_title
+            ]["Neff"]
+
+            job_averages["equilibration"][box_name][column_title] = {
+                "t0_step": (
+                    int(box_i_statistics[column_title]["t0_step"])
+                    if np.isfinite(box_i_statistics[column_title]["t0_step"])
+                    else None
+                ),
+                "g": float(box_i_statistics[column_title]["g"]),
+                "Neff": float(box_i_statistics[column_title]["Neff"]),
+            }
+
+        # the cube length's standard error is propagated from the volume's (L =
+        # V^(1/3))
+        volume_box_i_mean = job_averages[f"volume_box_{box_name}_mean"]
+        job_averages[f"length_if_cube_box_{box_name}_mean"] = (
+            volume_box_i_mean
+        ) ** (1 / 3)
+        job_averages[f"length_if_cube_box_{box_name}_sem"] = (
+            (volume_box_i_mean) ** (1 / 3)
+            / 3
+            * job_averages[f"volume_box_{box_name}_sem"]
+            / volume_box_i_mean
+        )
+        job_averages[f"length_if_cube_box_{box_name}_Neff"] = job_averages[
+            f"volume_box_{box_name}_Neff"
+        ]
+
+    return job_averages
+
+
+# each job is analyzed in its own part_5a operation, or the jobs of each
+# statepoint_without_replica group are analyzed in a single part_5a operation on
+# a process pool, where only the group's jobs with completed production runs,
+# which are not analyzed yet, are analyzed
+if part_5a_processes_int == 1:
+    part_5a_aggregator = aggregator.groupsof(1)
+else:
+    part_5a_aggregator = aggregator.groupby(
+        key=statepoint_without_replica,
+        sort_by="replica_number_int",
+        sort_ascending=True,
+    )
 
-        molfract_NDO_box_0 = np.transpose(list(data_box_0.loc[:, blk_file_reading_column_box_molfract_NDO_title]))
-        molfract_NDO_box_0_mean = np.nanmean(molfract_NDO_box_0)
 
-        molfract_NDE_box_0 = np.transpose(list(data_box_0.loc[:, blk_file_reading_column_box_molfract_NDE_title]))
-        molfract_NDE_box_0_mean = np.nanmean(molfract_NDE_box_0)
+@part_5a_aggregator
+@Project.operation.with_directives(
+     {
+         "np": get_process_pool_size(part_5a_processes_int),
+         "ngpu": 0,
+         "memory": memory_needed,
+         "walltime": walltime_gomc_analysis_hr,
+     }
+)
+@Project.pre(part_5a_analysis_individual_simulation_averages_ready_for_jobs)
+@Project.post(
+    part_5a_analysis_individual_simulation_averages_completed_for_jobs
+)
+def part_5a_analysis_individual_simulation_averages(*jobs):
+    # only the aggregate's jobs with completed production runs, which are not
+    # analyzed yet
+    jobs = get_part_5a_jobs_to_analyze(*jobs)
 
+    # remove the total averged replicate data and all analysis data after this,
+    # as it is no longer valid when adding more simulations
+    with jobs[0]:
+        if os.path.isfile(
+            f"../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}"
+        ):
+            os.remove(
+                f"../../analysis/{output_avg_std_of_replicates_txt_file_name_liq}"
+            )
+        if os.path.isfile(
+            f"../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}"
+        ):
+            os.remove(
+                f"../../analysis/{output_avg_std_of_replicates_txt_file_name_vap}"
+            )
+        if os.path.isfile(
+            f"../../analysis/{output_critical_data_replicate_txt_file_name}"
+        ):
+            os.remove(
+                f"../../analysis/{output_critical_data_replicate_txt_file_name}"
+            )
+        if os.path.isfile(
+            f"../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}"
+        ):
+            os.remove(
+                f"../../analysis/{output_critical_data_avg_std_of_replicates_txt_file_name}"
+            )
+        if os.path.isfile(
+            f"../../analysis/{output_boiling_data_replicate_txt_file_name}"
+        ):
+            os.remove(
+                f"../../analysis/{output_boiling_data_replicate_txt_file_name}"
+            )
+        if os.path.isfile(
+            f"../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}"
+        ):
+            os.remove(
+                f"../../analysis/{output_boiling_data_avg_std_of_replicates_txt_file_name}"
+            )
 
-        # *************************
-        # drawing in data from single file and extracting specific rows for the liquid box (end)
-        # *************************
 
-        # *************************
-        # drawing in data from single file and extracting specific rows for the vapor box (start)
-        # *************************
-        data_box_1 = pd.read_csv(reading_file_box_1, sep='\s+', header=0, na_values='NaN', index_col=False)
-        data_box_1 = pd.DataFrame(data_box_1)
-
-        step_no_title_mod = blk_file_reading_column_no_step_title[1:]
-        header_list = list(data_box_1.columns)
-        header_list[0] = step_no_title_mod
-        data_box_1.columns = header_list
-
-        data_box_1 = data_box_1.query(step_start_string + ' <= ' + step_no_title_mod + ' <= ' + step_finish_string)
-
-        iter_no_box_1 = data_box_1.loc[:, step_no_title_mod]
-        iter_no_box_1 = list(iter_no_box_1)
-        iter_no_box_1 = np.nanmean(iter_no_box_1)
-
-        pressure_box_1 = data_box_1.loc[:, blk_file_reading_column_no_pressure_title]
-        pressure_box_1 = list(pressure_box_1)
-        pressure_box_1 = np.transpose(pressure_box_1)
-        pressure_box_1_mean = np.nanmean(pressure_box_1)
-
-        total_molecules_box_1 = data_box_1.loc[:, blk_file_reading_column_total_molecules_title]
-        total_molecules_box_1 = list(total_molecules_box_1)
-        total_molecules_box_1 = np.transpose(total_molecules_box_1)
-        total_molecules_box_1_mean = np.nanmean(total_molecules_box_1)
-
-        Rho_box_1 = data_box_1.loc[:, blk_file_reading_column_Rho_title]
-        Rho_box_1 = list(Rho_box_1)
-        Rho_box_1 = np.transpose(Rho_box_1)
-        Rho_box_1_mean = np.nanmean(Rho_box_1)
-
-        volume_box_1 = data_box_1.loc[:, blk_file_reading_column_box_volume_title]
-        volume_box_1 = list(volume_box_1)
-        volume_box_1 = np.transpose(volume_box_1)
-        volume_box_1_mean = np.nanmean(volume_box_1)
-        length_if_cube_box_1_mean = (volume_box_1_mean) ** (1 / 3)
-
-        Hv_box_1 = data_box_1.loc[:, blk_file_reading_column_box_Hv_title]
-        Hv_box_1 = list(Hv_box_1)
-        Hv_box_1 = np.transpose(Hv_box_1)
-        Hv_box_1_mean = np.nanmean(Hv_box_1)
-
-        Z_box_1 = data_box_1.loc[:, blk_file_reading_column_box_Z_title]
-        Z_box_1 = list(Z_box_1)
-        Z_box_1 = np.transpose(Z_box_1)
-        Z_box_1_mean = np.nanmean(Z_box_1)
-
-        # box 1 mol fractions (custom to system)
-        molfract_ICT_box_1 = np.transpose(list(data_box_1.loc[:, blk_file_reading_column_box_molfract_ICT_title]))
-        molfract_ICT_box_1_mean = np.nanmean(molfract_ICT_box_1)
-
-        molfract_IOT_box_1 = np.transpose(list(data_box_1.loc[:, blk_file_reading_column_box_molfract_IOT_title]))
-        molfract_IOT_box_1_mean = np.nanmean(molfract_IOT_box_1)
-
-        molfract_NDO_box_1 = np.transpose(list(data_box_1.loc[:, blk_file_reading_column_box_molfract_NDO_title]))
-        molfract_NDO_box_1_mean = np.nanmean(molfract_NDO_box_1)
-
-        molfract_NDE_box_1 = np.transpose(list(data_box_1.loc[:, blk_file_reading_column_box_molfract_NDE_title]))
-        molfract_NDE_box_1_mean = np.nanmean(molfract_NDE_box_1)
-
-        # sort boxes based on density to liquid or vapor
-        if (Rho_box_0_mean > Rho_box_1_mean) or (Rho_box_0_mean == Rho_box_1_mean):
-            pressure_box_liq_mean = pressure_box_0_mean
-            total_molecules_box_liq_mean = total_molecules_box_0_mean
-            Rho_box_liq_mean = Rho_box_0_mean
-            volume_box_liq_mean = volume_box_0_mean
-            length_if_cube_box_liq_mean = length_if_cube_box_0_mean
-            Hv_box_liq_mean = Hv_box_0_mean
-            Z_box_liq_mean = Z_box_0_mean
-
-            pressure_box_vap_mean = pressure_box_1_mean
-            total_molecules_box_vap_mean = total_molecules_box_1_mean
-            Rho_box_vap_mean = Rho_box_1_mean
-            volume_box_vap_mean = volume_box_1_mean
-            length_if_cube_box_vap_mean = length_if_cube_box_1_mean
-            Hv_box_vap_mean = Hv_box_1_mean
-            Z_box_vap_mean = Z_box_1_mean
-
-            # custom mol fractions section
-            molfract_ICT_liq_mean = molfract_ICT_box_0_mean
-            molfract_IOT_liq_mean = molfract_IOT_box_0_mean
-            molfract_NDO_liq_mean = molfract_NDO_box_0_mean
-            molfract_NDE_liq_mean = molfract_NDE_box_0_mean
-
-            molfract_ICT_vap_mean = molfract_ICT_box_1_mean
-            molfract_IOT_vap_mean = molfract_IOT_box_1_mean
-            molfract_NDO_vap_mean = molfract_NDO_box_1_mean
-            molfract_NDE_vap_mean = molfract_NDE_box_1_mean
-
-        elif Rho_box_0_mean < Rho_box_1_mean:
-            pressure_box_liq_mean = pressure_box_1_mean
-            total_molecules_box_liq_mean = total_molecules_box_1_mean
-            Rho_box_liq_mean = Rho_box_1_mean
-            volume_box_liq_mean = volume_box_1_mean
-            length_if_cube_box_liq_mean = length_if_cube_box_1_mean
-            Hv_box_liq_mean = Hv_box_1_mean
-            Z_box_liq_mean = Z_box_1_mean
-
-            pressure_box_vap_mean = pressure_box_0_mean
-            total_molecules_box_vap_mean = total_molecules_box_0_mean
-            Rho_box_vap_mean = Rho_box_0_mean
-            volume_box_vap_mean = volume_box_0_mean
-            length_if_cube_box_vap_mean = length_if_cube_box_0_mean
-            Hv_box_vap_mean = Hv_box_0_mean
-            Z_box_vap_mean = Z_box_0_mean
-
-            # custom mol fractions section
-            molfract_ICT_liq_mean = molfract_ICT_box_1_mean
-            molfract_IOT_liq_mean = molfract_IOT_box_1_mean
-            molfract_NDO_liq_mean = molfract_NDO_box_1_mean
-            molfract_NDE_liq_mean = molfract_NDE_box_1_mean
-
-            molfract_ICT_vap_mean = molfract_ICT_box_0_mean
-            molfract_IOT_vap_mean = molfract_IOT_box_0_mean
-            molfract_NDO_vap_mean = molfract_NDO_box_0_mean
-            molfract_NDE_vap_mean = molfract_NDE_box_0_mean
+    # the step window (part_5a_step_start_int and part_5a_step_finish_int),
+    # which is set to basically use all values.  However, allows the ability to
+    # set if needed for each job
+    step_windows = [get_part_5a_step_window(job) for job in jobs]
+
+    # get the averages from each individual simulation (on a process pool if
+    # part_5a_processes_int > 1), and then write the csv's for each job.
+    all_job_averages = map_in_process_pool(
+        get_individual_simulation_averages,
+        [
+            (
+                job.fn(
+                    f"Blk_{gomc_production_control_file_name_str}_BOX_0.dat"
+                ),
+                job.fn(
+                    f"Blk_{gomc_production_control_file_name_str}_BOX_1.dat"
+                ),
+                step_start,
+                step_finish,
+                part_5a_detect_equilibration_bool,
+            )
+            for job, (step_start, step_finish) in zip(jobs, step_windows)
+        ],
+        processes=part_5a_processes_int,
+        preload_modules=["pandas", "src.analysis.equilibration"],
+    )
 
-        # *************************
-        # drawing in data from single file and extracting specific rows for the vapor box (end)
-        # *************************
+    for job, job_averages, step_window in zip(
+        jobs, all_job_averages, step_windows
+    ):
+        with job:
+            output_column_temp_title = "temp_K"  # column title title for temp
+            output_column_no_pressure_title = (
+                "P_bar"  # column title title for PRESSURE
+            )
+            output_column_total_molecules_title = (
+                "No_mol"  # column title title for TOT_MOL
+            )
+            output_column_Rho_title = (
+                "Rho_kg_per_m_cubed"  # column title title for TOT_DENS
+            )
+            output_column_box_volume_title = (
+                "V_ang_cubed"  # column title title for VOLUME
+            )
+            output_column_box_length_if_cubed_title = (
+                "L_m_if_cubed"  # column title title for VOLUME
+            )
+            output_column_box_Hv_title = (
+                "Hv_kJ_per_mol"  # column title title for HEAT_VAP
+            )
+            output_column_box_Z_title = (
+                "Z"  # column title title for  compressiblity (Z)
+            )
 
-        box_liq_replicate_data_txt_file = open(output_replicate_txt_file_name_liq, "w")
-        box_liq_replicate_data_txt_file.write(
-            f"{output_column_temp_title: <30} "
-            f"{output_column_no_pressure_title: <30} "
-            f"{output_column_total_molecules_title: <30} "
-            f"{output_column_Rho_title: <30} "
-            f"{output_column_box_volume_title: <30} "
-            f"{output_column_box_length_if_cubed_title: <30} "
-            f"{output_column_box_Hv_title: <30} "
-            f"{output_column_box_Z_title: <30} "
-            f"{output_column_box_molfract_ICT_title: <30} "
-            f"{output_column_box_molfract_IOT_title: <30} "
-            f"{output_column_box_molfract_NDO_title: <30} "
-            f"{output_column_box_molfract_NDE_title: <30} "
-            f" \n"
-        )
-        box_liq_replicate_data_txt_file.write(
-            f"{job.sp.production_temperature_K: <30} "
-            f"{pressure_box_liq_mean: <30} "
-            f"{total_molecules_box_liq_mean: <30} "
-            f"{Rho_box_liq_mean: <30} "
-            f"{volume_box_liq_mean: <30} "
-            f"{length_if_cube_box_liq_mean: <30} "
-            f"{Hv_box_liq_mean: <30} "
-            f"{Z_box_liq_mean: <30} "
-            f"{molfract_ICT_liq_mean: <30} "
-            f"{molfract_IOT_liq_mean: <30} "
-            f"{molfract_NDO_liq_mean: <30} "
-            f"{molfract_NDE_liq_mean: <30} "
-            f" \n"
-        )
+            # custom section
+            output_column_box_molfract_ICT_title = (
+                "mol_fract_ICT"  # column title for liq molfract_ICT
+            )
+            output_column_box_molfract_IOT_title = (
+                "mol_fract_IOT"  # column title for liq  molfract_IOT
+            )
+            output_column_box_molfract_NDO_title = (
+                "mol_fract_NDO"  # column title for liq  molfract_NDO
+            )
+            output_column_box_molfract_NDE_title = (
+                "mol_fract_NDE"  # column title for liq  molfract_NDE
+            )
 
-        box_vap_replicate_data_txt_file = open(output_replicate_txt_file_name_vap, "w")
-        box_vap_replicate_data_txt_file.write(
-            f"{output_column_temp_title: <30} "
-            f"{output_column_no_pressure_title: <30} "
-            f"{output_column_total_molecules_title: <30} "
-            f"{output_column_Rho_title: <30} "
-            f"{output_column_box_volume_title: <30} "
-            f"{output_column_box_length_if_cubed_title: <30} "
-            f"{output_column_box_Hv_title: <30} "
-            f"{output_column_box_Z_title: <30} "
-            f"{output_column_box_molfract_ICT_title: <30} "
-            f"{output_column_box_molfract_IOT_title: <30} "
-            f"{output_column_box_molfract_NDO_title: <30} "
-            f"{output_column_box_molfract_NDE_title: <30} "
-            f" \n"
-        )
-        box_vap_replicate_data_txt_file.write(
-            f"{job.sp.production_temperature_K: <30} "
-            f"{pressure_box_vap_mean: <30} "
-            f"{total_molecules_box_vap_mean: <30} "
-            f"{Rho_box_vap_mean: <30} "
-            f"{volume_box_vap_mean: <30} "
-            f"{length_if_cube_box_vap_mean: <30} "
-            f"{Hv_box_vap_mean: <30} "
-            f"{Z_box_vap_mean: <30} "
-            f"{molfract_ICT_vap_mean: <30} "
-            f"{molfract_IOT_vap_mean: <30} "
-            f"{molfract_NDO_vap_mean: <30} "
-            f"{molfract_NDE_vap_mean: <30} "
-            f" \n"
-        )
+            # the output columns, and their job averages' names, where each
+            # average is followed by its standard error ('_sem') and number of
+            # uncorrelated blocks ('_Neff')
+            output_columns = [
+                [
+                    output_column_no_pressure_title,
+                    "P_sem_bar",
+                    "P_Neff",
+                    "pressure_box_{box_name}",
+                ],
+                [
+                    output_column_total_molecules_title,
+                    "No_mol_sem",
+                    "No_mol_Neff",
+                    "total_molecules_box_{box_name}",
+                ],
+                [
+                    output_column_Rho_title,
+                    "Rho_sem_kg_per_m_cubed",
+                    "Rho_Neff",
+                    "Rho_box_{box_name}",
+                ],
+                [
+                    output_column_box_volume_title,
+                    "V_sem_ang_cubed",
+                    "V_Neff",
+                    "volume_box_{box_name}",
+                ],
+                [
+                    output_column_box_length_if_cubed_title,
+                    "L_sem_m_if_cubed",
+                    "L_Neff",
+                    "length_if_cube_box_{box_name}",
+                ],
+                [
+                    output_column_box_Hv_title,
+                    "Hv_sem_kJ_per_mol",
+                    "Hv_Neff",
+                    "Hv_box_{box_name}",
+                ],
+                [
+                    output_column_box_Z_title,
+                    "Z_sem",
+                    "Z_Neff",
+                    "Z_box_{box_name}",
+                ],
+
+                # custom section
+                [
+                    output_column_box_molfract_ICT_title,
+                    "mol_fract_ICT_sem",
+                    "mol_fract_ICT_Neff",
+                    "molfract_ICT_{box_name}",
+                ],
+                [
+                    output_column_box_molfract_IOT_title,
+                    "mol_fract_IOT_sem",
+                    "mol_fract_IOT_Neff",
+                    "molfract_IOT_{box_name}",
+                ],
+                [
+                    output_column_box_molfract_NDO_title,
+                    "mol_fract_NDO_sem",
+                    "mol_fract_NDO_Neff",
+                    "molfract_NDO_{box_name}",
+                ],
+                [
+                    output_column_box_molfract_NDE_title,
+                    "mol_fract_NDE_sem",
+                    "mol_fract_NDE_Neff",
+                    "molfract_NDE_{box_name}",
+                ],
+            ]
+
+            output_txt_file_header = f"{output_column_temp_title: <30} "
+            for (
+                output_column_title,
+                output_column_sem_title,
+                output_column_Neff_title,
+                _,
+            ) in output_columns:
+                output_txt_file_header += (
+                    f"{output_column_title: <30} "
+                    f"{output_column_sem_title: <30} "
+                    f"{output_column_Neff_title: <30} "
+                )
+            output_txt_file_header += " \n"
+
+            box_data_txt_file = {}
+            for box_name, output_replicate_txt_file_name in [
+                ["liq", output_replicate_txt_file_name_liq],
+                ["vap", output_replicate_txt_file_name_vap],
+            ]:
+                box_data_txt_file[box_name] = open(
+                    output_replicate_txt_file_name, "w"
+                )
+                box_data_txt_file[box_name].write(output_txt_file_header)
+
+                box_data_txt_file[box_name].write(
+                    f"{job.sp.production_temperature_K: <30} "
+                )
+                for _, _, _, job_averages_column_name in output_columns:
+                    job_averages_column_name = job_averages_column_name.format(
+                        box_name=box_name
+                    )
+                    box_data_txt_file[box_name].write(
+                        f"{job_averages[f'{job_averages_column_name}_mean']: <30} "
+                        f"{job_averages[f'{job_averages_column_name}_sem']: <30} "
+                        f"{job_averages[f'{job_averages_column_name}_Neff']: <30} "
+                    )
+                box_data_txt_file[box_name].write(" \n")
+
+            box_data_txt_file["liq"].close()
+            box_data_txt_file["vap"].close()
+
+            # record the written files in the output manifest, which the labels
+            # read
+            write_output_manifest(
+                job,
+                "part_5a_analysis_individual_simulation_averages",
+                [
+                    output_replicate_txt_file_name_liq,
+                    output_replicate_txt_file_name_vap,
+                ],
+            )
+            job.doc.part_5a_analyzed_step_window = step_window
+            job.doc.part_5a_analyzed_detect_equilibration = (
+                part_5a_detect_equilibration_bool
+            )
+
+            # the start of each box's and property's equilibrated data
+            # (t0_step), its statistical inefficiency (g), and its number of
+            # uncorrelated blocks (Neff)
+            job.doc.part_5a_equilibration = job_averages["equilibration"]
 
-        box_liq_replicate_data_txt_file.close()
-        box_vap_replicate_data_txt_file.close()
 
+            # ***********************
+            # calc the avg data from the liq and vap boxes (end)
+            # ***********************
 
-        # ***********************
-        # calc the avg data from the liq and vap boxes (end)
-        # ***********************
 
 # ******************************************************
 # ******************************************************
@@ -1455,12 +1975,13 @@ def part_5a_analysis_individual_simulation_averages(*jobs):
      }
 )
 
-@Project.pre(lambda *jobs: all(part_5a_analysis_individual_simulation_averages_completed(j)
-                               for j in jobs[0]._project))
+@Project.pre(part_5a_analysis_all_project_jobs_completed)
 @Project.pre(part_4b_job_production_run_completed_properly)
 @Project.pre(part_5a_analysis_individual_simulation_averages_completed)
 @Project.post(part_5b_analysis_replica_averages_completed)
 def part_5b_analysis_replica_averages(*jobs):
+    import pandas as pd
+
     # ***************************************************
     #  create the required lists and file labels total averages across the replicates (start)
     # ***************************************************
@@ -1819,6 +2340,9 @@ def part_5b_analysis_replica_averages(*jobs):
 @Project.pre(part_5b_analysis_replica_averages_completed)
 @Project.post(part_5c_analysis_critical_and_boiling_points_replicate_data_completed)
 def part_5c_analysis_critical_and_boiling__points_replicate_data(*jobs):
+    import pandas as pd
+    from scipy import stats
+
     # ***************************************************
     #  user changable variables (start)
     # ***************************************************
@@ -2186,6 +2710,8 @@ def part_5c_analysis_critical_and_boiling__points_replicate_data(*jobs):
 @Project.pre(part_5c_analysis_critical_and_boiling_points_replicate_data_completed)
 @Project.post(part_5d_analysis_critical_and_boiling_points_avg_std_data_completed)
 def part_5d_analysis_critical_and_boiling_points_avg_std_data(*jobs):
+    import pandas as pd
+
     # ***********************
     # calc the Critical points (start)
     # ***********************
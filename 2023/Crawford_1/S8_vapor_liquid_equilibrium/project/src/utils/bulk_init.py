@@ -0,0 +1,115 @@
+"""Initialize the signac state points in bulk."""
+
+import itertools
+import os
+from typing import Dict, List, Tuple
+
+
+def get_statepoint_product(
+    statepoint_values: Dict[str, list],
+    linked_statepoint_values: Dict[str, Tuple[str, dict]] = None,
+) -> List[dict]:
+    """Get the state points for all the combinations (Cartesian product) of the
+    values.
+
+    Parameters
+    ----------
+    statepoint_values : dict, {str: list}
+        The state point keys and the list of values for each key.  The
+        state points are ordered like nested loops in the key order
+        (i.e., the first key's values change the slowest).
+    linked_statepoint_values : dict, {str: (str, dict)}, optional, default=None
+        The state point keys which are set from another key's value, rather than
+        being in the product, with the other key and the dictionary mapping its
+        values to this key's values (i.e., the IRMOF-1 pressure to fugacity,
+        {"production_fugacity_bar": ("production_pressure_bar", {pressure:
+        fugacity})}).
+
+    Returns
+    -------
+    list of dict
+        The state points.
+    """
+    if linked_statepoint_values is None:
+        linked_statepoint_values = {}
+
+    for linked_key, (
+        source_key,
+        value_mapping,
+    ) in linked_statepoint_values.items():
+        if source_key not in statepoint_values:
+            raise ValueError(
+                f"ERROR: The '{linked_key}' state point is linked to the"
+                f" '{source_key}' key, which is not in the statepoint_values"
+                f" keys: {list(statepoint_values.keys())}."
+            )
+        missing_values = [
+            value
+            for value in statepoint_values[source_key]
+            if value not in value_mapping
+        ]
+        if len(missing_values) > 0:
+            raise ValueError(
+                f"ERROR: The '{source_key}' values {missing_values} are not "
+                f"in the '{linked_key}' value mapping."
+            )
+
+    keys = list(statepoint_values.keys())
+    total_statepoints = []
+    for values in itertools.product(*statepoint_values.values()):
+        statepoint = dict(zip(keys, values))
+        for linked_key, (
+            source_key,
+            value_mapping,
+        ) in linked_statepoint_values.items():
+            statepoint[linked_key] = value_mapping[statepoint[source_key]]
+
+        total_statepoints.append(statepoint)
+
+    return total_statepoints
+
+
+def init_jobs_in_bulk(
+    project, total_statepoints: List[dict]
+) -> Tuple[int, int]:
+    """Initialize the jobs for the state points, skipping the existing jobs.
+
+    The existing jobs are found from a single listing of the workspace
+    directory, rather than checking each job, so only the new jobs are
+    initialized.
+
+    Parameters
+    ----------
+    project : signac project
+        The project the jobs are initialized in.
+    total_statepoints : list of dict
+        The state points.
+
+    Returns
+    -------
+    number_of_new_jobs, number_of_existing_jobs : int, int
+        The number of jobs initialized, and the number of jobs which already
+        existed.
+    """
+    # 'project.workspace' is a method in signac 1.x and a property in signac 2.x
+    workspace = (
+        project.workspace()
+        if callable(project.workspace)
+        else project.workspace
+    )
+    os.makedirs(workspace, exist_ok=True)
+    existing_job_ids = set(os.listdir(workspace))
+
+    new_jobs = {}
+    number_of_existing_jobs = 0
+    for statepoint in total_statepoints:
+        job = project.open_job(statepoint=statepoint)
+        if job.id in existing_job_ids:
+            number_of_existing_jobs += 1
+        else:
+            new_jobs.setdefault(job.id, job)
+
+    for job in new_jobs.values():
+        job.init()
+
+    return len(new_jobs), number_of_existing_jobs
@@ -0,0 +1,575 @@
+"""Run a GOMC simulation, and stop it when its target properties have converged.
+
+The controller starts the GOMC command, and every check interval reads the rows
+appended to the followed GOMC output files (i.e., the Blk or Free_Energy files),
+detects the start of each target column's equilibrated data, and estimates its
+mean, statistical inefficiency (g), number of uncorrelated samples (Neff), and
+standard error (sem = std / sqrt(Neff)).  When every target's sem is at or below
+its target, and it has the minimum Neff and equilibrated fraction of the data
+(like 'is_equilibrated' in src/analysis/equilibration.py), and has been
+stationary (i.e., after the start of its equilibrated data) for the minimum
+number of steps, GOMC is stopped and a convergence record is written, which
+marks the simulation as completed (see 'gomc_run_converged').  With an infinite
+target sem, only the stationary steps are checked, which ends an equilibration
+run.  If GOMC finishes before the targets converge, or exits with an error
+before it is stopped, the controller returns GOMC's exit code and writes no
+record.
+
+GOMC writes its restart files every RestartFreq steps, which can be less often
+than the Blk and Free_Energy file rows (i.e., the noble gas Free_Energy rows are
+written every 10**4 steps, and its restart files every 10**5 steps).  So when
+the next simulation starts from the restart files (--restart-file), GOMC is only
+stopped after all the restart files were written again after the targets
+converged, and are unchanged for an output step poll interval (i.e., completely
+written).  Otherwise, GOMC is stopped just after its next output step (new
+rows).
+
+Usage (from the job's directory, with the project directory on the PYTHONPATH):
+    python -m src.utils.convergence_controller --record convergence_RUN.json
+        --target Blk_RUN_BOX_0.dat TOT_DENS 0.002 relative [--target ...]
+        [--minimum-stationary-steps 10000000] [--restart-file
+        RUN_BOX_0_restart.pdb ...] -- GOMC_CPU_GEMC +p4 RUN.conf > out_RUN.dat
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+from src.utils.live_analysis import get_column_names, read_appended_rows
+
+# the target sem types, where the "absolute" sem is in the column's units,
+# and the "relative" sem is the fraction of the absolute value of the mean
+target_sem_types = ["absolute", "relative"]
+
+
+def convergence_record_filename(control_filename_str: str) -> str:
+    """Get the convergence record file name of a GOMC simulation.
+
+    Parameters
+    ----------
+    control_filename_str : str
+        The GOMC control file name, without the extension.
+
+    Returns
+    -------
+    str
+        The convergence record file name, which is written in the job's
+        directory.
+    """
+    return f"convergence_{control_filename_str}.json"
+
+
+def gomc_run_converged(record_filename: str) -> bool:
+    """Check if the convergence controller stopped the GOMC simulation because
+    it converged.
+
+    Parameters
+    ----------
+    record_filename : str
+        The convergence record file name, including the path.
+
+    Returns
+    -------
+    bool
+        True if the convergence record exists and is converged, and GOMC was
+        stopped by the controller or exited with a zero exit code, and False
+        otherwise.
+    """
+    try:
+        with open(record_filename, "r") as fp:
+            record = json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return False
+
+    return record.get("converged") is True and (
+        record.get("stopped_by_controller") is True
+        or record.get("gomc_exit_code") == 0
+    )
+
+
+class FollowedFile:
+    """The rows of a growing GOMC output file, which are read as they are
+    appended.
+
+    Parameters
+    ----------
+    filename : str
+        The GOMC output file name (i.e., a Blk or Free_Energy file), including
+        the path.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.byte_offset = 0
+        self.column_names = None
+        self._rows = None
+
+    def read_appended_rows(self) -> int:
+        """Read the complete rows appended to the file since the last read.
+
+        Returns
+        -------
+        int
+            The number of rows read.
+        """
+        if not os.path.isfile(self.filename):
+            return 0
+
+        header_lines, rows, self.byte_offset = read_appended_rows(
+            self.filename, self.byte_offset
+        )
+        if len(rows) == 0:
+            return 0
+        if self.column_names is None:
+            self.column_names = get_column_names(
+                header_lines[-1] if len(header_lines) > 0 else "", rows.shape[1]
+            )
+        self._rows = (
+            rows if self._rows is None else np.concatenate((self._rows, rows))
+        )
+
+        return len(rows)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The 2-D float rows read so far (rows=output steps,
+        columns=properties).
+        """
+        if self._rows is None:
+            return np.empty((0, 0), dtype=np.float64)
+
+        return self._rows
+
+
+def get_column_convergence(a_t: np.ndarray) -> dict:
+    """Get the equilibrated data's mean and standard error of a column.
+
+    Parameters
+    ----------
+    a_t : numpy.ndarray
+        The 1-D column values, where the nan values are not used.
+
+    Returns
+    -------
+    dict
+        The "t0" (the start of the equilibrated data in a_t's valid values),
+        "t0_index" (the index of t0 in a_t), "equilibrated_fraction" (1 - t0 /
+        the number of valid values), "g", "Neff", "mean", and "sem" (std /
+        sqrt(Neff)) of the equilibrated data, and "constant" (True if the
+        equilibrated data has no variance, i.e., a dU/dL column of an uncharged
+        solute).
+    """
+    from src.analysis.equilibration import detect_equilibration
+
+    valid_values = ~np.isnan(a_t)
+    a_t = a_t[valid_values]
+    if len(a_t) < 3:
+        return {
+            "t0": 0,
+            "t0_index": 0,
+            "equilibrated_fraction": 1.0,
+            "g": np.nan,
+            "Neff": float(len(a_t)),
+            "mean": np.nan,
+            "sem": np.nan,
+            "constant": False,
+        }
+
+    t0, g, Neff = detect_equilibration(a_t)
+    equilibrated_a_t = a_t[int(t0) :]
+
+    return {
+        "t0": int(t0),
+        "t0_index": int(np.flatnonzero(valid_values)[int(t0)]),
+        "equilibrated_fraction": 1.0 - int(t0) / len(a_t),
+        "g": float(g),
+        "Neff": float(Neff),
+        "mean": float(np.mean(equilibrated_a_t)),
+        "sem": float(np.std(equilibrated_a_t, ddof=1) / np.sqrt(Neff)),
+        "constant": bool(np.ptp(equilibrated_a_t) == 0),
+    }
+
+
+def get_last_steps(followed_files: dict) -> dict:
+    """Get the last step read of every followed file, which is None if no rows
+    were read.
+    """
+    return {
+        filename: (
+            float(followed_file.rows[-1, 0])
+            if len(followed_file.rows) > 0
+            else None
+        )
+        for filename, followed_file in followed_files.items()
+    }
+
+
+def _check_targets(targets: List[Tuple[str, str, float, str]]) -> None:
+    """Check that the targets' sem types are one of the 'target_sem_types'."""
+    for filename, column_name, target_sem, target_sem_type in targets:
+        if target_sem_type not in target_sem_types:
+            raise ValueError(
+                f"ERROR: The target sem type '{target_sem_type}' of the"
+                f" {filename} '{column_name}' column is not one of the"
+                f" target_sem_types = {target_sem_types}."
+            )
+
+
+def check_convergence(
+    followed_files: dict,
+    targets: List[Tuple[str, str, float, str]],
+    minimum_neff: float = 50,
+    minimum_equilibrated_fraction: float = 0.8,
+    minimum_stationary_steps: float = 0,
+) -> dict:
+    """Check if the target columns of the followed files have converged.
+
+    Parameters
+    ----------
+    followed_files : dict, {str: FollowedFile}
+        The followed files, with the file names in the targets as the keys.
+    targets : list of (str, str, float, str)
+        The (file name, column name, target sem, target sem type) of each
+        target, where every column whose name is or starts with the column name
+        is a target (i.e., "dU/dL" for all the dU/dL columns).  The target sem
+        type is one of the 'target_sem_types'.
+    minimum_neff : float, optional, default=50
+        The minimum number of uncorrelated samples of a converged column,
+        so the sem is not estimated from a few samples.
+    minimum_equilibrated_fraction : float, optional, default=0.8
+        The minimum fraction of a converged column's data after the start of the
+        equilibrated data, so a run is not stopped soon after its initial
+        transient, where the mean may still be biased by the transient.  The
+        minimum Neff and equilibrated fraction are not checked for a constant
+        column (i.e., the zero dU/dL(Coulomb) of an uncharged solute), whose
+        Neff is 1 and whose sem is exactly 0.
+    minimum_stationary_steps : float, optional, default=0
+        The minimum number of steps from the start of a converged column's
+        equilibrated data to its last step (the file's first column).
+
+    Returns
+    -------
+    dict
+        The "converged" bool, the "last_step" of every followed file, and the
+        "targets", a list of each target column's file name, column name,
+        target, convergence values (see 'get_column_convergence'), "t0_step",
+        "stationary_steps" (the last step - t0_step), and "converged" bool.
+    """
+    _check_targets(targets)
+
+    targets_convergence = []
+    for filename, column_name, target_sem, target_sem_type in targets:
+        followed_file = followed_files[filename]
+        matching_column_names = [
+            file_column_name
+            for file_column_name in (followed_file.column_names or [])
+            if file_column_name.startswith(column_name)
+        ]
+        if len(matching_column_names) == 0:
+            # the file's header and rows are not written yet
+            targets_convergence.append(
+                {
+                    "filename": filename,
+                    "column_name": column_name,
+                    "converged": False,
+                }
+            )
+            continue
+
+        for matching_column_name in matching_column_names:
+            column_convergence = get_column_convergence(
+                followed_file.rows[
+                    :, followed_file.column_names.index(matching_column_name)
+                ]
+            )
+            t0_step = float(
+                followed_file.rows[column_convergence["t0_index"], 0]
+            )
+            stationary_steps = float(followed_file.rows[-1, 0]) - t0_step
+            sem = column_convergence["sem"]
+            if target_sem_type == "relative":
+                if column_convergence["mean"] != 0:
+                    sem = sem / abs(column_convergence["mean"])
+                elif not column_convergence["constant"]:
+                    sem = np.inf
+            targets_convergence.append(
+                {
+                    "filename": filename,
+                    "column_name": matching_column_name,
+                    "target_sem": target_sem,
+                    "target_sem_type": target_sem_type,
+                    **column_convergence,
+                    "t0_step": t0_step,
+                    "stationary_steps": stationary_steps,
+                    "converged": bool(
+                        (
+                            column_convergence["constant"]
+                            or (
+                                column_convergence["Neff"] >= minimum_neff
+                                and column_convergence["equilibrated_fraction"]
+                                >= minimum_equilibrated_fraction
+                            )
+                        )
+                        and stationary_steps >= minimum_stationary_steps
+                        and sem <= target_sem
+                    ),
+                }
+            )
+
+    return {
+        "converged": all(target["converged"] for target in targets_convergence),
+        "last_step": get_last_steps(followed_files),
+        "targets": targets_convergence,
+    }
+
+
+def get_restart_file_stats(restart_filenames: List[str]) -> list:
+    """Get the [size, mtime_ns] of each restart file, which is None if the file
+    does not exist.
+    """
+    restart_file_stats = []
+    for restart_filename in restart_filenames:
+        try:
+            restart_file_stat = os.stat(restart_filename)
+        except FileNotFoundError:
+            restart_file_stats.append(None)
+            continue
+        restart_file_stats.append(
+            [restart_file_stat.st_size, restart_file_stat.st_mtime_ns]
+        )
+
+    return restart_file_stats
+
+
+def write_convergence_record(record_filename: str, convergence: dict) -> None:
+    """Atomically write the convergence record, with the nan values as null."""
+    record = {
+        **convergence,
+        "targets": [
+            {
+                key: (
+                    None
+                    if isinstance(value, float) and not np.isfinite(value)
+                    else value
+                )
+                for key, value in target.items()
+            }
+            for target in convergence["targets"]
+        ],
+    }
+    record["stopped"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    tmp_record_filename = f"{record_filename}.{os.getpid()}"
+    with open(tmp_record_filename, "w") as fp:
+        json.dump(record, fp, indent=2)
+    os.replace(tmp_record_filename, record_filename)
+
+
+def run_until_converged(
+    command: List[str],
+    record_filename: str,
+    targets: List[Tuple[str, str, float, str]],
+    minimum_neff: float = 50,
+    minimum_equilibrated_fraction: float = 0.8,
+    minimum_stationary_steps: float = 0,
+    check_interval_s: float = 600,
+    output_step_poll_interval_s: float = 1,
+    restart_filenames: List[str] = None,
+) -> int:
+    """Run the GOMC command, and stop it when the target columns have converged.
+
+    Parameters
+    ----------
+    command : list of str
+        The GOMC command and its arguments (i.e., ["GOMC_CPU_GEMC", "+p4",
+        "RUN.conf"]).  The command's standard output is this process's standard
+        output.
+    record_filename : str
+        The convergence record file name, which is written when GOMC is stopped.
+    targets : list of (str, str, float, str)
+        The (file name, column name, target sem, target sem type) of each
+        target (see 'check_convergence').
+    minimum_neff : float, optional, default=50
+        The minimum number of uncorrelated samples of a converged column.
+    minimum_equilibrated_fraction : float, optional, default=0.8
+        The minimum equilibrated fraction of a converged column's data.
+    minimum_stationary_steps : float, optional, default=0
+        The minimum number of steps a converged column has been stationary.
+    check_interval_s : float, optional, default=600
+        The time (s) between the convergence checks.
+    output_step_poll_interval_s : float, optional, default=1
+        The time (s) between the checks for GOMC's next output step (new rows),
+        or its restart files, after the targets have converged.
+    restart_filenames : list of str or None, optional, default=None
+        The restart files GOMC writes every RestartFreq steps, which the next
+        simulation starts from.  If given, GOMC is only stopped after all of
+        them were written again after the targets converged, and are unchanged
+        for an output step poll interval.  If None, GOMC is stopped just after
+        its next output step.
+
+    Returns
+    -------
+    int
+        0 if GOMC was stopped because it converged, or else GOMC's exit code
+        (i.e., if GOMC finished before it converged, or exited on its own with
+        an error after it converged, where no convergence record is written).
+    """
+    _check_targets(targets)
+    if os.path.isfile(record_filename):
+        os.remove(record_filename)
+
+    followed_files = {
+        filename: FollowedFile(filename) for filename, *_ in targets
+    }
+
+    process = subprocess.Popen(command)
+    while True:
+        try:
+            return process.wait(timeout=check_interval_s)
+        except subprocess.TimeoutExpired:
+            pass
+
+        # only check again when GOMC wrote new rows (at an output step)
+        number_of_rows_read = sum(
+            followed_file.read_appended_rows()
+            for followed_file in followed_files.values()
+        )
+        if number_of_rows_read == 0:
+            continue
+
+        convergence = check_convergence(
+            followed_files,
+            targets,
+            minimum_neff=minimum_neff,
+            minimum_equilibrated_fraction=minimum_equilibrated_fraction,
+            minimum_stationary_steps=minimum_stationary_steps,
+        )
+        if convergence["converged"]:
+            if restart_filenames:
+                # stop after the restart files are written again, and completely
+                # written
+                converged_restart_file_stats = get_restart_file_stats(
+                    restart_filenames
+                )
+                previous_restart_file_stats = None
+                while True:
+                    try:
+                        process.wait(timeout=output_step_poll_interval_s)
+                        break
+                    except subprocess.TimeoutExpired:
+                        pass
+                    restart_file_stats = get_restart_file_stats(
+                        restart_filenames
+                    )
+                    if (
+                        restart_file_stats == previous_restart_file_stats
+                        and all(
+                            stat is not None and stat != converged_stat
+                            for stat, converged_stat in zip(
+                                restart_file_stats, converged_restart_file_stats
+                            )
+                        )
+                    ):
+                        break
+                    previous_restart_file_stats = restart_file_stats
+                for followed_file in followed_files.values():
+                    followed_file.read_appended_rows()
+            else:
+                # stop just after the next output step
+                while (
+                    sum(
+                        followed_file.read_appended_rows()
+                        for followed_file in followed_files.values()
+                    )
+                    == 0
+                ):
+                    try:
+                        process.wait(timeout=output_step_poll_interval_s)
+                        break
+                    except subprocess.TimeoutExpired:
+                        pass
+            convergence["last_step"] = get_last_steps(followed_files)
+
+            # if GOMC exited on its own before it was stopped, its exit code is
+            # kept, and a crashed run (a nonzero exit code) is not recorded as
+            # converged
+            process.terminate()
+            gomc_exit_code = process.wait()
+            stopped_by_controller = gomc_exit_code == -signal.SIGTERM
+            if not stopped_by_controller and gomc_exit_code != 0:
+                return gomc_exit_code
+
+            convergence["gomc_exit_code"] = gomc_exit_code
+            convergence["stopped_by_controller"] = stopped_by_controller
+            write_convergence_record(record_filename, convergence)
+            print(
+                "The convergence controller stopped the simulation, as the"
+                f" targets converged, see {record_filename}.",
+                file=sys.stderr,
+            )
+            return 0
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the convergence controller from the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--record", required=True, help="The convergence record file name."
+    )
+    parser.add_argument(
+        "--target",
+        nargs=4,
+        action="append",
+        required=True,
+        metavar=("FILENAME", "COLUMN_NAME", "TARGET_SEM", "TARGET_SEM_TYPE"),
+        help=(
+            "A followed file, its target column, the target sem, and its type"
+            " (absolute or relative)."
+        ),
+    )
+    parser.add_argument("--minimum-neff", type=float, default=50)
+    parser.add_argument(
+        "--minimum-equilibrated-fraction", type=float, default=0.8
+    )
+    parser.add_argument("--minimum-stationary-steps", type=float, default=0)
+    parser.add_argument("--check-interval-s", type=float, default=600)
+    parser.add_argument(
+        "--restart-file",
+        action="append",
+        default=None,
+        help=(
+            "A restart file, which is written again before GOMC is stopped"
+            " (repeat for each file)."
+        ),
+    )
+    parser.add_argument(
+        "command", nargs=argparse.REMAINDER, help="-- the GOMC command."
+    )
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    targets = [
+        (filename, column_name, float(target_sem), target_sem_type)
+        for filename, column_name, target_sem, target_sem_type in args.target
+    ]
+
+    return run_until_converged(
+        command,
+        args.record,
+        targets,
+        minimum_neff=args.minimum_neff,
+        minimum_equilibrated_fraction=args.minimum_equilibrated_fraction,
+        minimum_stationary_steps=args.minimum_stationary_steps,
+        check_interval_s=args.check_interval_s,
+        restart_filenames=args.restart_file,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+"""Follow the growing GOMC output files of the running simulations, for a live
+analysis.
+"""
+
+import json
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+live_analysis_snapshot_filename = "live_analysis_snapshot.json"
+
+# the GOMC free energy files' header has column titles which may not be split on
+# whitespace, so only the titles alchemlyb reads are kept if the split does not
+# match the number of data columns
+free_energy_column_title_prefixes = ("Total_En", "dU/dL", "DelE", "PV")
+
+
+class RunningColumnStatistics:
+    """The running nan-aware count, mean, and variance of each column.
+
+    The rows are added in batches, which are combined with the running values
+    using Welford's algorithm for batches (Chan et al.), so the data
+    is never stored or re-read, and the variance is numerically stable.
+
+    Parameters
+    ----------
+    number_of_columns : int
+        The number of columns.
+    """
+
+    def __init__(self, number_of_columns: int):
+        self.count = np.zeros(number_of_columns, dtype=np.int64)
+        self.mean = np.zeros(number_of_columns, dtype=np.float64)
+        self.m2 = np.zeros(number_of_columns, dtype=np.float64)
+
+    def update(self, rows: np.ndarray) -> None:
+        """Add a batch of rows, where the nan values are not counted.
+
+        Parameters
+        ----------
+        rows : numpy.ndarray
+            The 2-D float rows (rows=blocks or steps, columns=properties).
+        """
+        if len(rows) == 0:
+            return
+
+        valid_values = ~np.isnan(rows)
+        batch_count = np.count_nonzero(valid_values, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            batch_mean = np.where(
+                batch_count > 0,
+                np.where(valid_values, rows, 0.0).sum(axis=0) / batch_count,
+                0.0,
+            )
+            batch_m2 = np.square(
+                np.where(valid_values, rows - batch_mean, 0.0)
+            ).sum(axis=0)
+
+            total_count = self.count + batch_count
+            delta = batch_mean - self.mean
+            batch_weight = np.where(
+                total_count > 0, batch_count / total_count, 0.0
+            )
+            self.mean = self.mean + delta * batch_weight
+            self.m2 = (
+                self.m2
+                + batch_m2
+                + np.square(delta) * self.count * batch_weight
+            )
+        self.count = total_count
+
+    @property
+    def variance(self) -> np.ndarray:
+        """The sample variance (ddof=1), which is nan for less than 2 values."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        """The sample standard deviation (ddof=1)."""
+        return np.sqrt(self.variance)
+
+    @property
+    def sem(self) -> np.ndarray:
+        """The standard error of the mean, which assumes uncorrelated values."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.std / np.sqrt(self.count)
+
+    def to_dict(self) -> dict:
+        """Get the running values as a JSON serializable dict."""
+        return {
+            "count": self.count.tolist(),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, running_values: dict):
+        """Create the running statistics from the to_dict values."""
+        running_statistics = cls(len(running_values["count"]))
+        running_statistics.count = np.array(
+            running_values["count"], dtype=np.int64
+        )
+        running_statistics.mean = np.array(
+            running_values["mean"], dtype=np.float64
+        )
+        running_statistics.m2 = np.array(running_values["m2"], dtype=np.float64)
+
+        return running_statistics
+
+
+def get_column_names(header_line: str, number_of_columns: int) -> List[str]:
+    """Get the column names from the last header line of a GOMC output file.
+
+    Parameters
+    ----------
+    header_line : str
+        The last header line (i.e., '#STEP TOT_EN ...' or '#Steps Total_En
+        ...').
+    number_of_columns : int
+        The number of data columns.
+
+    Returns
+    -------
+    list of str
+        The column names, where the first column's '#' is removed, or the
+        column numbers if the header does not match the data.
+    """
+    column_names = header_line.split()
+    if len(column_names) > 0:
+        column_names[0] = column_names[0].lstrip("#")
+    if len(column_names) != number_of_columns:
+        column_names = column_names[:1] + [
+            column_name
+            for column_name in column_names[1:]
+            if column_name.startswith(free_energy_column_title_prefixes)
+        ]
+    if len(column_names) != number_of_columns:
+        column_names = [
+            f"column_{column_i}" for column_i in range(number_of_columns)
+        ]
+
+    return column_names
+
+
+def read_appended_rows(
+    filename: str, byte_offset: int
+) -> Tuple[List[str], np.ndarray, int]:
+    """Read the complete rows appended to a GOMC output file after the byte
+    offset.
+
+    Only the bytes after the offset are read, and a partly written last line
+    is left for the next read.  The header lines (starting with '#') are only
+    at the start of the file.
+
+    Parameters
+    ----------
+    filename : str
+        The GOMC output file name (i.e., a Blk or Free_Energy file), including
+        the path.
+    byte_offset : int
+        The number of bytes already read.
+
+    Returns
+    -------
+    header_lines, rows, byte_offset : list of str, numpy.ndarray, int
+        The header lines (only read if the byte offset is 0), the float rows,
+        and the new byte offset (the end of the last complete line).
+    """
+    with open(filename, "rb") as fp:
+        fp.seek(byte_offset)
+        appended_bytes = fp.read()
+
+    complete_bytes = appended_bytes[: appended_bytes.rfind(b"\n") + 1]
+    appended_text = complete_bytes.decode()
+
+    header_lines = []
+    if byte_offset == 0:
+        while appended_text.lstrip(" \t").startswith("#"):
+            header_line, _, appended_text = appended_text.partition("\n")
+            header_lines.append(header_line.strip())
+
+    data_lines = appended_text.split("\n", 1)
+    number_of_columns = len(data_lines[0].split())
+    values = np.array(appended_text.split(), dtype=np.float64)
+    if number_of_columns == 0:
+        rows = np.empty((0, 0), dtype=np.float64)
+    elif len(values) % number_of_columns != 0:
+        raise ValueError(
+            f"ERROR: The appended rows of {filename} do not all have "
+            f"{number_of_columns} columns."
+        )
+    else:
+        rows = values.reshape(-1, number_of_columns)
+
+    return header_lines, rows, byte_offset + len(complete_bytes)
+
+
+def read_live_analysis_snapshot(job) -> dict:
+    """Read the job's live analysis snapshot.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the live analysis snapshot.
+
+    Returns
+    -------
+    dict
+        The snapshot, or an empty dict if it does not exist.
+    """
+    try:
+        with open(job.fn(live_analysis_snapshot_filename), "r") as fp:
+            return json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def update_file_snapshot(filename: str, file_snapshot: dict) -> dict:
+    """Update a file's snapshot with the rows appended since the last snapshot.
+
+    If the file was replaced (i.e., it is smaller, or it has a new header
+    line), the file is read from the start again.
+
+    Parameters
+    ----------
+    filename : str
+        The GOMC output file name, including the path.
+    file_snapshot : dict
+        The file's last snapshot, or an empty dict.
+
+    Returns
+    -------
+    dict
+        The file's updated snapshot.
+    """
+    file_size = os.path.getsize(filename)
+    byte_offset = file_snapshot.get("byte_offset", 0)
+    if byte_offset > 0:
+        with open(filename, "r") as fp:
+            first_line = fp.readline().strip()
+        if file_size < byte_offset or first_line != file_snapshot.get(
+            "first_line"
+        ):
+            file_snapshot, byte_offset = {}, 0
+
+    header_lines, rows, byte_offset = read_appended_rows(filename, byte_offset)
+    if "statistics" in file_snapshot:
+        running_statistics = RunningColumnStatistics.from_dict(
+            file_snapshot["statistics"]
+        )
+        column_names = file_snapshot["column_names"]
+        first_line = file_snapshot["first_line"]
+    elif rows.shape[1] > 0:
+        running_statistics = RunningColumnStatistics(rows.shape[1])
+        column_names = get_column_names(
+            header_lines[-1] if len(header_lines) > 0 else "", rows.shape[1]
+        )
+        first_line = header_lines[0] if len(header_lines) > 0 else ""
+    else:
+        # the header and the rows are not written yet
+        return {"size": file_size}
+
+    if len(rows) > 0 and rows.shape[1] != len(column_names):
+        raise ValueError(
+            f"ERROR: The appended rows of {filename} have"
+            f" {rows.shape[1]} columns, but the file has"
+            f" {len(column_names)} columns."
+        )
+
+    # the appended rows' means are compared to the running means to see a
+    # drifting run
+    appended_rows_statistics = RunningColumnStatistics(len(column_names))
+    appended_rows_statistics.update(rows)
+    appended_rows_means = np.where(
+        appended_rows_statistics.count > 0,
+        appended_rows_statistics.mean,
+        np.nan,
+    )
+
+    running_statistics.update(rows)
+    last_step = (
+        float(rows[-1, 0]) if len(rows) > 0 else file_snapshot.get("last_step")
+    )
+
+    return {
+        "size": file_size,
+        "byte_offset": byte_offset,
+        "first_line": first_line,
+        "column_names": column_names,
+        "rows": int(file_snapshot.get("rows", 0) + len(rows)),
+        "appended_rows": int(len(rows)),
+        "last_step": last_step,
+        "columns": {
+            column_name: {
+                "count": int(running_statistics.count[column_i]),
+                "mean": float(running_statistics.mean[column_i]),
+                "std": float(running_statistics.std[column_i]),
+                "sem": float(running_statistics.sem[column_i]),
+                "appended_rows_mean": float(appended_rows_means[column_i]),
+            }
+            for column_i, column_name in enumerate(column_names)
+        },
+        "statistics": running_statistics.to_dict(),
+    }
+
+
+def update_live_analysis_snapshot(job, filenames: List[str]) -> dict:
+    """Update the job's live analysis snapshot, reading only the bytes appended
+    to the files.
+
+    The snapshot records each file's read byte offset, running (Welford) mean,
+    standard deviation, and standard error of each column, and the mean of
+    the rows appended since the last snapshot, which shows a drifting run.
+    The files which are not written yet are recorded with a zero size.
+    The snapshot is written atomically.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the running simulation.
+    filenames : list of str
+        The growing GOMC output file names (i.e., the Blk or Free_Energy files),
+        relative to the job's directory.
+
+    Returns
+    -------
+    dict
+        The snapshot, {"updated": str, "files": {filename: file_snapshot}}.
+    """
+    last_snapshot = read_live_analysis_snapshot(job)
+
+    files_snapshot = {}
+    for filename in filenames:
+        if job.isfile(filename):
+            files_snapshot[filename] = update_file_snapshot(
+                job.fn(filename),
+                last_snapshot.get("files", {}).get(filename, {}),
+            )
+        else:
+            files_snapshot[filename] = {"size": 0}
+
+    snapshot = {
+        "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": files_snapshot,
+    }
+
+    snapshot_file = job.fn(live_analysis_snapshot_filename)
+    tmp_snapshot_file = f"{snapshot_file}.{os.getpid()}"
+    with open(tmp_snapshot_file, "w") as fp:
+        json.dump(snapshot, fp, indent=2)
+    os.replace(tmp_snapshot_file, snapshot_file)
+
+    return snapshot
+
+
+def live_analysis_snapshot_current(job, filenames: List[str]) -> bool:
+    """Check if the job's live analysis snapshot has all the bytes written to
+    the files.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the running simulation.
+    filenames : list of str
+        The growing GOMC output file names, relative to the job's directory.
+
+    Returns
+    -------
+    bool
+        True if the snapshot has every file's current size, and False otherwise.
+    """
+    files_snapshot = read_live_analysis_snapshot(job).get("files", {})
+    for filename in filenames:
+        file_size = (
+            os.path.getsize(job.fn(filename)) if job.isfile(filename) else 0
+        )
+        if files_snapshot.get(filename, {}).get("size") != file_size:
+            return False
+
+    return True
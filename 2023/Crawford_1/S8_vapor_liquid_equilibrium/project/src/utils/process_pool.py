@@ -0,0 +1,98 @@
+"""Run the per-job analysis calculations on a process pool."""
+
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List
+
+
+def get_available_cpu_count() -> int:
+    """Get the number of cores this process can run on.
+
+    This is the allocation's cores when running in a Slurm (or other
+    scheduler) job, which restricts the process's CPU affinity, rather than
+    all the cores on the node.
+
+    Returns
+    -------
+    int
+        The number of cores available to this process.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # os.sched_getaffinity is not available on all platforms (i.e., macOS)
+        return os.cpu_count() or 1
+
+
+def get_process_pool_size(processes: int) -> int:
+    """Get the number of processes, where -1 is all the available cores.
+
+    Parameters
+    ----------
+    processes : int
+        The number of processes (1 or greater), or -1 for all the cores
+        available to this process.
+
+    Returns
+    -------
+    int
+        The number of processes.
+    """
+    if processes == -1:
+        return get_available_cpu_count()
+    elif processes < 1:
+        raise ValueError(
+            f"ERROR: The number of processes = {processes}, but it must be 1 or"
+            " greater, or -1 to use all the available cores."
+        )
+
+    return processes
+
+
+def map_in_process_pool(
+    func: Callable,
+    args_list: Iterable[tuple],
+    processes: int = 1,
+    preload_modules: Iterable[str] = (),
+) -> List:
+    """Call the function for each set of arguments, on a process pool.
+
+    The function and its arguments must be picklable (i.e., a module level
+    function with plain data arguments, not signac jobs).  The 'fork' start
+    method is used, so the function can be defined in the project.py
+    script which is run as '__main__'.
+
+    Parameters
+    ----------
+    func : Callable
+        The function, which is called as func(*args).
+    args_list : iterable of tuple
+        The arguments for each function call.
+    processes : int, optional, default=1
+        The number of processes, or -1 for all the cores available to this
+        process.  If 1, or there is only one function call, the functions
+        are called serially in this process.
+    preload_modules : iterable of str, optional, default=()
+        The modules (i.e., the analysis packages the function imports) which
+        are imported in this process before the process pool is forked, so
+        they are not imported again in each process.
+
+    Returns
+    -------
+    list
+        The function results, in the same order as the arguments.
+    """
+    args_list = list(args_list)
+    processes = min(get_process_pool_size(processes), len(args_list))
+    if processes <= 1:
+        return [func(*args) for args in args_list]
+
+    for module_name in preload_modules:
+        importlib.import_module(module_name)
+
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        return list(executor.map(func, *zip(*args_list)))
@@ -5,6 +5,9 @@ import numpy as np
 import signac
 import unyt as u
 
+from src.utils.bulk_init import get_statepoint_product
+from src.utils.bulk_init import init_jobs_in_bulk
+
 # *******************************************
 # the main user varying state points (start)
 # *******************************************
@@ -43,37 +46,45 @@ replicas = [0, 1, 2, 3, 4]
 # *******************************************
 
 
-# get the fugacity from the set pressure in bar
-production_pressure = []
-production_fugacity = []
-for pressure_k, fugacity_k in production_pressure_to_fugacity_dict_bar.items():
-    production_pressure.append(pressure_k)
-    production_fugacity.append(fugacity_k)
-
 print("os.getcwd() = " +str(os.getcwd()))
 
 pr_root = os.path.join(os.getcwd(), "src")
 pr = signac.get_project(pr_root)
 
+# get the fugacity from the set pressure in bar
+production_pressure_bar_to_fugacity_bar_statepoint_dict = {
+    np.round(pressure_k, decimals=6)
+    .item(): np.round(fugacity_k, decimals=16)
+    .item()
+    for pressure_k, fugacity_k in production_pressure_to_fugacity_dict_bar.items()
+}
+
 # ignore statepoints that are not being tested (gemc only for methane, pentane)
 # filter the list of dictionaries
-total_statepoints = list()
-
-for molecule_i in molecule:
-    for prod_temp_i in production_temperatures:
-        for prod_pressure_i in range(0, len(production_pressure)):
-            for replica_i in replicas:
-                statepoint = {
-                    "molecule": molecule_i,
-                    "production_temperature_K": np.round(prod_temp_i.to_value("K"), decimals=6 ).item(),
-                    "production_pressure_bar": np.round(production_pressure[prod_pressure_i], decimals=6).item(),
-                    "production_fugacity_bar": np.round(production_fugacity[prod_pressure_i], decimals=16).item(),
-                    "replica_number_int": replica_i,
-                }
-
-                total_statepoints.append(statepoint)
-
-for sp in total_statepoints:
-    pr.open_job(
-        statepoint=sp,
-    ).init()
+total_statepoints = get_statepoint_product(
+    {
+        "molecule": molecule,
+        "production_temperature_K": [
+            np.round(prod_temp_i.to_value("K"), decimals=6).item()
+            for prod_temp_i in production_temperatures
+        ],
+        "production_pressure_bar": list(
+            production_pressure_bar_to_fugacity_bar_statepoint_dict.keys()
+        ),
+        "replica_number_int": replicas,
+    },
+    linked_statepoint_values={
+        "production_fugacity_bar": (
+            "production_pressure_bar",
+            production_pressure_bar_to_fugacity_bar_statepoint_dict,
+        ),
+    },
+)
+
+number_of_new_jobs, number_of_existing_jobs = init_jobs_in_bulk(
+    pr, total_statepoints
+)
+print(
+    f"initialized jobs = {number_of_new_jobs}, existing jobs = "
+    f"{number_of_existing_jobs}"
+)
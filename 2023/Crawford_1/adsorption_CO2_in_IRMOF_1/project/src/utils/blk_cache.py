@@ -0,0 +1,288 @@
+"""Cache the GOMC block average (Blk_*.dat) files in a binary columnar format.
+"""
+
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# the cache files are written next to the Blk file
+blk_cache_data_extension = ".cache.npy"
+blk_cache_meta_extension = ".cache.json"
+blk_cache_version = 1
+
+# the GOMC Blk files start the header with '#STEP', which is renamed to 'STEP'
+blk_step_column_title = "STEP"
+
+
+def get_blk_cache_filenames(blk_filename: str) -> Tuple[str, str]:
+    """Get the cache data and meta data file names for a Blk file.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+
+    Returns
+    -------
+    cache_data_filename, cache_meta_filename : str, str
+        The cache's .npy data file and .json meta data file names.
+    """
+    return (
+        f"{blk_filename}{blk_cache_data_extension}",
+        f"{blk_filename}{blk_cache_meta_extension}",
+    )
+
+
+def get_blk_source_key(blk_filename: str) -> dict:
+    """Get the Blk file's size and mtime, which the cache is keyed on.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+
+    Returns
+    -------
+    dict, {"version": int, "size": int, "mtime_ns": int}
+        The cache version, and the Blk file's size and mtime.
+    """
+    blk_stat = os.stat(blk_filename)
+
+    return {
+        "version": blk_cache_version,
+        "size": blk_stat.st_size,
+        "mtime_ns": blk_stat.st_mtime_ns,
+    }
+
+
+def get_blk_column_names(blk_filename: str) -> List[str]:
+    """Get a GOMC Blk file's column names from its header line.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+
+    Returns
+    -------
+    list of str
+        The column names, with '#STEP' renamed to 'STEP'.
+    """
+    with open(blk_filename, "r") as fp:
+        column_names = fp.readline().split()
+    if len(column_names) == 0:
+        raise ValueError(
+            f"ERROR: The Blk file = {blk_filename} does not have a header line."
+        )
+    column_names[0] = column_names[0].lstrip("#")
+
+    return column_names
+
+
+def read_blk_file(
+    blk_filename: str,
+    column_names: Optional[Sequence[str]] = None,
+    dtype=np.float64,
+) -> Tuple[List[str], np.ndarray]:
+    """Parse a GOMC Blk file's text, for only the requested columns.
+
+    The '#STEP' header is renamed from the header line, and only the
+    requested columns are parsed (usecols), directly into the float dtype
+    (not inferred), with pandas' C parser.  The pyarrow parser can not be
+    used, as the Blk columns are padded with a varying number of spaces.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    column_names : sequence of str or None, optional, default=None
+        The column names to parse (i.e., 'STEP' and 'TOT_DENS').
+        If None, all the columns are parsed.
+    dtype : numpy.float64 or numpy.float32, optional, default=numpy.float64
+        The float dtype of the data.
+
+    Returns
+    -------
+    column_names, data : list of str, numpy.ndarray
+        The parsed column names, in the Blk file's order, with '#STEP'
+        renamed to 'STEP', and the float data (rows=blocks,
+        columns=properties), which is stored column by column (Fortran order).
+    """
+    import pandas as pd
+
+    blk_column_names = get_blk_column_names(blk_filename)
+    if column_names is None:
+        column_names = blk_column_names
+    for column_name in column_names:
+        if column_name not in blk_column_names:
+            raise ValueError(
+                f"ERROR: The column '{column_name}' is not in the Blk file = "
+                f"{blk_filename}, which has the columns = {blk_column_names}."
+            )
+    column_names = [
+        column_name
+        for column_name in blk_column_names
+        if column_name in column_names
+    ]
+
+    data = pd.read_csv(
+        blk_filename,
+        sep=r"\s+",
+        header=None,
+        skiprows=1,
+        names=blk_column_names,
+        usecols=column_names,
+        dtype={column_name: dtype for column_name in column_names},
+        na_values="NaN",
+        index_col=False,
+        engine="c",
+    )
+
+    return column_names, np.asfortranarray(
+        data[column_names].to_numpy(dtype=dtype)
+    )
+
+
+def write_blk_cache(
+    blk_filename: str,
+    column_names: Optional[Sequence[str]] = None,
+) -> Tuple[List[str], np.ndarray]:
+    """Parse a Blk file and write its cache.
+
+    The data file is written before the meta data file, and both are
+    written atomically, so a partially written cache is never loaded.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    column_names : sequence of str or None, optional, default=None
+        The column names to parse and cache.  If None, all the columns are
+        parsed and cached.
+
+    Returns
+    -------
+    column_names, data : list of str, numpy.ndarray
+        The column names and the float64 data, which are parsed from the Blk
+        file.
+    """
+    source_key = get_blk_source_key(blk_filename)
+    column_names, data = read_blk_file(blk_filename, column_names=column_names)
+
+    cache_data_filename, cache_meta_filename = get_blk_cache_filenames(
+        blk_filename
+    )
+    try:
+        tmp_cache_data_filename = f"{cache_data_filename}.{os.getpid()}.npy"
+        np.save(tmp_cache_data_filename, data)
+        os.replace(tmp_cache_data_filename, cache_data_filename)
+
+        tmp_cache_meta_filename = f"{cache_meta_filename}.{os.getpid()}"
+        with open(tmp_cache_meta_filename, "w") as fp:
+            json.dump({"source": source_key, "column_names": column_names}, fp)
+        os.replace(tmp_cache_meta_filename, cache_meta_filename)
+    except OSError:
+        # the cache is optional (i.e., a read-only job directory)
+        pass
+
+    return column_names, data
+
+
+def load_blk_file(
+    blk_filename: str,
+    column_names: Optional[Sequence[str]] = None,
+    mmap_mode: str = "r",
+) -> Tuple[List[str], np.ndarray]:
+    """Load a Blk file from its cache, which is written if it is missing or out
+    of date.
+
+    The cache is only used if the Blk file has the same size and mtime as
+    when the cache was written, and it has the requested columns, so the Blk
+    text is only parsed once.  If the cache is missing any of the requested
+    columns, the requested and the already cached columns are parsed and
+    cached.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    column_names : sequence of str or None, optional, default=None
+        The column names needed (i.e., 'STEP' and 'TOT_DENS').
+        If None, all the columns are needed.
+    mmap_mode : str or None, optional, default="r"
+        The numpy.load memory-map mode for the cached data.
+        If None, the cached data is read into memory.
+
+    Returns
+    -------
+    column_names, data : list of str, numpy.ndarray
+        The cached column names, which include the requested columns, with
+        '#STEP' renamed to 'STEP', and the float64 data (rows=blocks,
+        columns=properties).
+    """
+    cached_column_names = []
+    cache_data_filename, cache_meta_filename = get_blk_cache_filenames(
+        blk_filename
+    )
+    try:
+        with open(cache_meta_filename, "r") as fp:
+            cache_meta = json.load(fp)
+        if cache_meta["source"] == get_blk_source_key(blk_filename):
+            cached_column_names = cache_meta["column_names"]
+            needed_column_names = (
+                get_blk_column_names(blk_filename)
+                if column_names is None
+                else column_names
+            )
+            if set(needed_column_names) <= set(cached_column_names):
+                return (
+                    cached_column_names,
+                    np.load(cache_data_filename, mmap_mode=mmap_mode),
+                )
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if column_names is not None:
+        column_names = set(column_names) | set(cached_column_names)
+
+    return write_blk_cache(blk_filename, column_names=column_names)
+
+
+def load_blk_dataframe(
+    blk_filename: str, column_names: Optional[Sequence[str]] = None
+):
+    """Load a Blk file from its cache as a pandas DataFrame.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    column_names : sequence of str or None, optional, default=None
+        The column names needed.  If None, all the columns are needed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The Blk data, which includes the needed columns, with the '#STEP'
+        column renamed to 'STEP'.
+    """
+    import pandas as pd
+
+    column_names, data = load_blk_file(blk_filename, column_names=column_names)
+
+    return pd.DataFrame(data, columns=column_names, copy=False)
+
+
+def clear_blk_cache(blk_filename: str) -> None:
+    """Remove a Blk file's cache, if it exists.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    """
+    for cache_filename in get_blk_cache_filenames(blk_filename):
+        if os.path.isfile(cache_filename):
+            os.remove(cache_filename)
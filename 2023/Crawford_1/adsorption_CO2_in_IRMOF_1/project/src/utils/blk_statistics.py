@@ -0,0 +1,335 @@
+"""Calculate the statistics of the GOMC block average (Blk_*.dat) file columns.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+from src.utils.blk_cache import blk_step_column_title, load_blk_file
+
+# the statistics calculated for each column, where the standard deviation is the
+# sample standard deviation (ddof=1) of the block averages, and the standard
+# error is the standard deviation / sqrt(count)
+blk_statistics_dtype = np.dtype(
+    [
+        ("count", np.int64),
+        ("mean", np.float64),
+        ("std", np.float64),
+        ("sem", np.float64),
+        ("min", np.float64),
+        ("max", np.float64),
+    ]
+)
+
+# the equilibrated statistics of each column, which are the statistics of the
+# uncorrelated (subsampled) blocks after the start of the equilibrated data,
+# where t0_step is the first equilibrated block's step, g is the statistical
+# inefficiency (the subsampling interval in blocks), and Neff is the number of
+# uncorrelated blocks
+blk_equilibrated_statistics_dtype = np.dtype(
+    blk_statistics_dtype.descr
+    + [
+        ("t0_step", np.float64),
+        ("g", np.float64),
+        ("Neff", np.float64),
+    ]
+)
+
+
+def get_column_statistics(
+    data: np.ndarray,
+    column_names: List[str],
+    statistics_column_names: Sequence[str],
+    rows=slice(None),
+) -> np.void:
+    """Calculate the nan-aware statistics of the columns, in one vectorized
+    pass.
+
+    The nan values are not counted (like numpy.nanmean).  A column with no
+    values has nan statistics, and a column with one value has a nan standard
+    deviation and standard error.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The 2-D float data (rows=blocks, columns=properties).
+    column_names : list of str
+        The data's column names.
+    statistics_column_names : sequence of str
+        The column names to calculate the statistics for.
+    rows : slice or numpy.ndarray, optional, default=slice(None)
+        The rows used in the statistics, as a slice, or as a boolean mask or
+        integer indices.
+
+    Returns
+    -------
+    numpy.void, structured record
+        A record with a field for each requested column, which has the
+        'count', 'mean', 'std', 'sem', 'min', and 'max' fields
+        (i.e., statistics["TOT_DENS"]["mean"]).
+    """
+    for statistics_column_name in statistics_column_names:
+        if statistics_column_name not in column_names:
+            raise ValueError(
+                f"ERROR: The column '{statistics_column_name}' is not in the "
+                f"data's columns = {column_names}."
+            )
+    column_indices = [
+        column_names.index(statistics_column_name)
+        for statistics_column_name in statistics_column_names
+    ]
+
+    # each column's values are made contiguous (rows=properties,
+    # columns=blocks), so the sums are the same pairwise sums as numpy.nanmean
+    # on a single column
+    values = np.ascontiguousarray(data.T[column_indices][:, rows])
+    nan_values = np.isnan(values)
+    count = values.shape[1] - np.count_nonzero(nan_values, axis=1)
+
+    statistics = np.empty(len(column_indices), dtype=blk_statistics_dtype)
+    statistics["count"] = count
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(nan_values, 0.0, values).sum(axis=1) / count
+        deviations = np.where(nan_values, 0.0, values - mean[:, np.newaxis])
+        std = np.where(
+            count > 1,
+            np.sqrt(np.square(deviations).sum(axis=1) / (count - 1)),
+            np.nan,
+        )
+        statistics["mean"] = mean
+        statistics["std"] = std
+        statistics["sem"] = std / np.sqrt(count)
+    statistics["min"] = np.where(
+        count > 0,
+        np.where(nan_values, np.inf, values).min(axis=1, initial=np.inf),
+        np.nan,
+    )
+    statistics["max"] = np.where(
+        count > 0,
+        np.where(nan_values, -np.inf, values).max(axis=1, initial=-np.inf),
+        np.nan,
+    )
+
+    # view the per column statistics as one record, with a field for each column
+    record_dtype = np.dtype(
+        [
+            (statistics_column_name, blk_statistics_dtype)
+            for statistics_column_name in statistics_column_names
+        ]
+    )
+
+    return statistics.view(record_dtype)[0]
+
+
+def get_step_window(steps: np.ndarray, step_start: int, step_finish: int):
+    """Get the rows in the step window (step_start <= step <= step_finish).
+
+    GOMC writes the Blk file blocks in step order, so the window is found with
+    a binary search (numpy.searchsorted) and returned as a slice, which selects
+    the rows without a copy.  If the steps are not sorted (i.e., nan steps or
+    appended restart files), a boolean mask of the rows is returned instead.
+
+    Parameters
+    ----------
+    steps : numpy.ndarray
+        The 1-D step column.
+    step_start : int
+        The first step in the window.
+    step_finish : int
+        The last step in the window.
+
+    Returns
+    -------
+    slice or numpy.ndarray
+        The rows in the step window, as a slice, or as a boolean mask if
+        the steps are not sorted.
+    """
+    if not np.all(steps[1:] >= steps[:-1]):
+        return (step_start <= steps) & (steps <= step_finish)
+
+    return slice(
+        int(np.searchsorted(steps, step_start, side="left")),
+        int(np.searchsorted(steps, step_finish, side="right")),
+    )
+
+
+def get_blk_statistics(
+    blk_filename: str,
+    statistics_column_names: Sequence[str],
+    step_start: int,
+    step_finish: int,
+) -> np.void:
+    """Calculate the statistics of a Blk file's columns, for the blocks in the
+    step window.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    statistics_column_names : sequence of str
+        The column names to calculate the statistics for (i.e., 'TOT_DENS').
+    step_start : int
+        The first step used in the statistics.
+    step_finish : int
+        The last step used in the statistics.
+
+    Returns
+    -------
+    numpy.void, structured record
+        A record with a field for each requested column, which has the
+        'count', 'mean', 'std', 'sem', 'min', and 'max' fields.
+    """
+    # only the step and the requested columns are parsed from the Blk text
+    column_names, data = load_blk_file(
+        blk_filename,
+        column_names=[blk_step_column_title] + list(statistics_column_names),
+    )
+    steps = data[:, column_names.index(blk_step_column_title)]
+
+    return get_column_statistics(
+        data,
+        column_names,
+        statistics_column_names,
+        rows=get_step_window(steps, step_start, step_finish),
+    )
+
+
+def get_subsampled_indices(number_of_samples: int, g: float) -> np.ndarray:
+    """Get the indices of the uncorrelated samples, subsampled by the
+    statistical inefficiency.
+
+    These are the same indices as pymbar's timeseries.subsampleCorrelatedData
+    (with conservative=False), which are every g samples, rounded to the nearest
+    sample, without repeats.
+
+    Parameters
+    ----------
+    number_of_samples : int
+        The number of (correlated) samples.
+    g : float
+        The statistical inefficiency (1 or greater).
+
+    Returns
+    -------
+    numpy.ndarray
+        The indices of the uncorrelated samples.
+    """
+    g = max(float(g), 1.0)
+    indices = np.rint(
+        np.arange(int(np.ceil(number_of_samples / g)) + 1) * g
+    ).astype(np.int64)
+
+    return np.unique(indices[indices < number_of_samples])
+
+
+def get_blk_equilibrated_statistics(
+    blk_filename: str,
+    statistics_column_names: Sequence[str],
+    step_start: int,
+    step_finish: int,
+    detect_equilibration: bool = True,
+) -> np.ndarray:
+    """Calculate the statistics of a Blk file's columns, for the equilibrated
+    and uncorrelated blocks.
+
+    The start of each column's equilibrated (production) data, t0, and its
+    statistical inefficiency, g, are detected in the step window (see
+    detect_equilibration_batch in 'src/analysis/equilibration.py'), and the
+    statistics are calculated for the blocks from t0, subsampled every g
+    blocks, so the standard error is for uncorrelated blocks.  The columns with
+    nan values in the step window are not checked, and use all the blocks.
+
+    Parameters
+    ----------
+    blk_filename : str
+        The Blk file name, including the path.
+    statistics_column_names : sequence of str
+        The column names to calculate the statistics for (i.e., 'TOT_DENS').
+    step_start : int
+        The first step used in the statistics.
+    step_finish : int
+        The last step used in the statistics.
+    detect_equilibration : bool, optional, default=True
+        Detect each column's equilibrated data.  If False, all the blocks in the
+        step window are used (t0 is the first block, g = 1, and Neff is the
+        number of blocks), which are the same statistics as get_blk_statistics.
+
+    Returns
+    -------
+    numpy.void, structured record
+        A record with a field for each requested column, which has the
+        'count', 'mean', 'std', 'sem', 'min', 'max', 't0_step', 'g', and
+        'Neff' fields.
+    """
+    column_names, data = load_blk_file(
+        blk_filename,
+        column_names=[blk_step_column_title] + list(statistics_column_names),
+    )
+    steps = data[:, column_names.index(blk_step_column_title)]
+    step_window_rows = np.arange(len(steps))[
+        get_step_window(steps, step_start, step_finish)
+    ]
+
+    # each column's values in the step window (rows=properties, columns=blocks)
+    column_indices = [
+        column_names.index(statistics_column_name)
+        for statistics_column_name in statistics_column_names
+    ]
+    values = np.ascontiguousarray(data.T[column_indices][:, step_window_rows])
+    number_of_columns, number_of_blocks = values.shape
+
+    t0 = np.zeros(number_of_columns, dtype=np.int64)
+    g = np.ones(number_of_columns, dtype=np.float64)
+    Neff = np.count_nonzero(~np.isnan(values), axis=1).astype(np.float64)
+    detected_columns = np.flatnonzero(
+        ~np.isnan(values).any(axis=1) & (values.std(axis=1) > 0)
+    )
+    if (
+        detect_equilibration
+        and number_of_blocks > 2
+        and len(detected_columns) > 0
+    ):
+        # the analysis packages are imported when used, like pandas in the
+        # operations
+        from src.analysis.equilibration import detect_equilibration_batch
+
+        [detected_t0, detected_g, detected_Neff] = detect_equilibration_batch(
+            values[detected_columns]
+        )
+        t0[detected_columns] = detected_t0
+        g[detected_columns] = detected_g
+        Neff[detected_columns] = detected_Neff
+
+    # the blocks which are not the equilibrated and uncorrelated blocks of a
+    # column are set to nan, so they are not counted in its statistics
+    used_values = np.full_like(values, np.nan)
+    for column_i in range(number_of_columns):
+        used_blocks = t0[column_i] + get_subsampled_indices(
+            number_of_blocks - t0[column_i], g[column_i]
+        )
+        used_values[column_i, used_blocks] = values[column_i, used_blocks]
+    column_statistics = get_column_statistics(
+        used_values.T, list(statistics_column_names), statistics_column_names
+    )
+
+    equilibrated_statistics = np.empty(
+        number_of_columns, dtype=blk_equilibrated_statistics_dtype
+    )
+    for field_name in blk_statistics_dtype.names:
+        equilibrated_statistics[field_name] = [
+            column_statistics[statistics_column_name][field_name]
+            for statistics_column_name in statistics_column_names
+        ]
+    equilibrated_statistics["t0_step"] = (
+        steps[step_window_rows[t0]] if number_of_blocks > 0 else np.nan
+    )
+    equilibrated_statistics["g"] = g
+    equilibrated_statistics["Neff"] = Neff
+
+    record_dtype = np.dtype(
+        [
+            (statistics_column_name, blk_equilibrated_statistics_dtype)
+            for statistics_column_name in statistics_column_names
+        ]
+    )
+
+    return equilibrated_statistics.view(record_dtype)[0]
@@ -0,0 +1,152 @@
+"""Cache the signac-flow label results for each job on disk."""
+
+import atexit
+import functools
+import json
+import os
+import threading
+from typing import Callable, List
+
+
+def get_file_stat(filename: str) -> List[int]:
+    """Return the [size, mtime_ns] of a file, or None if the file does not
+    exist.
+
+    Parameters
+    ----------
+    filename : str
+        The file name, including the path.
+    """
+    try:
+        file_stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+class LabelCache:
+    """Per-job cache of label results, keyed on the files each label inspects.
+
+    Each cached entry stores the label's result with the (path, size, mtime)
+    of every file the label reads.  A cached result is only used if none of
+    these files were created, removed, or changed (i.e., GOMC appending to an
+    output file changes its size and mtime) since the result was stored.
+    Otherwise, the label is recomputed and the entry is replaced.
+
+    The entries are stored in a sidecar JSON file in each job's directory,
+    rather than the job document, so the job document is not rewritten
+    or created when a label is evaluated.  The changed entries are kept in
+    memory, and each changed job's sidecar file is written once, by 'flush'
+    at the end of the process (i.e., after a status or submit pass), not on
+    every label evaluation.  A recomputed False result of a label whose files
+    are still changing (i.e., the output file of a running simulation) does
+    not change the job's sidecar file, as its next evaluation misses anyway.
+
+    Parameters
+    ----------
+    cache_filename : str, optional, default="label_cache.json"
+        The sidecar file name written in each job's directory.
+    """
+
+    def __init__(self, cache_filename: str = "label_cache.json"):
+        self.cache_filename = cache_filename
+        self._job_caches = {}
+        self._dirty_jobs = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _get_job_cache(self, job) -> dict:
+        """Load the job's cache from its sidecar file, once per process."""
+        with self._lock:
+            job_cache = self._job_caches.get(job.id)
+            if job_cache is None:
+                try:
+                    with open(job.fn(self.cache_filename), "r") as fp:
+                        job_cache = json.load(fp)
+                except (FileNotFoundError, ValueError):
+                    job_cache = {}
+                self._job_caches[job.id] = job_cache
+
+        return job_cache
+
+    def _write_job_cache(self, job, job_cache: dict) -> None:
+        """Atomically write the job's cache to its sidecar file."""
+        cache_file = job.fn(self.cache_filename)
+        tmp_cache_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_cache_file, "w") as fp:
+                json.dump(job_cache, fp)
+            os.replace(tmp_cache_file, cache_file)
+        except OSError:
+            # the cache is only an optimization, so a read only
+            # workspace just recomputes the labels.
+            if os.path.isfile(tmp_cache_file):
+                os.remove(tmp_cache_file)
+
+    def cached(self, inspected_files: Callable[..., List[str]]) -> Callable:
+        """Decorate a label function (job, *args) to cache its result.
+
+        Parameters
+        ----------
+        inspected_files : Callable[..., List[str]]
+            Function with the same arguments as the label function, which
+            returns the file names (relative to the job directory) the label
+            function reads or checks.
+        """
+
+        def decorator(label_func):
+            @functools.wraps(label_func)
+            def wrapper(job, *args):
+                entry_key = json.dumps([label_func.__name__, *args])
+                file_stats = [
+                    [filename, get_file_stat(job.fn(filename))]
+                    for filename in inspected_files(job, *args)
+                ]
+
+                job_cache = self._get_job_cache(job)
+                entry = job_cache.get(entry_key)
+                if entry is not None and entry["file_stats"] == file_stats:
+                    return entry["value"]
+
+                value = label_func(job, *args)
+                with self._lock:
+                    job_cache[entry_key] = {
+                        "file_stats": file_stats,
+                        "value": value,
+                    }
+                    # the files of a still False label are still changing
+                    if (
+                        entry is None
+                        or value is not False
+                        or entry["value"] is not False
+                    ):
+                        self._dirty_jobs[job.id] = job
+
+                return value
+
+            return wrapper
+
+        return decorator
+
+    def flush(self) -> None:
+        """Write the sidecar file of each job whose cache changed since the last
+        flush.
+        """
+        with self._lock:
+            for job_id, job in self._dirty_jobs.items():
+                self._write_job_cache(job, self._job_caches[job_id])
+            self._dirty_jobs.clear()
+
+    def clear(self, job=None) -> None:
+        """Clear the in-memory cache for a job, or for all jobs if job is None.
+
+        The changed entries which were not flushed are discarded.
+        """
+        with self._lock:
+            if job is None:
+                self._job_caches.clear()
+                self._dirty_jobs.clear()
+            else:
+                self._job_caches.pop(job.id, None)
+                self._dirty_jobs.pop(job.id, None)
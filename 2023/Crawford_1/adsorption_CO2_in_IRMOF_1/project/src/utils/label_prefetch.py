@@ -0,0 +1,132 @@
+"""Evaluate the signac-flow labels for many jobs in parallel on a thread pool.
+"""
+
+import contextlib
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+def get_unique_jobs(project, jobs=None) -> list:
+    """Get the unique signac jobs from the project, or from the jobs or
+    aggregates.
+
+    Parameters
+    ----------
+    project : signac project or FlowProject
+        The project, which provides all the jobs if jobs is None.
+    jobs : iterable of signac jobs or aggregates (tuples of jobs), optional,
+    default=None
+        The jobs or aggregates, as passed to the FlowProject's
+        'print_status' and 'submit' functions.
+
+    Returns
+    -------
+    list
+        The unique jobs, in the order they were first found.
+    """
+    unique_jobs = {}
+    for job_or_aggregate in project if jobs is None else jobs:
+        if hasattr(job_or_aggregate, "id"):
+            unique_jobs.setdefault(job_or_aggregate.id, job_or_aggregate)
+        else:
+            for job in job_or_aggregate:
+                unique_jobs.setdefault(job.id, job)
+
+    return list(unique_jobs.values())
+
+
+class LabelPrefetch:
+    """Prefetch the label results for many jobs on a bounded thread pool.
+
+    signac-flow evaluates the label and condition functions one job at a
+    time, so the status and submission are serialized on the file system's
+    latency.  The labels registered with 'memoized' are first evaluated for
+    all the jobs on a thread pool, and then flow's serial evaluation is answered
+    from these results, so the status and submission results are the same
+    as the serial evaluation.
+
+    The thread pool calls the undecorated label functions (i.e., without the
+    'flow.with_job' decorator), since changing the working directory is
+    not thread safe.  Therefore, the label functions must only use the job's
+    absolute paths (i.e., 'job.fn' and 'job.isfile').
+
+    The results are only used inside the 'prefetch' context, since the labels
+    change when the operations are run.
+    """
+
+    def __init__(self):
+        self._label_funcs = []
+        self._results = None
+        self._lock = threading.Lock()
+
+    def memoized(self, label_func: Callable) -> Callable:
+        """Decorate a label function so it uses the prefetched results, if
+        available.
+        """
+
+        @functools.wraps(label_func)
+        def wrapper(*jobs):
+            results = self._results
+            if results is not None and len(jobs) == 1:
+                result_key = (wrapper.__name__, jobs[0].id)
+                if result_key in results:
+                    return results[result_key]
+
+            return label_func(*jobs)
+
+        self._label_funcs.append(wrapper)
+
+        return wrapper
+
+    def _evaluate_job_labels(self, job) -> dict:
+        """Evaluate all the labels for a single job, skipping the labels that
+        raise errors.
+        """
+        job_results = {}
+        for label_func in self._label_funcs:
+            try:
+                job_results[(label_func.__name__, job.id)] = inspect.unwrap(
+                    label_func
+                )(job)
+            except Exception:
+                # flow reevaluates and reports the label's error
+                continue
+
+        return job_results
+
+    @contextlib.contextmanager
+    def prefetch(self, project, jobs=None, max_workers: int = 0):
+        """Context with the labels prefetched for the jobs on a thread pool.
+
+        Parameters
+        ----------
+        project : signac project or FlowProject
+            The project, which provides all the jobs if jobs is None.
+        jobs : iterable of signac jobs or aggregates (tuples of jobs), optional,
+        default=None
+            The jobs or aggregates to evaluate the labels for.
+        max_workers : int, optional, default=0
+            The maximum number of threads.  If less than 1, the labels
+            are not prefetched and flow evaluates them serially.
+        """
+        if max_workers < 1:
+            yield
+            return
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for job_results in executor.map(
+                self._evaluate_job_labels, get_unique_jobs(project, jobs)
+            ):
+                results.update(job_results)
+
+        with self._lock:
+            self._results = results
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._results = None
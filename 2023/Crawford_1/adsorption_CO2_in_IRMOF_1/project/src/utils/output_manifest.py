@@ -0,0 +1,215 @@
+"""Record the files written by each signac-flow operation in a per-job manifest.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import List
+
+output_manifest_filename = "output_manifest.json"
+
+_manifest_cache = {}
+_manifest_cache_lock = threading.Lock()
+
+
+def get_file_sha256(filename: str, chunk_size_bytes: int = 1024**2) -> str:
+    """Get the sha256 hex digest of a file, which is read in chunks.
+
+    Parameters
+    ----------
+    filename : str
+        The file name, including the path.
+    chunk_size_bytes : int, optional, default=1024**2
+        The number of bytes read per chunk.
+
+    Returns
+    -------
+    str
+        The sha256 hex digest of the file.
+    """
+    file_hash = hashlib.sha256()
+    with open(filename, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size_bytes), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def read_output_manifest(job) -> dict:
+    """Read the job's output manifest.
+
+    The manifest is only parsed again if its size or mtime changed, so
+    repeated reads (i.e., by several labels) cost a single stat call.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the output manifest.
+
+    Returns
+    -------
+    dict
+        The manifest, {operation_name: {filename: {"size": int, "sha256":
+        str}}}, or an empty dict if the manifest does not exist.
+    """
+    manifest_file = job.fn(output_manifest_filename)
+    try:
+        manifest_stat = os.stat(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+    manifest_key = (manifest_stat.st_size, manifest_stat.st_mtime_ns)
+    with _manifest_cache_lock:
+        cached_key, manifest = _manifest_cache.get(manifest_file, (None, None))
+    if cached_key == manifest_key:
+        return manifest
+
+    try:
+        with open(manifest_file, "r") as fp:
+            manifest = json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    with _manifest_cache_lock:
+        _manifest_cache[manifest_file] = (manifest_key, manifest)
+
+    return manifest
+
+
+def _write_output_manifest_file(job, manifest: dict) -> None:
+    """Write the job's output manifest atomically."""
+    manifest_file = job.fn(output_manifest_filename)
+    tmp_manifest_file = f"{manifest_file}.{os.getpid()}"
+    with open(tmp_manifest_file, "w") as fp:
+        json.dump(manifest, fp, indent=2)
+    os.replace(tmp_manifest_file, manifest_file)
+
+
+def write_output_manifest(
+    job, operation_name: str, filenames: List[str]
+) -> None:
+    """Record the files written by an operation, with their sizes and sha256
+    hashes.
+
+    This is called at the end of an operation, so the files are only recorded
+    if the operation completed.  The other operations' entries are kept,
+    and the manifest is written atomically.
+
+    Parameters
+    ----------
+    job : signac job
+        The job the operation was run on.
+    operation_name : str
+        The operation's name, which replaces any previous entry for this
+        operation.
+    filenames : list of str
+        The file names, relative to the job's directory, written by the
+        operation.
+    """
+    for filename in filenames:
+        if not job.isfile(filename):
+            raise ValueError(
+                f"ERROR: The '{filename}' file is not in the job's directory,"
+                f" so it can not be added to the '{operation_name}' output"
+                " manifest."
+            )
+
+    manifest = dict(read_output_manifest(job))
+    manifest[operation_name] = {
+        filename: {
+            "size": os.path.getsize(job.fn(filename)),
+            "sha256": get_file_sha256(job.fn(filename)),
+        }
+        for filename in filenames
+    }
+
+    _write_output_manifest_file(job, manifest)
+
+
+def remove_output_manifest_entry(job, operation_name: str) -> None:
+    """Remove an operation's recorded files from the job's output manifest.
+
+    This is called when an operation's files are no longer valid (i.e., they are
+    moved or will be rewritten), so the labels check the files again.  The other
+    operations' entries are kept, and the manifest is written atomically.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the output manifest.
+    operation_name : str
+        The operation's name, whose entry is removed if it exists.
+    """
+    manifest = dict(read_output_manifest(job))
+    if operation_name not in manifest:
+        return
+
+    del manifest[operation_name]
+    _write_output_manifest_file(job, manifest)
+
+
+def output_manifest_has_files(job, filenames: List[str]) -> bool:
+    """Check if all the files are recorded in the job's output manifest, and
+    still written.
+
+    Each recorded file is checked with a single stat call, that it still exists
+    with its recorded size, so the files removed or truncated after the
+    operation are not taken as written.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the output manifest.
+    filenames : list of str
+        The file names, relative to the job's directory.
+
+    Returns
+    -------
+    bool
+        True if all the files are recorded by any operation, and exist with
+        their recorded sizes, and False otherwise.
+    """
+    manifest = read_output_manifest(job)
+    recorded_files = {}
+    for operation_files in manifest.values():
+        recorded_files.update(operation_files)
+
+    for filename in filenames:
+        if filename not in recorded_files:
+            return False
+        try:
+            file_size = os.path.getsize(job.fn(filename))
+        except OSError:
+            return False
+        if file_size != recorded_files[filename]["size"]:
+            return False
+
+    return True
+
+
+def output_files_written(job, filenames: List[str]) -> bool:
+    """Check if the files are written, using the job's output manifest if
+    possible.
+
+    The files recorded in the manifest are taken as written if they still
+    exist with their recorded sizes, without reading them.  Otherwise (i.e.,
+    the jobs run before the manifest was added), each file is checked in the
+    job's directory.
+
+    Parameters
+    ----------
+    job : signac job
+        The job with the output manifest.
+    filenames : list of str
+        The file names, relative to the job's directory.
+
+    Returns
+    -------
+    bool
+        True if all the files are written, and False otherwise.
+    """
+    if output_manifest_has_files(job, filenames):
+        return True
+
+    return all(job.isfile(filename) for filename in filenames)
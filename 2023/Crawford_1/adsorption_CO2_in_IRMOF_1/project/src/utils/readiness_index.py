@@ -0,0 +1,101 @@
+"""Track which jobs in a signac project are ready for project wide aggregate
+operations.
+"""
+
+import os
+from typing import Callable
+
+import signac
+
+
+class ProjectReadinessIndex:
+    """Incremental index of the project's jobs that are not ready yet.
+
+    The aggregate preconditions that require every job in the project to be
+    ready (i.e., 'all(job_is_ready(j) for j in project)') would check every job
+    for every aggregate, which is quadratic in the number of jobs for each
+    status, run, or submit pass.  Instead, the index keeps the list of job ids
+    that are still pending.  Each call checks the pending jobs from the end of
+    the list, removing the ready jobs, and stops at the first job that is
+    not ready.  Therefore, each job is only checked until it is ready, and each
+    call checks at most one job that is not ready (amortized O(1) per call).
+
+    The pending list is rebuilt from all the project's jobs when the workspace
+    directory is modified (i.e., a job is added or removed), or when the
+    index is cleared.  Jobs are assumed to stay ready once they are ready
+    within a process (i.e., the analysis files are not removed during a run).
+
+    Parameters
+    ----------
+    job_is_ready : Callable
+        Function (or label) that accepts a signac job and returns
+        True if the job is ready, and False otherwise.
+    """
+
+    def __init__(self, job_is_ready: Callable):
+        self.job_is_ready = job_is_ready
+        self._pending_job_ids = {}
+        self._workspace_mtimes = {}
+        self._projects = {}
+
+    def _get_project(self, job, workspace: str):
+        """Get the job's project, once per workspace.
+
+        'job.project' is only available in signac 2.x, so in signac 1.x the
+        project is found by searching up from the job's workspace directory.
+        """
+        if workspace not in self._projects:
+            if hasattr(type(job), "project"):
+                self._projects[workspace] = job.project
+            else:
+                self._projects[workspace] = signac.get_project(
+                    root=workspace, search=True
+                )
+
+        return self._projects[workspace]
+
+    def _get_pending_job_ids(self, project, workspace: str) -> list:
+        """Get the project's pending job ids, rebuilt if the workspace was
+        modified.
+        """
+        workspace_mtime = os.stat(workspace).st_mtime_ns
+        if (
+            workspace not in self._pending_job_ids
+            or self._workspace_mtimes[workspace] != workspace_mtime
+        ):
+            self._pending_job_ids[workspace] = sorted(job.id for job in project)
+            self._workspace_mtimes[workspace] = workspace_mtime
+
+        return self._pending_job_ids[workspace]
+
+    def all_ready(self, *jobs) -> bool:
+        """Check if all the jobs in the project of the given jobs are ready.
+
+        Parameters
+        ----------
+        *jobs : signac jobs
+            The aggregate's jobs, which are all from the same project.
+
+        Returns
+        -------
+        bool
+            True if all the jobs in the project are ready, and False otherwise.
+        """
+        # the job's parent directory ('job.path' is not available in signac 1.7)
+        workspace = os.path.normpath(jobs[0].fn(os.pardir))
+        project = self._get_project(jobs[0], workspace)
+        pending_job_ids = self._get_pending_job_ids(project, workspace)
+        while len(pending_job_ids) > 0:
+            if not self.job_is_ready(project.open_job(id=pending_job_ids[-1])):
+                return False
+            pending_job_ids.pop()
+
+        return True
+
+    def clear(self) -> None:
+        """Clear the index, so all the jobs are checked again on the next
+        call.
+        """
+        self._pending_job_ids.clear()
+        self._workspace_mtimes.clear()
+        self._projects.clear()
@@ -0,0 +1,145 @@
+"""Benchmark loading the GOMC Blk_*.dat files from the binary columnar cache.
+
+Compares the original part_5a read (pd.read_csv with sep='\\s+', and
+renaming the '#STEP' column) against 'load_blk_dataframe' in
+'src/utils/blk_cache.py', for the first load (which parses the text and
+writes the cache) and the repeated loads (which memory-map the cache).
+Each load includes the nan-aware mean of every column, so the memory-mapped
+data is read.  The Blk files are synthetic S8 style files with GOMC's columns.
+
+Usage (from this directory):
+    python bench_blk_cache.py [number_of_rows ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+import numpy as np
+import pandas as pd
+from src.utils.blk_cache import load_blk_dataframe
+
+blk_column_titles = [
+    "#STEP",
+    "TOT_EN",
+    "EN_INTER",
+    "EN_TC",
+    "EN_INTRA(B)",
+    "EN_INTRA(NB)",
+    "EN_ELECT",
+    "EN_REAL",
+    "EN_RECIP",
+    "EN_SELF",
+    "EN_CORR",
+    "VIRIAL",
+    "PRESSURE",
+    "COMPRESSIBILITY",
+    "ENTHALPY",
+    "SURF_TENSION",
+    "VOLUME",
+    "TOT_MOL",
+    "TOT_DENS",
+    "HEAT_VAP",
+    "MOLFRACT_ICT",
+    "MOLFRACT_IOT",
+    "MOLFRACT_NDO",
+    "MOLFRACT_NDE",
+]
+
+number_of_repeated_loads = 5
+
+
+def write_synthetic_blk_file(blk_filename, number_of_rows):
+    """Write a synthetic Blk file in GOMC's format."""
+    rng = np.random.default_rng(0)
+    data = rng.normal(1.0, 0.1, size=(number_of_rows, len(blk_column_titles)))
+    data[:, 0] = np.arange(1, number_of_rows + 1) * 10000
+    with open(blk_filename, "w") as fp:
+        fp.write(
+            " ".join(f"{title: >16}" for title in blk_column_titles) + "\n"
+        )
+        np.savetxt(fp, data, fmt="%16.8e")
+
+
+def load_original(blk_filename):
+    """The original part_5a read of a Blk file."""
+    data_box = pd.read_csv(
+        blk_filename, sep=r"\s+", header=0, na_values="NaN", index_col=False
+    )
+    data_box = pd.DataFrame(data_box)
+    header_list = list(data_box.columns)
+    header_list[0] = "STEP"
+    data_box.columns = header_list
+
+    return data_box
+
+
+def time_function(func, *args):
+    """Return the wall time (s) of the function call and the column means."""
+    start_time_s = time.perf_counter()
+    data_box = func(*args)
+    column_means = np.nanmean(data_box.to_numpy(), axis=0)
+
+    return time.perf_counter() - start_time_s, (
+        list(data_box.columns),
+        column_means,
+    )
+
+
+def main(numbers_of_rows):
+    print(
+        f"{'rows': <10} {'read_csv_s': <12} {'cache_write_s': <14} "
+        f"{'cache_load_s': <14} {'speedup': <10} {'same_means': <10}"
+    )
+    for number_of_rows in numbers_of_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            blk_filename = os.path.join(
+                tmp_dir, "Blk_gomc_production_run_BOX_0.dat"
+            )
+            write_synthetic_blk_file(blk_filename, number_of_rows)
+
+            read_csv_s = min(
+                time_function(load_original, blk_filename)[0]
+                for _ in range(number_of_repeated_loads)
+            )
+            cache_write_s = time_function(load_blk_dataframe, blk_filename)[0]
+            cache_load_s = min(
+                time_function(load_blk_dataframe, blk_filename)[0]
+                for _ in range(number_of_repeated_loads)
+            )
+
+            # the cached data must give exactly the same columns and means
+            original_columns, original_means = time_function(
+                load_original, blk_filename
+            )[1]
+            cached_columns, cached_means = time_function(
+                load_blk_dataframe, blk_filename
+            )[1]
+            same_means = original_columns == cached_columns and np.array_equal(
+                original_means, cached_means
+            )
+
+        print(
+            f"{number_of_rows: <10} {read_csv_s: <12.4f} "
+            f"{cache_write_s: <14.4f} "
+            f"{cache_load_s: <14.4f} {read_csv_s / cache_load_s: <10.1f} "
+            f"{str(same_means): <10}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_rows) for number_of_rows in sys.argv[1:]]
+        or [10000, 100000, 1000000]
+    )
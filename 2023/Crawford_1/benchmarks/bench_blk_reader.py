@@ -0,0 +1,154 @@
+"""Benchmark parsing the GOMC Blk_*.dat files' text.
+
+Compares the original part_5a read (pd.read_csv with sep='\\s+' for all the
+columns with inferred dtypes, and renaming the '#STEP' column) against
+'read_blk_file' in 'src/utils/blk_cache.py', which only parses the columns
+the IRMOF-1 analysis needs (STEP, TOT_MOL, TOT_DENS, MOLFRACT_CO2, and
+MOLDENS_CO2) into a pinned float dtype.  The Blk files are synthetic IRMOF-1
+style files with GOMC's columns.
+
+Usage (from this directory):
+    python bench_blk_reader.py [number_of_rows ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "adsorption_CO2_in_IRMOF_1",
+        "project",
+    ),
+)
+
+import numpy as np
+import pandas as pd
+from src.utils.blk_cache import read_blk_file
+
+blk_column_titles = [
+    "#STEP",
+    "TOT_EN",
+    "EN_INTER",
+    "EN_TC",
+    "EN_INTRA(B)",
+    "EN_INTRA(NB)",
+    "EN_ELECT",
+    "EN_REAL",
+    "EN_RECIP",
+    "EN_SELF",
+    "EN_CORR",
+    "VIRIAL",
+    "PRESSURE",
+    "COMPRESSIBILITY",
+    "ENTHALPY",
+    "SURF_TENSION",
+    "VOLUME",
+    "TOT_MOL",
+    "TOT_DENS",
+    "MOLFRACT_CO2",
+    "MOLFRACT_IRMOF",
+    "MOLDENS_CO2",
+    "MOLDENS_IRMOF",
+]
+
+# the columns used in the IRMOF-1 part_5a analysis
+analysis_column_titles = [
+    "STEP",
+    "TOT_MOL",
+    "TOT_DENS",
+    "MOLFRACT_CO2",
+    "MOLDENS_CO2",
+]
+
+number_of_repeated_reads = 3
+
+
+def write_synthetic_blk_file(blk_filename, number_of_rows):
+    """Write a synthetic Blk file in GOMC's format."""
+    rng = np.random.default_rng(0)
+    data = rng.normal(1.0, 0.1, size=(number_of_rows, len(blk_column_titles)))
+    data[:, 0] = np.arange(1, number_of_rows + 1) * 10000
+    with open(blk_filename, "w") as fp:
+        fp.write(
+            " ".join(f"{title: >16}" for title in blk_column_titles) + "\n"
+        )
+        np.savetxt(fp, data, fmt="%16.8e")
+
+
+def read_original(blk_filename):
+    """The original part_5a read of a Blk file."""
+    data_box = pd.read_csv(
+        blk_filename, sep=r"\s+", header=0, na_values="NaN", index_col=False
+    )
+    data_box = pd.DataFrame(data_box)
+    header_list = list(data_box.columns)
+    header_list[0] = "STEP"
+    data_box.columns = header_list
+
+    return data_box.loc[:, analysis_column_titles].to_numpy()
+
+
+def read_projected(blk_filename, dtype):
+    """The column-projected and dtype-pinned read of a Blk file."""
+    return read_blk_file(
+        blk_filename, column_names=analysis_column_titles, dtype=dtype
+    )[1]
+
+
+def time_function(func, *args):
+    """Return the best wall time (s) of the function calls and the data."""
+    times_s = []
+    for _ in range(number_of_repeated_reads):
+        start_time_s = time.perf_counter()
+        data = func(*args)
+        times_s.append(time.perf_counter() - start_time_s)
+
+    return min(times_s), data
+
+
+def main(numbers_of_rows):
+    print(
+        f"{'rows': <10} {'read_csv_s': <12} {'float64_s': <12} "
+        f"{'float32_s': <12} "
+        f"{'speedup_64': <12} {'speedup_32': <12} {'same_data': <10}"
+    )
+    for number_of_rows in numbers_of_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            blk_filename = os.path.join(
+                tmp_dir, "Blk_gomc_production_run_BOX_0.dat"
+            )
+            write_synthetic_blk_file(blk_filename, number_of_rows)
+
+            read_csv_s, original_data = time_function(
+                read_original, blk_filename
+            )
+            float64_s, float64_data = time_function(
+                read_projected, blk_filename, np.float64
+            )
+            float32_s, _ = time_function(
+                read_projected, blk_filename, np.float32
+            )
+
+            # the float64 data must be exactly the same as the original data
+            same_data = np.array_equal(
+                original_data, float64_data, equal_nan=True
+            )
+
+        print(
+            f"{number_of_rows: <10} {read_csv_s: <12.3f} {float64_s: <12.3f} "
+            f"{float32_s: <12.3f} "
+            f"{read_csv_s / float64_s: <12.1f} "
+            f"{read_csv_s / float32_s: <12.1f} {str(same_data): <10}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_rows) for number_of_rows in sys.argv[1:]]
+        or [100000, 1000000]
+    )
@@ -0,0 +1,167 @@
+"""Benchmark the statistics of the GOMC Blk_*.dat file columns.
+
+Compares the original part_5a averages (a DataFrame query on the step range,
+and then a list, np.transpose, and np.nanmean round-trip for each column)
+against 'get_blk_statistics' in 'src/utils/blk_statistics.py', which
+calculates the count, mean, std, sem, min, and max of all the columns in one
+vectorized pass.  Both load the Blk file from its binary cache, which is
+written before the timings.  The Blk files are synthetic S8 style files with
+GOMC's columns and some nan values.
+
+Usage (from this directory):
+    python bench_blk_statistics.py [number_of_rows ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+import numpy as np
+from src.utils.blk_cache import load_blk_dataframe
+from src.utils.blk_statistics import get_blk_statistics
+
+blk_column_titles = [
+    "#STEP",
+    "TOT_EN",
+    "EN_INTER",
+    "EN_TC",
+    "EN_INTRA(B)",
+    "EN_INTRA(NB)",
+    "EN_ELECT",
+    "EN_REAL",
+    "EN_RECIP",
+    "EN_SELF",
+    "EN_CORR",
+    "VIRIAL",
+    "PRESSURE",
+    "COMPRESSIBILITY",
+    "ENTHALPY",
+    "SURF_TENSION",
+    "VOLUME",
+    "TOT_MOL",
+    "TOT_DENS",
+    "HEAT_VAP",
+    "MOLFRACT_ICT",
+    "MOLFRACT_IOT",
+    "MOLFRACT_NDO",
+    "MOLFRACT_NDE",
+]
+
+# the columns averaged in the S8 part_5a analysis
+statistics_column_titles = [
+    "PRESSURE",
+    "TOT_MOL",
+    "TOT_DENS",
+    "VOLUME",
+    "HEAT_VAP",
+    "COMPRESSIBILITY",
+    "MOLFRACT_ICT",
+    "MOLFRACT_IOT",
+    "MOLFRACT_NDO",
+    "MOLFRACT_NDE",
+]
+
+step_start = 0
+step_finish = 1 * 10**12
+
+number_of_repeated_calculations = 5
+
+
+def write_synthetic_blk_file(blk_filename, number_of_rows):
+    """Write a synthetic Blk file in GOMC's format, with some nan values."""
+    rng = np.random.default_rng(0)
+    data = rng.normal(1.0, 0.1, size=(number_of_rows, len(blk_column_titles)))
+    data[:, 0] = np.arange(1, number_of_rows + 1) * 10000
+    data[::97, 1:] = np.nan
+    with open(blk_filename, "w") as fp:
+        fp.write(
+            " ".join(f"{title: >16}" for title in blk_column_titles) + "\n"
+        )
+        np.savetxt(fp, data, fmt="%16.8e")
+
+
+def get_original_means(blk_filename):
+    """The original part_5a averages of the columns."""
+    data_box = load_blk_dataframe(blk_filename)
+    data_box = data_box.query(f"{step_start} <= STEP <= {step_finish}")
+
+    column_means = []
+    for statistics_column_title in statistics_column_titles:
+        column_values = data_box.loc[:, statistics_column_title]
+        column_values = list(column_values)
+        column_values = np.transpose(column_values)
+        column_means.append(np.nanmean(column_values))
+
+    return column_means
+
+
+def get_kernel_means(blk_filename):
+    """The averages of the columns from the vectorized statistics."""
+    statistics = get_blk_statistics(
+        blk_filename, statistics_column_titles, step_start, step_finish
+    )
+
+    return [
+        statistics[statistics_column_title]["mean"]
+        for statistics_column_title in statistics_column_titles
+    ]
+
+
+def time_function(func, *args):
+    """Return the best wall time (s) of the function calls and the column
+    means.
+    """
+    times_s = []
+    for _ in range(number_of_repeated_calculations):
+        start_time_s = time.perf_counter()
+        column_means = func(*args)
+        times_s.append(time.perf_counter() - start_time_s)
+
+    return min(times_s), column_means
+
+
+def main(numbers_of_rows):
+    print(
+        f"{'rows': <10} {'per_column_s': <14} {'kernel_s': <12} "
+        f"{'speedup': <10} {'same_means': <10}"
+    )
+    for number_of_rows in numbers_of_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            blk_filename = os.path.join(
+                tmp_dir, "Blk_gomc_production_run_BOX_0.dat"
+            )
+            write_synthetic_blk_file(blk_filename, number_of_rows)
+
+            # write the cache, so only the statistics are timed
+            load_blk_dataframe(blk_filename)
+
+            per_column_s, original_means = time_function(
+                get_original_means, blk_filename
+            )
+            kernel_s, kernel_means = time_function(
+                get_kernel_means, blk_filename
+            )
+            same_means = original_means == kernel_means
+
+        print(
+            f"{number_of_rows: <10} {per_column_s: <14.4f} {kernel_s: <12.4f} "
+            f"{per_column_s / kernel_s: <10.1f} {str(same_means): <10}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_rows) for number_of_rows in sys.argv[1:]]
+        or [10000, 100000, 1000000]
+    )
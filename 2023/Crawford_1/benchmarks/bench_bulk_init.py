@@ -0,0 +1,120 @@
+"""Benchmark initializing large state point sweeps.
+
+Compares the original init.py loop (open_job(...).init() for each state point)
+against 'init_jobs_in_bulk' in 'src/utils/bulk_init.py', for a new workspace
+and for rerunning the initialization on the existing workspace.  The state
+points are an IRMOF-1 style temperature, pressure (with the linked fugacity),
+and replica sweep.
+
+Usage (from this directory):
+    python bench_bulk_init.py [number_of_statepoints ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "adsorption_CO2_in_IRMOF_1",
+        "project",
+    ),
+)
+
+import signac
+from src.utils.bulk_init import get_statepoint_product, init_jobs_in_bulk
+
+replicas = [0, 1, 2, 3, 4]
+production_temperatures_K = [298, 308, 318, 328]
+
+
+def get_total_statepoints(number_of_statepoints):
+    """Get about number_of_statepoints IRMOF-1 style state points."""
+    number_of_pressures = max(
+        1,
+        number_of_statepoints
+        // (len(replicas) * len(production_temperatures_K)),
+    )
+    pressure_to_fugacity_dict = {
+        round(0.01 * (pressure_i + 1), 6): round(0.0099 * (pressure_i + 1), 16)
+        for pressure_i in range(number_of_pressures)
+    }
+
+    return get_statepoint_product(
+        {
+            "molecule": ["CO2"],
+            "production_temperature_K": production_temperatures_K,
+            "production_pressure_bar": list(pressure_to_fugacity_dict.keys()),
+            "replica_number_int": replicas,
+        },
+        linked_statepoint_values={
+            "production_fugacity_bar": (
+                "production_pressure_bar",
+                pressure_to_fugacity_dict,
+            ),
+        },
+    )
+
+
+def init_jobs_in_loop(project, total_statepoints):
+    """The original init.py loop."""
+    for sp in total_statepoints:
+        project.open_job(
+            statepoint=sp,
+        ).init()
+
+
+def time_function(func, *args):
+    """Return the wall time (s) of the function call."""
+    start_time_s = time.perf_counter()
+    func(*args)
+
+    return time.perf_counter() - start_time_s
+
+
+def main(numbers_of_statepoints):
+    print(
+        f"{'statepoints': <12} {'loop_new_s': <12} {'bulk_new_s': <12} "
+        f"{'loop_rerun_s': <14} {'bulk_rerun_s': <14} {'same_jobs': <10}"
+    )
+    for number_of_statepoints in numbers_of_statepoints:
+        total_statepoints = get_total_statepoints(number_of_statepoints)
+        with tempfile.TemporaryDirectory() as loop_root:
+            with tempfile.TemporaryDirectory() as bulk_root:
+                loop_project = signac.init_project(root=loop_root)
+                bulk_project = signac.init_project(root=bulk_root)
+
+                loop_new_s = time_function(
+                    init_jobs_in_loop, loop_project, total_statepoints
+                )
+                bulk_new_s = time_function(
+                    init_jobs_in_bulk, bulk_project, total_statepoints
+                )
+                loop_rerun_s = time_function(
+                    init_jobs_in_loop, loop_project, total_statepoints
+                )
+                bulk_rerun_s = time_function(
+                    init_jobs_in_bulk, bulk_project, total_statepoints
+                )
+
+                same_jobs = sorted(job.id for job in loop_project) == sorted(
+                    job.id for job in bulk_project
+                )
+
+        print(
+            f"{len(total_statepoints): <12} {loop_new_s: <12.3f} "
+            f"{bulk_new_s: <12.3f} "
+            f"{loop_rerun_s: <14.3f} {bulk_rerun_s: <14.3f} "
+            f"{str(same_jobs): <10}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_statepoints) for number_of_statepoints in sys.argv[1:]]
+        or [1000, 10000]
+    )
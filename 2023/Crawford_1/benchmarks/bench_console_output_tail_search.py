@@ -0,0 +1,111 @@
+"""Benchmark the GOMC console output completion checks on large synthetic logs.
+
+Compares the original full file scan (readlines of the whole 'out_<name>.dat'
+file) against the tail search in 'src/utils/console_output.py', for both
+a completed simulation (footer at the end) and a running simulation (no footer).
+
+Usage (from this directory):
+    python bench_console_output_tail_search.py [size_MB ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+from src.utils.console_output import gomc_console_output_completed
+
+
+def legacy_gomc_sim_completed_properly(output_log_file):
+    """The original full file scan used in the project.py files."""
+    job_run_properly_bool = False
+    with open(output_log_file, "r") as fp:
+        out_gomc = fp.readlines()
+        for i, line in enumerate(out_gomc):
+            if "Move" in line:
+                split_move_line = line.split()
+                if (
+                    split_move_line[0] == "Move"
+                    and split_move_line[1] == "Type"
+                    and split_move_line[2] == "Mol."
+                    and split_move_line[3] == "Kind"
+                ):
+                    job_run_properly_bool = True
+
+    return job_run_properly_bool
+
+
+def write_synthetic_gomc_log(filename, size_MB, completed):
+    """Write a GOMC like console output file of about size_MB megabytes."""
+    energy_line = (
+        "ENER_0:        50000     -1.2345678e+05      0.0000000e+00"
+        "     -1.2345678e+05      1.2345678e+03     -4.5678901e+02\n"
+    )
+    lines_per_block = 10**4
+    block = energy_line * lines_per_block
+    with open(filename, "w") as fp:
+        for _ in range(max(1, int(size_MB * 1024**2 / len(block)))):
+            fp.write(block)
+        if completed:
+            fp.write("\n")
+            fp.write("Move Type Mol. Kind BOX_0 BOX_1\n")
+            for move_i in range(50):
+                fp.write(f"Displacement {move_i} Tries 1000 Accepted 500\n")
+            fp.write("\nTotal time: 3600.0 sec.\n")
+
+
+def time_function(func, filename, repeats=3):
+    """Return the best wall time (s) of repeated calls and the function
+    result.
+    """
+    best_time_s = float("inf")
+    result = None
+    for _ in range(repeats):
+        start_time_s = time.perf_counter()
+        result = func(filename)
+        best_time_s = min(best_time_s, time.perf_counter() - start_time_s)
+
+    return best_time_s, result
+
+
+def main(sizes_MB):
+    print(
+        f"{'size_MB': <10} {'footer': <8} {'full_scan_s': <14} "
+        f"{'tail_search_s': <14} {'speedup': <10} {'same_result': <12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_MB in sizes_MB:
+            for completed in [True, False]:
+                filename = os.path.join(
+                    tmp_dir, f"out_{size_MB}_{completed}.dat"
+                )
+                write_synthetic_gomc_log(filename, size_MB, completed)
+
+                full_scan_s, full_scan_result = time_function(
+                    legacy_gomc_sim_completed_properly, filename
+                )
+                tail_search_s, tail_search_result = time_function(
+                    gomc_console_output_completed, filename
+                )
+                print(
+                    f"{size_MB: <10} {str(completed): <8} "
+                    f"{full_scan_s: <14.5f} "
+                    f"{tail_search_s: <14.5f} "
+                    f"{full_scan_s / tail_search_s: <10.1f} "
+                    f"{str(full_scan_result == tail_search_result): <12}"
+                )
+                os.remove(filename)
+
+
+if __name__ == "__main__":
+    main([float(size_MB) for size_MB in sys.argv[1:]] or [10, 100, 500])
@@ -0,0 +1,250 @@
+"""Benchmark the steps saved by the convergence controller of the GOMC
+production runs.
+
+A sweep of statepoints is replayed, where each statepoint's density is a
+synthetic AR(1) series (x_t = phi * x_t-1 + noise) with an initial decaying
+transient, one value per Blk file block, with a different correlation (phi) for
+each statepoint.  Each series is grown in chunks of blocks, like a running
+production simulation, and after each chunk 'check_convergence' in the S8
+project's 'src/utils/convergence_controller.py' is run, until the target
+relative standard error (sem) is reached or the fixed budget of blocks
+(gomc_steps_production / gomc_output_data_every_X_steps) is used.
+
+The replicas of each statepoint show if the stopped runs' sem is the real error,
+as the standard deviation of the replicas' means (the real error) should be
+about the same as the mean of the replicas' estimated sem.
+
+The noble gas production runs are also replayed, where each window's Free_Energy
+file has a constant dU/dL(Coulomb) column (0, as the noble gases are uncharged)
+and an AR(1) dU/dL(VDW) column, with the noble gas project's "dU/dL" target (all
+the dU/dL columns), so the constant column must not stop the runs from
+converging.
+
+Usage (from this directory):
+    python bench_convergence_controller.py [number_of_replicas] [target_relative_sem]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+import numpy as np
+from src.utils.convergence_controller import FollowedFile, check_convergence
+
+# the S8 production run's fixed budget, 60 * 10**6 steps with a Blk row every 50
+# * 10**3 steps
+number_of_budget_blocks = 1200
+steps_per_block = 50 * 10**3
+
+# the blocks written between the convergence checks
+number_of_blocks_per_check = 20
+
+# the statepoints' AR(1) correlations, where the density's relative standard
+# deviation is 0.02
+statepoint_phis = [0.3, 0.6, 0.8, 0.9, 0.95]
+relative_std = 0.02
+mean_density = 800.0
+
+
+def get_density_series(phi, seed):
+    """Get a synthetic density series, with an initial transient decaying over
+    the first 50 blocks.
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=number_of_budget_blocks) * np.sqrt(1 - phi**2)
+    x_t = np.empty(number_of_budget_blocks)
+    x_t[0] = noise[0]
+    for t in range(1, number_of_budget_blocks):
+        x_t[t] = phi * x_t[t - 1] + noise[t]
+
+    return mean_density * (
+        1
+        + relative_std * x_t
+        + 0.1 * np.exp(-np.arange(number_of_budget_blocks) / 50)
+    )
+
+
+def replay_production_run(blk_filename, density_t, target_relative_sem):
+    """Grow the Blk file in chunks until the density converges, and return the
+    last check's convergence.
+    """
+    with open(blk_filename, "w") as fp:
+        fp.write(f"{'#STEP': >16} {'TOT_DENS': >16}\n")
+
+    followed_file = FollowedFile(blk_filename)
+    targets = [(blk_filename, "TOT_DENS", target_relative_sem, "relative")]
+    for chunk_end in range(
+        number_of_blocks_per_check,
+        number_of_budget_blocks + 1,
+        number_of_blocks_per_check,
+    ):
+        chunk_start = chunk_end - number_of_blocks_per_check
+        with open(blk_filename, "a") as fp:
+            for block_i in range(chunk_start, chunk_end):
+                fp.write(
+                    f"{(block_i + 1) * steps_per_block: >16} "
+                    f"{density_t[block_i]: >16.8e}\n"
+                )
+
+        followed_file.read_appended_rows()
+        convergence = check_convergence({blk_filename: followed_file}, targets)
+        if convergence["converged"]:
+            break
+
+    return chunk_end, convergence
+
+
+# the noble gas production run's fixed budget, 50 * 10**6 steps with a
+# Free_Energy row every 10**4 steps, and its
+# production_run_target_sem_dU_dL_kJ_per_mol
+number_of_free_energy_budget_rows = 5000
+steps_per_free_energy_row = 10**4
+number_of_free_energy_rows_per_check = 250
+target_sem_dU_dL = 0.1
+
+
+def replay_free_energy_production_run(free_energy_filename, dU_dL_vdw_t):
+    """Grow the Free_Energy file in chunks until its dU/dL columns converge, and
+    return the last check's convergence.
+    """
+    with open(free_energy_filename, "w") as fp:
+        fp.write(
+            " ".join(
+                f"{title: >28}"
+                for title in ["#Steps", "dU/dL(Coulomb)", "dU/dL(VDW)"]
+            )
+            + "\n"
+        )
+
+    followed_file = FollowedFile(free_energy_filename)
+    targets = [(free_energy_filename, "dU/dL", target_sem_dU_dL, "absolute")]
+    for chunk_end in range(
+        number_of_free_energy_rows_per_check,
+        number_of_free_energy_budget_rows + 1,
+        number_of_free_energy_rows_per_check,
+    ):
+        chunk_start = chunk_end - number_of_free_energy_rows_per_check
+        with open(free_energy_filename, "a") as fp:
+            for row_i in range(chunk_start, chunk_end):
+                fp.write(
+                    f"{(row_i + 1) * steps_per_free_energy_row: >28} "
+                    f"{0.0: >28.10e} {dU_dL_vdw_t[row_i]: >28.10e}\n"
+                )
+
+        followed_file.read_appended_rows()
+        convergence = check_convergence(
+            {free_energy_filename: followed_file}, targets
+        )
+        if convergence["converged"]:
+            break
+
+    return chunk_end, convergence
+
+
+def main_free_energy(number_of_replicas):
+    print(
+        f"{'phi': <6} {'stopped_rows': <13} {'steps_saved_%': <14} "
+        f"{'converged_%': <12} "
+        f"{'Coulomb_Neff': <13} {'Coulomb_sem': <12} {'VDW_Neff': <9} "
+        f"{'VDW_sem': <8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        free_energy_filename = os.path.join(
+            tmp_dir, "Free_Energy_BOX_0_gomc_production_run_initial_state_0.dat"
+        )
+        for phi in statepoint_phis:
+            stopped_rows, converged, columns = [], [], {}
+            for replica_i in range(number_of_replicas):
+                rng = np.random.default_rng(replica_i)
+                noise = rng.normal(
+                    size=number_of_free_energy_budget_rows
+                ) * np.sqrt(1 - phi**2)
+                x_t = np.empty(number_of_free_energy_budget_rows)
+                x_t[0] = noise[0]
+                for t in range(1, number_of_free_energy_budget_rows):
+                    x_t[t] = phi * x_t[t - 1] + noise[t]
+                number_of_rows, convergence = replay_free_energy_production_run(
+                    free_energy_filename, -2.0 + x_t
+                )
+                stopped_rows.append(number_of_rows)
+                converged.append(convergence["converged"])
+                for target in convergence["targets"]:
+                    columns.setdefault(target["column_name"], []).append(
+                        (target["Neff"], target["sem"])
+                    )
+
+            coulomb = np.mean(columns["dU/dL(Coulomb)"], axis=0)
+            vdw = np.mean(columns["dU/dL(VDW)"], axis=0)
+            print(
+                f"{phi: <6} {np.mean(stopped_rows): <13.0f} "
+                f"{100 * (1 - np.mean(stopped_rows) / number_of_free_energy_budget_rows): <14.1f} "
+                f"{100 * np.mean(converged): <12.0f} {coulomb[0]: <13.1f} "
+                f"{coulomb[1]: <12.4f} "
+                f"{vdw[0]: <9.1f} {vdw[1]: <8.4f}"
+            )
+
+
+def main(number_of_replicas, target_relative_sem):
+    print(
+        f"{'phi': <6} {'stopped_blocks': <15} {'steps_saved_%': <14} "
+        f"{'converged_%': <12} "
+        f"{'mean_sem': <10} {'replicas_std': <13} {'check_ms': <9}"
+    )
+    total_blocks = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        blk_filename = os.path.join(
+            tmp_dir, "Blk_gomc_production_run_BOX_0.dat"
+        )
+        for phi in statepoint_phis:
+            stopped_blocks, converged, means, sems = [], [], [], []
+            start_time_s = time.perf_counter()
+            for replica_i in range(number_of_replicas):
+                density_t = get_density_series(phi, seed=replica_i)
+                number_of_blocks, convergence = replay_production_run(
+                    blk_filename, density_t, target_relative_sem
+                )
+                stopped_blocks.append(number_of_blocks)
+                converged.append(convergence["converged"])
+                means.append(convergence["targets"][0]["mean"])
+                sems.append(convergence["targets"][0]["sem"])
+            check_ms = (
+                1000
+                * (time.perf_counter() - start_time_s)
+                / (sum(stopped_blocks) / number_of_blocks_per_check)
+            )
+            total_blocks += sum(stopped_blocks)
+
+            print(
+                f"{phi: <6} {np.mean(stopped_blocks): <15.0f} "
+                f"{100 * (1 - np.mean(stopped_blocks) / number_of_budget_blocks): <14.1f} "
+                f"{100 * np.mean(converged): <12.0f} {np.mean(sems): <10.4f} "
+                f"{np.std(means, ddof=1): <13.4f} {check_ms: <9.2f}"
+            )
+
+    print(
+        "Steps saved over the sweep: "
+        f"{100 * (1 - total_blocks / (number_of_budget_blocks * number_of_replicas * len(statepoint_phis))):.1f} %"
+    )
+
+    print(
+        "The noble gas production runs, with a constant dU/dL(Coulomb) column:"
+    )
+    main_free_energy(number_of_replicas)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.002,
+    )
@@ -0,0 +1,193 @@
+"""Benchmark the batched equilibration detection over the Blk files of a
+workspace.
+
+A synthetic workspace of S8 style jobs (two Blk files per job, one for each
+box) is written, and the equilibration of the density, energy, pressure, and
+mol fraction columns of every Blk file is detected with:
+    - a Python loop calling pymbar's timeseries.detectEquilibration
+      (detect_equilibration in pymbar 4) on each series,
+    - a Python loop calling 'detect_equilibration' in the noble gas
+      project's 'src/analysis/equilibration.py' on each series,
+    - a single 'detect_equilibration_batch' call on all the series stacked
+      in a 2-D array (rows=series, columns=blocks), optionally split over
+      processes.
+The t0, g, and Neff of every series must be the same for all the methods.
+Each column is a synthetic AR(1) series with an initial transient.  The Blk
+files are read before the timings, so only the equilibration detection is timed.
+
+Usage (from this directory):
+    python bench_equilibration_batch.py [number_of_jobs] [number_of_rows] [processes]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+import numpy as np
+import pandas as pd
+from pymbar import timeseries
+from src.analysis.equilibration import (
+    detect_equilibration,
+    detect_equilibration_batch,
+)
+
+# pymbar 3 (the repo's environment) and pymbar 4 names
+pymbar_detect_equilibration = (
+    getattr(timeseries, "detectEquilibration", None)
+    or timeseries.detect_equilibration
+)
+
+blk_column_titles = [
+    "#STEP",
+    "TOT_EN",
+    "EN_INTER",
+    "EN_TC",
+    "EN_INTRA(B)",
+    "EN_INTRA(NB)",
+    "EN_ELECT",
+    "EN_REAL",
+    "EN_RECIP",
+    "EN_SELF",
+    "EN_CORR",
+    "VIRIAL",
+    "PRESSURE",
+    "COMPRESSIBILITY",
+    "ENTHALPY",
+    "SURF_TENSION",
+    "VOLUME",
+    "TOT_MOL",
+    "TOT_DENS",
+    "HEAT_VAP",
+    "MOLFRACT_ICT",
+    "MOLFRACT_IOT",
+    "MOLFRACT_NDO",
+    "MOLFRACT_NDE",
+]
+
+# the density, energy, pressure, and mol fraction columns
+equilibration_column_titles = [
+    "TOT_DENS",
+    "TOT_EN",
+    "PRESSURE",
+    "MOLFRACT_ICT",
+    "MOLFRACT_IOT",
+    "MOLFRACT_NDO",
+    "MOLFRACT_NDE",
+]
+
+
+def write_synthetic_blk_file(blk_filename, number_of_rows, seed):
+    """Write a synthetic Blk file in GOMC's format, where each column is an
+    AR(1) series with a transient.
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=(number_of_rows, len(blk_column_titles)))
+    phis = rng.uniform(0.3, 0.95, size=len(blk_column_titles))
+    data = np.empty_like(noise)
+    data[0] = noise[0]
+    for row in range(1, number_of_rows):
+        data[row] = phis * data[row - 1] + noise[row]
+    transient_heights = rng.uniform(0, 5, size=len(blk_column_titles))
+    data += (
+        transient_heights
+        * np.exp(-np.arange(number_of_rows) / (0.05 * number_of_rows))[
+            :, np.newaxis
+        ]
+    )
+    data[:, 0] = np.arange(1, number_of_rows + 1) * 10000
+    with open(blk_filename, "w") as fp:
+        fp.write(
+            " ".join(f"{title: >16}" for title in blk_column_titles) + "\n"
+        )
+        np.savetxt(fp, data, fmt="%16.8e")
+
+
+def time_function(func, *args, **kwargs):
+    """Return the wall time (s) of the function call and its result."""
+    start_time_s = time.perf_counter()
+    result = func(*args, **kwargs)
+
+    return time.perf_counter() - start_time_s, result
+
+
+def detect_equilibration_loop(detect_equilibration_function, a_kt):
+    """Detect the equilibration of each series with a Python loop."""
+    return [
+        np.array(results)
+        for results in zip(
+            *[detect_equilibration_function(a_t) for a_t in a_kt]
+        )
+    ]
+
+
+def main(number_of_jobs, number_of_rows, processes):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        series = []
+        for job_i in range(number_of_jobs):
+            for box in [0, 1]:
+                blk_filename = os.path.join(
+                    tmp_dir, f"Blk_job_{job_i}_BOX_{box}.dat"
+                )
+                write_synthetic_blk_file(
+                    blk_filename, number_of_rows, seed=2 * job_i + box
+                )
+                data_box = pd.read_csv(
+                    blk_filename,
+                    sep=r"\s+",
+                    header=0,
+                    na_values="NaN",
+                    index_col=False,
+                )
+                series.append(
+                    data_box.loc[:, equilibration_column_titles].to_numpy().T
+                )
+    a_kt = np.concatenate(series)
+
+    pymbar_loop_s, pymbar_results = time_function(
+        detect_equilibration_loop, pymbar_detect_equilibration, a_kt
+    )
+    fft_loop_s, fft_loop_results = time_function(
+        detect_equilibration_loop, detect_equilibration, a_kt
+    )
+    batch_s, batch_results = time_function(
+        detect_equilibration_batch, a_kt, processes=processes
+    )
+
+    same = all(
+        np.array_equal(pymbar_results[0], batch_results[0])
+        and np.array_equal(fft_loop_results[0], batch_results[0])
+        and np.allclose(pymbar_results[i], batch_results[i], rtol=1e-5)
+        and np.allclose(fft_loop_results[i], batch_results[i], rtol=1e-5)
+        for i in [1, 2]
+    )
+
+    print(
+        f"{'jobs': <6} {'series': <8} {'rows': <8} {'processes': <10} "
+        f"{'pymbar_loop_s': <14} "
+        f"{'fft_loop_s': <11} {'batch_s': <9} {'speedup': <9} {'same': <6}"
+    )
+    print(
+        f"{number_of_jobs: <6} {len(a_kt): <8} {number_of_rows: <8} "
+        f"{processes: <10} "
+        f"{pymbar_loop_s: <14.3f} {fft_loop_s: <11.3f} {batch_s: <9.3f} "
+        f"{pymbar_loop_s / batch_s: <9.1f} {str(same): <6}"
+    )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 1,
+    )
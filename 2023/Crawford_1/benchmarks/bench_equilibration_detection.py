@@ -0,0 +1,129 @@
+"""Benchmark and validate the equilibration detection against pymbar.
+
+Compares pymbar's timeseries.detectEquilibration (detect_equilibration in
+pymbar 4), which calculates the statistical inefficiency of every time origin
+separately (O(N^2)), against 'detect_equilibration' in
+'src/analysis/equilibration.py' of the noble gas project, which calculates all
+the origins at once from prefix sums and FFTs.  The data is synthetic AR(1)
+series (x_t = phi * x_t-1 + noise), with and without an initial decaying
+transient, like a simulation property which is not equilibrated at the start.
+The start of the equilibrated data (t0) must be the same, and the statistical
+inefficiency (g) and number of uncorrelated samples (Neff) must match to the
+float32 precision pymbar keeps them in.
+
+pymbar checks N / nskip time origins, each costing O(N), so for the larger
+series pymbar is run with an nskip that keeps its time origins * samples to
+about 'pymbar_samples_budget' (both engines use the same nskip for the
+validation), and the FFT engine is also timed with nskip=1.
+
+Usage (from this directory):
+    python bench_equilibration_detection.py [number_of_samples ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+import numpy as np
+from pymbar import timeseries
+from src.analysis.equilibration import detect_equilibration
+
+# pymbar 3 (the repo's environment) and pymbar 4 names
+pymbar_detect_equilibration = (
+    getattr(timeseries, "detectEquilibration", None)
+    or timeseries.detect_equilibration
+)
+
+# the AR(1) correlation (phi) and the initial transient's height, in noise
+# standard deviations
+ar1_phis = [0.5, 0.95]
+transient_heights = [0, 5]
+
+pymbar_samples_budget = 2 * 10**7
+
+
+def get_ar1_series(number_of_samples, phi, transient_height, seed=0):
+    """Get a synthetic AR(1) series, with an initial transient decaying over the
+    first 5% of the samples.
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=number_of_samples)
+    a_t = np.empty(number_of_samples)
+    a_t[0] = noise[0]
+    for t in range(1, number_of_samples):
+        a_t[t] = phi * a_t[t - 1] + noise[t]
+    a_t += transient_height * np.exp(
+        -np.arange(number_of_samples) / (0.05 * number_of_samples)
+    )
+
+    return a_t
+
+
+def time_function(func, *args, **kwargs):
+    """Return the wall time (s) of the function call and its result."""
+    start_time_s = time.perf_counter()
+    result = func(*args, **kwargs)
+
+    return time.perf_counter() - start_time_s, result
+
+
+def main(numbers_of_samples):
+    print(
+        f"{'samples': <10} {'phi': <6} {'transient': <10} {'nskip': <7} "
+        f"{'pymbar_s': <10} "
+        f"{'fft_s': <10} {'speedup': <10} {'fft_nskip_1_s': <14} {'t0': <10} "
+        f"{'g': <10} "
+        f"{'Neff': <12} {'same': <6}"
+    )
+    all_same = True
+    for number_of_samples in numbers_of_samples:
+        nskip = max(1, -(-(number_of_samples**2) // pymbar_samples_budget))
+        for phi in ar1_phis:
+            for transient_height in transient_heights:
+                a_t = get_ar1_series(number_of_samples, phi, transient_height)
+
+                pymbar_s, [pymbar_t0, pymbar_g, pymbar_Neff] = time_function(
+                    pymbar_detect_equilibration, a_t, nskip=nskip
+                )
+                fft_s, [t0, g, Neff] = time_function(
+                    detect_equilibration, a_t, nskip=nskip
+                )
+                fft_nskip_1_s, _ = time_function(
+                    detect_equilibration, a_t, nskip=1
+                )
+
+                same = (
+                    t0 == pymbar_t0
+                    and np.isclose(g, pymbar_g, rtol=1e-5)
+                    and np.isclose(Neff, pymbar_Neff, rtol=1e-5)
+                )
+                all_same = all_same and same
+
+                print(
+                    f"{number_of_samples: <10} {phi: <6} "
+                    f"{transient_height: <10} {nskip: <7} "
+                    f"{pymbar_s: <10.3f} {fft_s: <10.3f} "
+                    f"{pymbar_s / fft_s: <10.1f} "
+                    f"{fft_nskip_1_s: <14.3f} {int(t0): <10} "
+                    f"{float(g): <10.2f} "
+                    f"{float(Neff): <12.1f} {str(same): <6}"
+                )
+
+    print(f"All the same as pymbar: {all_same}")
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_samples) for number_of_samples in sys.argv[1:]]
+        or [1000, 10000, 100000, 1000000]
+    )
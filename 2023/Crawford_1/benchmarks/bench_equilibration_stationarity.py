@@ -0,0 +1,149 @@
+"""Benchmark the steps saved by ending the GOMC equilibration runs when they are
+stationary.
+
+A sweep of statepoints is replayed, where each statepoint's density is a
+synthetic AR(1) series (x_t = phi * x_t-1 + noise) with an initial decaying
+transient, one value per Blk file block, with a different transient length for
+each statepoint.  Each series is grown in chunks of blocks, like a running
+equilibration simulation, and after each chunk 'check_convergence' in the S8
+project's 'src/utils/convergence_controller.py' is run with only the stationary
+steps criterion (an infinite target sem), until the density has been stationary
+for the stationary window, or the fixed budget of blocks
+(gomc_steps_equilb_design_ensemble / gomc_output_data_every_X_steps) is used.
+
+The transient left at the stopped step (in noise standard deviations) shows if
+the production runs would start from an equilibrated state.
+
+Usage (from this directory):
+    python bench_equilibration_stationarity.py [number_of_replicas] [stationary_window_steps]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+import numpy as np
+from src.utils.convergence_controller import FollowedFile, check_convergence
+
+# the S8 equilibration run's fixed budget, 60 * 10**6 steps with a Blk row every
+# 50 * 10**3 steps
+number_of_budget_blocks = 1200
+steps_per_block = 50 * 10**3
+
+# the blocks written between the stationarity checks
+number_of_blocks_per_check = 20
+
+# the statepoints' transient decay lengths (blocks), where the transient starts
+# at 10 noise standard deviations
+statepoint_transient_blocks = [10, 30, 100, 200]
+transient_height = 10.0
+phi = 0.8
+
+
+def get_density_series(transient_blocks, seed):
+    """Get a synthetic density series (in noise standard deviations), with an
+    initial decaying transient.
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=number_of_budget_blocks) * np.sqrt(1 - phi**2)
+    x_t = np.empty(number_of_budget_blocks)
+    x_t[0] = noise[0]
+    for t in range(1, number_of_budget_blocks):
+        x_t[t] = phi * x_t[t - 1] + noise[t]
+
+    return x_t + get_transient(
+        np.arange(number_of_budget_blocks), transient_blocks
+    )
+
+
+def get_transient(block_t, transient_blocks):
+    """Get the transient of the blocks, in noise standard deviations."""
+    return transient_height * np.exp(-block_t / transient_blocks)
+
+
+def replay_equilibration_run(blk_filename, density_t, stationary_window_steps):
+    """Grow the Blk file in chunks until the density is stationary, and return
+    the stopped number of blocks.
+    """
+    with open(blk_filename, "w") as fp:
+        fp.write(f"{'#STEP': >16} {'TOT_DENS': >16}\n")
+
+    followed_file = FollowedFile(blk_filename)
+    targets = [(blk_filename, "TOT_DENS", float("inf"), "absolute")]
+    for chunk_end in range(
+        number_of_blocks_per_check,
+        number_of_budget_blocks + 1,
+        number_of_blocks_per_check,
+    ):
+        chunk_start = chunk_end - number_of_blocks_per_check
+        with open(blk_filename, "a") as fp:
+            for block_i in range(chunk_start, chunk_end):
+                fp.write(
+                    f"{(block_i + 1) * steps_per_block: >16} "
+                    f"{density_t[block_i]: >16.8e}\n"
+                )
+
+        followed_file.read_appended_rows()
+        convergence = check_convergence(
+            {blk_filename: followed_file},
+            targets,
+            minimum_neff=0,
+            minimum_equilibrated_fraction=0.0,
+            minimum_stationary_steps=stationary_window_steps,
+        )
+        if convergence["converged"]:
+            break
+
+    return chunk_end
+
+
+def main(number_of_replicas, stationary_window_steps):
+    print(
+        f"{'transient_blocks': <17} {'stopped_blocks': <15} "
+        f"{'max_stopped': <12} "
+        f"{'steps_saved_%': <14} {'max_transient_left': <18}"
+    )
+    total_blocks = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        blk_filename = os.path.join(
+            tmp_dir, "Blk_gomc_equilb_design_ensemble_BOX_0.dat"
+        )
+        for transient_blocks in statepoint_transient_blocks:
+            stopped_blocks = [
+                replay_equilibration_run(
+                    blk_filename,
+                    get_density_series(transient_blocks, seed=replica_i),
+                    stationary_window_steps,
+                )
+                for replica_i in range(number_of_replicas)
+            ]
+            total_blocks += sum(stopped_blocks)
+
+            print(
+                f"{transient_blocks: <17} {np.mean(stopped_blocks): <15.0f} "
+                f"{np.max(stopped_blocks): <12} "
+                f"{100 * (1 - np.mean(stopped_blocks) / number_of_budget_blocks): <14.1f} "
+                f"{get_transient(np.min(stopped_blocks), transient_blocks): <18.2e}"
+            )
+
+    print(
+        "Steps saved over the sweep: "
+        f"{100 * (1 - total_blocks / (number_of_budget_blocks * number_of_replicas * len(statepoint_transient_blocks))):.1f} %"
+    )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 10 * 10**6,
+    )
@@ -0,0 +1,131 @@
+"""Benchmark loading the GOMC free energy files' windows from the binary cache.
+
+Compares the original part_5a parse (alchemlyb's extract_dHdl and extract_u_nk
+for each lambda window's file, followed by a pd.concat of each) against
+'get_free_energy_dataframes' in the noble gas project's
+'src/utils/free_energy_files.py', for the first load (which parses the text
+and writes each window's cache) and the repeated loads (which memory-map the
+caches), as when part_5a is rerun.  The frames must be exactly the same.
+The free energy files are synthetic files in GOMC's format, with the
+project's number of lambda windows.
+
+Usage (from this directory):
+    python bench_free_energy_cache.py [number_of_rows_per_window ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+from bench_free_energy_parser import (
+    number_of_lambda_windows,
+    parse_original,
+    temperature,
+    write_synthetic_free_energy_file,
+)
+from src.utils.free_energy_files import (
+    get_free_energy_cache_filenames,
+    get_free_energy_dataframes,
+)
+
+number_of_repeated_loads = 5
+
+
+def time_function(func, *args):
+    """Return the wall time (s) and the result of the function call."""
+    start_time_s = time.perf_counter()
+    result = func(*args)
+
+    return time.perf_counter() - start_time_s, result
+
+
+def main(numbers_of_rows):
+    print(
+        f"{'rows': <10} {'alchemlyb_s': <12} {'cache_write_s': <14} "
+        f"{'cache_load_s': <13} "
+        f"{'speedup': <8} {'text_MB': <8} {'cache_MB': <9} {'same_frames': <11}"
+    )
+    lambdas = [
+        round(i / (number_of_lambda_windows - 1), 8)
+        for i in range(number_of_lambda_windows)
+    ]
+    for number_of_rows in numbers_of_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            free_energy_filenames = []
+            for state in range(number_of_lambda_windows):
+                free_energy_filenames.append(
+                    os.path.join(
+                        tmp_dir,
+                        "Free_Energy_BOX_0_gomc_production_run_"
+                        f"initial_state_{state}.dat",
+                    )
+                )
+                write_synthetic_free_energy_file(
+                    free_energy_filenames[-1], state, lambdas, number_of_rows
+                )
+
+            original_s, (original_dHdl, original_u_nk) = time_function(
+                parse_original, free_energy_filenames
+            )
+            cache_write_s = time_function(
+                get_free_energy_dataframes, free_energy_filenames, temperature
+            )[0]
+            cache_load_s = min(
+                time_function(
+                    get_free_energy_dataframes,
+                    free_energy_filenames,
+                    temperature,
+                )[0]
+                for _ in range(number_of_repeated_loads)
+            )
+
+            # the cached windows must give exactly the same frames
+            cached_dHdl, cached_u_nk = get_free_energy_dataframes(
+                free_energy_filenames, temperature
+            )
+            same_frames = original_dHdl.equals(
+                cached_dHdl
+            ) and original_u_nk.equals(cached_u_nk)
+
+            text_mb = (
+                sum(
+                    os.path.getsize(filename)
+                    for filename in free_energy_filenames
+                )
+                / 1024**2
+            )
+            cache_mb = (
+                sum(
+                    os.path.getsize(cache_filename)
+                    for filename in free_energy_filenames
+                    for cache_filename in get_free_energy_cache_filenames(
+                        filename
+                    )
+                )
+                / 1024**2
+            )
+
+        print(
+            f"{number_of_rows: <10} {original_s: <12.3f} "
+            f"{cache_write_s: <14.3f} {cache_load_s: <13.3f} "
+            f"{original_s / cache_load_s: <8.1f} {text_mb: <8.1f} "
+            f"{cache_mb: <9.1f} {str(same_frames): <11}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_rows) for number_of_rows in sys.argv[1:]]
+        or [1000, 10000, 100000]
+    )
@@ -0,0 +1,163 @@
+"""Benchmark parsing the GOMC free energy files for the TI, MBAR, and BAR
+estimators.
+
+Compares the original part_5a parse (alchemlyb's extract_dHdl and extract_u_nk
+for each lambda window's file, which reads every file twice, followed by a
+pd.concat of each) against 'get_free_energy_dataframes' in the noble gas
+project's 'src/utils/free_energy_files.py', which parses each file once and
+writes the windows' values into a single array for each frame.
+The wall time and the peak traced memory (tracemalloc) are compared, and the
+frames must be exactly the same.  The free energy files are synthetic files in
+GOMC's format, with the project's number of lambda windows.
+
+Usage (from this directory):
+    python bench_free_energy_parser.py [number_of_rows_per_window ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+import numpy as np
+import pandas as pd
+from alchemlyb.parsing.gomc import extract_dHdl, extract_u_nk
+from src.utils.free_energy_files import get_free_energy_dataframes
+
+# the noble gas project's number_of_lambda_spacing_including_zero_int
+number_of_lambda_windows = 11
+temperature = 275.0
+
+
+def write_synthetic_free_energy_file(
+    free_energy_filename, state, lambdas, number_of_rows
+):
+    """Write a synthetic free energy file in GOMC's format."""
+    rng = np.random.default_rng(state)
+    state_lambda = lambdas[state]
+    column_titles = [
+        "#Steps",
+        "Total_En(kJ/mol)",
+        "dU/dL(Coulomb)",
+        "dU/dL(VDW)",
+    ]
+    column_titles += [
+        f"DelE({state_lambda:.4f}->({l:.4f},{l:.4f}))" for l in lambdas
+    ]
+    column_titles += ["PV(kJ/mol)"]
+    data = np.empty((number_of_rows, len(column_titles)))
+    data[:, 0] = np.arange(1, number_of_rows + 1) * 5000
+    data[:, 1] = rng.normal(-5000, 20, number_of_rows)
+    data[:, 2] = rng.normal(0, 1, number_of_rows)
+    data[:, 3] = rng.normal(-2 + 3 * state_lambda, 1, number_of_rows)
+    for k, l in enumerate(lambdas):
+        data[:, 4 + k] = (l - state_lambda) * data[:, 3] + rng.normal(
+            0, 0.05, number_of_rows
+        )
+    data[:, -1] = rng.normal(1, 0.01, number_of_rows)
+    with open(free_energy_filename, "w") as fp:
+        fp.write(
+            f"#T = {temperature:.6f} (K), Lambda State {state}: (lambda"
+            f" Coulomb, lambda VDW) = ({state_lambda:.4f},"
+            f" {state_lambda:.4f})\n"
+        )
+        fp.write(" ".join(f"{title: >28}" for title in column_titles) + "\n")
+        np.savetxt(fp, data, fmt="%28.10e")
+
+
+def parse_original(free_energy_filenames):
+    """The original part_5a parse of the free energy files."""
+    dHdl = pd.concat(
+        [extract_dHdl(f, T=temperature) for f in free_energy_filenames]
+    )
+    u_nk = pd.concat(
+        [extract_u_nk(f, T=temperature) for f in free_energy_filenames]
+    )
+
+    return dHdl, u_nk
+
+
+def time_function(func, *args):
+    """Return the wall time (s), the peak traced memory (MB), and the result of
+    the function call.
+
+    The memory is traced in a second call, as tracing slows down the Python
+    code.
+    """
+    start_time_s = time.perf_counter()
+    result = func(*args)
+    wall_time_s = time.perf_counter() - start_time_s
+
+    tracemalloc.start()
+    func(*args)
+    peak_memory_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+    tracemalloc.stop()
+
+    return wall_time_s, peak_memory_mb, result
+
+
+def main(numbers_of_rows):
+    print(
+        f"{'rows': <10} {'alchemlyb_s': <12} {'single_s': <10} {'speedup': <8} "
+        f"{'alchemlyb_MB': <13} {'single_MB': <10} {'same_frames': <11}"
+    )
+    lambdas = [
+        round(i / (number_of_lambda_windows - 1), 8)
+        for i in range(number_of_lambda_windows)
+    ]
+    for number_of_rows in numbers_of_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            free_energy_filenames = []
+            for state in range(number_of_lambda_windows):
+                free_energy_filenames.append(
+                    os.path.join(
+                        tmp_dir,
+                        "Free_Energy_BOX_0_gomc_production_run_"
+                        f"initial_state_{state}.dat",
+                    )
+                )
+                write_synthetic_free_energy_file(
+                    free_energy_filenames[-1], state, lambdas, number_of_rows
+                )
+
+            (
+                original_s,
+                original_mb,
+                (original_dHdl, original_u_nk),
+            ) = time_function(parse_original, free_energy_filenames)
+            single_s, single_mb, (single_dHdl, single_u_nk) = time_function(
+                get_free_energy_dataframes, free_energy_filenames, temperature
+            )
+
+            # the frames must be exactly the same, so the estimators' free
+            # energies are the same
+            same_frames = (
+                original_dHdl.equals(single_dHdl)
+                and original_u_nk.equals(single_u_nk)
+                and original_dHdl.attrs == single_dHdl.attrs
+                and original_u_nk.attrs == single_u_nk.attrs
+            )
+
+        print(
+            f"{number_of_rows: <10} {original_s: <12.3f} {single_s: <10.3f} "
+            f"{original_s / single_s: <8.1f} "
+            f"{original_mb: <13.1f} {single_mb: <10.1f} {str(same_frames): <11}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_rows) for number_of_rows in sys.argv[1:]]
+        or [1000, 10000, 100000]
+    )
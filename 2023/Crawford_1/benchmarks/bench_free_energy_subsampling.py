@@ -0,0 +1,191 @@
+"""Benchmark subsampling the lambda windows' uncorrelated samples before the
+MBAR free energy.
+
+The free energy files are synthetic files in GOMC's format, with the noble gas
+project's number of lambda windows, where each window's dU/dL (and so its DelE
+values) is a correlated AR(1) series (x_t = phi * x_t-1 + noise), with the
+production run's number of samples (50 * 10**6 steps, written every 10**4
+steps).  The potential is linear in lambda, U = lambda * V, with a Gaussian V of
+unit variance, so the mean dU/dL of each window is <V> = V_0 - beta * lambda,
+and the exact free energy difference is beta * (V_0 - beta / 2), in kT.
+
+For each correlation (phi), the MBAR fit on all the samples is compared against
+the windows' subsampling with alchemlyb's equilibrium_detection (one window at
+a time), and with 'get_subsampled_free_energy_dataframes' in the noble gas
+project's 'src/utils/free_energy_files.py' (all the windows detected together,
+which must give exactly the same frames), followed by the MBAR fit on the
+uncorrelated samples.  The MBAR standard deviation of the correlated samples is
+too small, which the subsampled fit corrects.
+
+Usage (from this directory):
+    python bench_free_energy_subsampling.py [number_of_samples_per_window] [phi ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+import numpy as np
+import pandas as pd
+from alchemlyb.estimators import MBAR
+from alchemlyb.postprocessors.units import R_kJmol
+from alchemlyb.preprocessing.subsampling import equilibrium_detection
+from bench_free_energy_parser import number_of_lambda_windows, temperature
+from src.utils.free_energy_files import (
+    get_free_energy_dataframes,
+    get_subsampled_free_energy_dataframes,
+)
+
+# the mean dU/dL at lambda = 0 (kJ/mol), and beta (mol/kJ)
+dU_dL_at_zero = -2.0
+beta = 1 / (R_kJmol * temperature)
+
+
+def write_correlated_free_energy_file(
+    free_energy_filename, state, lambdas, number_of_samples, phi
+):
+    """Write a synthetic free energy file in GOMC's format, with AR(1)
+    correlated dU/dL values.
+    """
+    rng = np.random.default_rng(state)
+    state_lambda = lambdas[state]
+    noise = rng.normal(size=number_of_samples) * np.sqrt(1 - phi**2)
+    x_t = np.empty(number_of_samples)
+    x_t[0] = noise[0]
+    for t in range(1, number_of_samples):
+        x_t[t] = phi * x_t[t - 1] + noise[t]
+
+    column_titles = [
+        "#Steps",
+        "Total_En(kJ/mol)",
+        "dU/dL(Coulomb)",
+        "dU/dL(VDW)",
+    ]
+    column_titles += [
+        f"DelE({state_lambda:.4f}->({l:.4f},{l:.4f}))" for l in lambdas
+    ]
+    column_titles += ["PV(kJ/mol)"]
+    data = np.empty((number_of_samples, len(column_titles)))
+    data[:, 0] = np.arange(1, number_of_samples + 1) * 10000
+    data[:, 1] = rng.normal(-5000, 20, number_of_samples)
+    data[:, 2] = 0.0
+    data[:, 3] = dU_dL_at_zero - beta * state_lambda + x_t
+    for k, l in enumerate(lambdas):
+        data[:, 4 + k] = (l - state_lambda) * data[:, 3]
+    data[:, -1] = 1.0
+    with open(free_energy_filename, "w") as fp:
+        fp.write(
+            f"#T = {temperature:.6f} (K), Lambda State {state}: (lambda"
+            f" Coulomb, lambda VDW) = ({state_lambda:.4f},"
+            f" {state_lambda:.4f})\n"
+        )
+        fp.write(" ".join(f"{title: >28}" for title in column_titles) + "\n")
+        np.savetxt(fp, data, fmt="%28.10e")
+
+
+def subsample_original(dHdl, u_nk):
+    """Subsample each window with alchemlyb's equilibrium_detection, on the
+    window's total dH/dl.
+    """
+    u_nk_windows = []
+    for window_lambdas, dHdl_window in dHdl.groupby(level=[1, 2], sort=False):
+        u_nk_windows.append(
+            equilibrium_detection(
+                u_nk.loc[dHdl_window.index], dHdl_window.sum(axis=1)
+            )
+        )
+
+    return pd.concat(u_nk_windows)
+
+
+def time_mbar(u_nk):
+    """Return the MBAR fit's wall time (s), and its free energy difference and
+    standard deviation (kT).
+    """
+    start_time_s = time.perf_counter()
+    mbar = MBAR().fit(u_nk)
+
+    return (
+        time.perf_counter() - start_time_s,
+        mbar.delta_f_.iloc[0, -1],
+        mbar.d_delta_f_.iloc[0, -1],
+    )
+
+
+def main(number_of_samples, phis):
+    print(
+        f"{'phi': <6} {'samples': <8} {'subsamples': <11} "
+        f"{'alchemlyb_ss_s': <15} {'batch_ss_s': <11} "
+        f"{'same': <6} {'mbar_all_s': <11} {'mbar_ss_s': <10} {'dF_all': <8} "
+        f"{'dF_ss': <8} "
+        f"{'std_all': <8} {'std_ss': <8}"
+    )
+    lambdas = [
+        round(i / (number_of_lambda_windows - 1), 8)
+        for i in range(number_of_lambda_windows)
+    ]
+    for phi in phis:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            free_energy_filenames = []
+            for state in range(number_of_lambda_windows):
+                free_energy_filenames.append(
+                    os.path.join(
+                        tmp_dir,
+                        "Free_Energy_BOX_0_gomc_production_run_"
+                        f"initial_state_{state}.dat",
+                    )
+                )
+                write_correlated_free_energy_file(
+                    free_energy_filenames[-1],
+                    state,
+                    lambdas,
+                    number_of_samples,
+                    phi,
+                )
+
+            dHdl, u_nk = get_free_energy_dataframes(
+                free_energy_filenames, temperature
+            )
+
+            start_time_s = time.perf_counter()
+            original_u_nk = subsample_original(dHdl, u_nk)
+            original_s = time.perf_counter() - start_time_s
+
+            # the windows are already cached, so this is the subsampling and the
+            # copy of the subsampled rows
+            start_time_s = time.perf_counter()
+            _, subsampled_u_nk, _ = get_subsampled_free_energy_dataframes(
+                free_energy_filenames, temperature, "equilibrium_detection"
+            )
+            batch_s = time.perf_counter() - start_time_s
+            same = original_u_nk.equals(subsampled_u_nk)
+
+        mbar_all_s, delta_f_all, d_delta_f_all = time_mbar(u_nk)
+        mbar_ss_s, delta_f_ss, d_delta_f_ss = time_mbar(subsampled_u_nk)
+        print(
+            f"{phi: <6} {len(u_nk): <8} {len(subsampled_u_nk): <11} "
+            f"{original_s: <15.3f} {batch_s: <11.3f} "
+            f"{str(same): <6} {mbar_all_s: <11.3f} {mbar_ss_s: <10.3f} "
+            f"{delta_f_all: <8.4f} {delta_f_ss: <8.4f} "
+            f"{d_delta_f_all: <8.4f} {d_delta_f_ss: <8.4f}"
+        )
+
+    print(f"The exact dF is {beta * (dU_dL_at_zero - beta / 2):.4f} kT.")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        [float(phi) for phi in sys.argv[2:]] or [0.5, 0.9, 0.98],
+    )
@@ -0,0 +1,129 @@
+"""Benchmark writing the initial job document parameters for large state point
+sets.
+
+Compares the original 'initial_parameters' style, which assigns each key to
+'job.doc' one at a time (rewriting 'signac_job_document.json' for every key),
+against setting the parameters in memory and writing them with a single
+'job.doc.update'.  The parameters are the noble gas project's initial
+parameters, which is the largest set of the three projects.
+
+Usage (from this directory):
+    python bench_job_document_writes.py [number_of_jobs ...]
+"""
+
+import sys
+import tempfile
+import time
+
+import signac
+
+number_of_lambda_spacing_including_zero_int = 11
+
+
+def get_initial_parameters(job):
+    """Get the noble gas project's initial job document parameters."""
+    lambda_space_increments = 1 / int(
+        number_of_lambda_spacing_including_zero_int - 1
+    )
+    initial_doc = {
+        "LambdaVDW_list": [
+            round(lamda_i * lambda_space_increments, 8)
+            for lamda_i in range(number_of_lambda_spacing_including_zero_int)
+        ],
+        "InitialState_list": list(
+            range(number_of_lambda_spacing_including_zero_int)
+        ),
+        "production_ensemble": "NVT",
+        "production_pressure_bar": 1.01325,
+        "production_temperature_K": job.sp.production_temperature_K,
+        "N_liquid_solvent": 1000,
+        "N_liquid_solute": 1,
+        "liq_box_lengths_ang": 31.07,
+        "Rcut_ang": 15,
+        "Rcut_for_switch_namd_ang": 17,
+        "neighbor_list_dist_namd_ang": 22,
+        "replica_number_int": job.sp.replica_number_int,
+        "solvent": "TIP4",
+        "solute": job.sp.solute,
+        "namd_node_ncpu": 1,
+        "namd_node_ngpu": 1,
+        "gomc_ncpu": 1,
+        "gomc_ngpu": 0,
+        "namd_cpu_or_gpu": "GPU",
+        "gomc_cpu_or_gpu": "CPU",
+        "gomc_equilb_design_ensemble_dict": {},
+        "gomc_production_run_ensemble_dict": {},
+        "namd_equilb_NPT_gomc_binary_file": "namd2",
+        "gomc_equilb_design_ensemble_gomc_binary_file": "GOMC_CPU_NPT",
+        "gomc_production_ensemble_gomc_binary_file": "GOMC_CPU_NVT",
+    }
+
+    return initial_doc
+
+
+def write_per_key(job):
+    """The original style, with one job document write per key."""
+    for key, value in get_initial_parameters(job).items():
+        setattr(job.doc, key, value)
+
+
+def write_single_update(job):
+    """The parameters are set in memory and written in one job document
+    write.
+    """
+    job.doc.update(get_initial_parameters(job))
+
+
+def time_initialization(write_function, number_of_jobs):
+    """Return the wall time (s) to initialize the jobs and write their
+    documents.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        project = signac.init_project(root=root)
+        jobs = [
+            project.open_job(
+                {
+                    "production_temperature_K": 275 + 25 * (job_i // 50),
+                    "solute": "Ne",
+                    "replica_number_int": job_i % 50,
+                }
+            ).init()
+            for job_i in range(number_of_jobs)
+        ]
+
+        start_time_s = time.perf_counter()
+        for job in jobs:
+            write_function(job)
+        run_time_s = time.perf_counter() - start_time_s
+
+        # check both methods give the same job documents
+        job_doc = dict(jobs[-1].doc)
+
+    return run_time_s, job_doc
+
+
+def main(numbers_of_jobs):
+    print(
+        f"{'jobs': <8} {'per_key_s': <12} {'single_update_s': <16} "
+        f"{'speedup': <10} {'same_doc': <10}"
+    )
+    for number_of_jobs in numbers_of_jobs:
+        per_key_s, per_key_doc = time_initialization(
+            write_per_key, number_of_jobs
+        )
+        single_update_s, single_update_doc = time_initialization(
+            write_single_update, number_of_jobs
+        )
+        print(
+            f"{number_of_jobs: <8} {per_key_s: <12.4f} "
+            f"{single_update_s: <16.4f} "
+            f"{per_key_s / single_update_s: <10.1f} "
+            f"{str(per_key_doc == single_update_doc): <10}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_jobs) for number_of_jobs in sys.argv[1:]]
+        or [100, 1000, 5000]
+    )
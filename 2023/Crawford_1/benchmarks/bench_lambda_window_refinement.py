@@ -0,0 +1,211 @@
+"""Benchmark refining the lambda schedule where the neighbouring lambda windows
+have a low overlap.
+
+The free energy files are synthetic files in GOMC's format, for a potential
+which is non-linear in lambda, U = lambda**4 * V, with a Gaussian V (standard
+deviation sigma), so the V of each window has a mean of V_0 - beta * lambda**4 *
+sigma**2, and the neighbouring windows' overlap is lowest near lambda = 1.  The
+reduced free energy at lambda is beta * lambda**4 * V_0 - (beta * sigma *
+lambda**4)**2 / 2, in kT.
+
+Starting from the noble gas project's evenly spaced lambda windows, the schedule
+is refined like part_4b_refine_lambda_windows in the noble gas project's part_4b
+(with 'get_lambda_window_diagnostics' and 'get_refined_lambdas' in
+'src/utils/lambda_windows.py'), until all the neighbouring overlaps are at or
+above the minimum overlap, or the schedule has the maximum number of windows.
+The MBAR free energy of the refined schedule is compared against the evenly
+spaced schedules with the same number of windows (the same compute) and the
+original number of windows, where every window has the same number of samples.
+The errors are the root mean square errors over the seeds, against the exact
+free energy.
+
+Usage (from this directory):
+    python bench_lambda_window_refinement.py [number_of_samples_per_window] [number_of_seeds]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+import numpy as np
+from alchemlyb.estimators import MBAR
+from alchemlyb.postprocessors.units import R_kJmol
+from bench_free_energy_parser import number_of_lambda_windows, temperature
+from src.utils.free_energy_files import get_free_energy_dataframes
+from src.utils.lambda_windows import (
+    get_lambda_window_diagnostics,
+    get_refined_lambdas,
+)
+
+# beta (mol/kJ), the mean of V at lambda = 0 and its standard deviation (sigma),
+# in kJ/mol
+beta = 1 / (R_kJmol * temperature)
+v_0 = -2.0
+sigma = 20.0 / beta
+
+# the noble gas project's lambda_window_minimum_overlap and
+# lambda_window_refinement_maximum_number_of_windows_int
+minimum_overlap = 0.03
+maximum_number_of_windows = 21
+
+
+def get_lambda_scaling(lambdas):
+    """Get the scaling of V (lambda**4) at each lambda."""
+    return np.asarray(lambdas, dtype=float) ** 4
+
+
+def write_nonlinear_free_energy_file(
+    free_energy_filename, state, lambdas, number_of_samples, seed
+):
+    """Write a synthetic free energy file in GOMC's format, for the potential U
+    = lambda**4 * V.
+    """
+    rng = np.random.default_rng(seed)
+    state_lambda = lambdas[state]
+    state_scaling = get_lambda_scaling(state_lambda)
+    v_t = rng.normal(
+        v_0 - beta * state_scaling * sigma**2, sigma, number_of_samples
+    )
+
+    column_titles = [
+        "#Steps",
+        "Total_En(kJ/mol)",
+        "dU/dL(Coulomb)",
+        "dU/dL(VDW)",
+    ]
+    column_titles += [
+        f"DelE({state_lambda:.4f}->({l:.4f},{l:.4f}))" for l in lambdas
+    ]
+    column_titles += ["PV(kJ/mol)"]
+    data = np.empty((number_of_samples, len(column_titles)))
+    data[:, 0] = np.arange(1, number_of_samples + 1) * 10000
+    data[:, 1] = rng.normal(-5000, 20, number_of_samples)
+    data[:, 2] = 0.0
+    data[:, 3] = 4 * state_lambda**3 * v_t
+    for k, scaling in enumerate(get_lambda_scaling(lambdas)):
+        data[:, 4 + k] = (scaling - state_scaling) * v_t
+    data[:, -1] = 1.0
+    with open(free_energy_filename, "w") as fp:
+        fp.write(
+            f"#T = {temperature:.6f} (K), Lambda State {state}: (lambda"
+            f" Coulomb, lambda VDW) = ({state_lambda:.4f},"
+            f" {state_lambda:.4f})\n"
+        )
+        fp.write(" ".join(f"{title: >28}" for title in column_titles) + "\n")
+        np.savetxt(fp, data, fmt="%28.10e")
+
+
+def fit_lambda_windows(tmp_dir, lambdas, number_of_samples, seed):
+    """Write and fit the lambda windows, and return the MBAR fit and the lambda
+    window diagnostics.
+    """
+    free_energy_filenames = []
+    for state in range(len(lambdas)):
+        free_energy_filenames.append(
+            os.path.join(
+                tmp_dir,
+                f"Free_Energy_BOX_0_{len(lambdas)}_{seed}_initial_state_{state}.dat",
+            )
+        )
+        write_nonlinear_free_energy_file(
+            free_energy_filenames[-1],
+            state,
+            lambdas,
+            number_of_samples,
+            seed=[seed, state, len(lambdas)],
+        )
+
+    dHdl, u_nk = get_free_energy_dataframes(free_energy_filenames, temperature)
+    mbar = MBAR().fit(u_nk)
+
+    return mbar, get_lambda_window_diagnostics(mbar, dHdl)
+
+
+def get_even_lambdas(number_of_windows):
+    """Get the evenly spaced lambdas, like the noble gas project's
+    initial_parameters.
+    """
+    return [
+        float(np.round(i / (number_of_windows - 1), decimals=8))
+        for i in range(number_of_windows)
+    ]
+
+
+def main(number_of_samples, number_of_seeds):
+    exact_delta_f = beta * v_0 - (beta * sigma) ** 2 / 2
+    print(
+        f"{'seed': <5} {'schedule': <9} {'windows': <8} {'min_overlap': <12} "
+        f"{'dF': <10} {'std': <8} {'error': <8}"
+    )
+    errors = {}
+    stds = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for seed in range(number_of_seeds):
+            # refine the schedule from the evenly spaced windows, like
+            # part_4b_refine_lambda_windows
+            lambdas = get_even_lambdas(number_of_lambda_windows)
+            fits = {}
+            while True:
+                mbar, diagnostics = fit_lambda_windows(
+                    tmp_dir, lambdas, number_of_samples, seed
+                )
+                fits.setdefault("even", (lambdas, mbar, diagnostics))
+                refined_lambdas = get_refined_lambdas(
+                    lambdas,
+                    diagnostics["neighbour_overlaps"],
+                    diagnostics["neighbour_variances"],
+                    minimum_overlap,
+                    maximum_number_of_windows,
+                )
+                if refined_lambdas == lambdas:
+                    break
+                lambdas = refined_lambdas
+            fits["refined"] = (lambdas, mbar, diagnostics)
+
+            even_same_lambdas = get_even_lambdas(len(lambdas))
+            fits["even_same"] = (even_same_lambdas,) + fit_lambda_windows(
+                tmp_dir, even_same_lambdas, number_of_samples, seed
+            )
+
+            for schedule in ["even", "even_same", "refined"]:
+                schedule_lambdas, schedule_mbar, schedule_diagnostics = fits[
+                    schedule
+                ]
+                delta_f = schedule_mbar.delta_f_.iloc[0, -1]
+                d_delta_f = schedule_mbar.d_delta_f_.iloc[0, -1]
+                errors.setdefault(schedule, []).append(delta_f - exact_delta_f)
+                stds.setdefault(schedule, []).append(d_delta_f)
+                print(
+                    f"{seed: <5} {schedule: <9} {len(schedule_lambdas): <8} "
+                    f"{min(schedule_diagnostics['neighbour_overlaps']): <12.4f} "
+                    f"{delta_f: <10.4f} {d_delta_f: <8.4f} "
+                    f"{delta_f - exact_delta_f: <8.4f}"
+                )
+
+    print(
+        f"The exact dF is {exact_delta_f:.4f} kT.  The refined lambdas of the"
+        f" last seed are {lambdas}."
+    )
+    for schedule in ["even", "even_same", "refined"]:
+        print(
+            f"{schedule}: rms error"
+            f" {np.sqrt(np.mean(np.square(errors[schedule]))):.4f} kT, mean"
+            f" MBAR std {np.mean(stds[schedule]):.4f} kT"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    )
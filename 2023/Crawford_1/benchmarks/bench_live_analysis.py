@@ -0,0 +1,152 @@
+"""Benchmark the live analysis of a growing GOMC Blk_*.dat file.
+
+A synthetic S8 style Blk file is grown in chunks, like a running production
+simulation, and after each chunk the running averages are updated with
+'update_live_analysis_snapshot' in 'src/utils/live_analysis.py' (which only
+reads the appended bytes), or are calculated by re-parsing the whole file
+(pd.read_csv with sep='\\s+' and np.nanmean).  The final running means must
+match the re-parsed means.
+
+Usage (from this directory):
+    python bench_live_analysis.py [number_of_rows_in_file] [number_of_rows_per_chunk]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+import numpy as np
+import pandas as pd
+from src.utils.live_analysis import update_live_analysis_snapshot
+
+blk_column_titles = [
+    "#STEP",
+    "TOT_EN",
+    "EN_INTER",
+    "EN_TC",
+    "EN_INTRA(B)",
+    "EN_INTRA(NB)",
+    "EN_ELECT",
+    "EN_REAL",
+    "EN_RECIP",
+    "EN_SELF",
+    "EN_CORR",
+    "VIRIAL",
+    "PRESSURE",
+    "COMPRESSIBILITY",
+    "ENTHALPY",
+    "SURF_TENSION",
+    "VOLUME",
+    "TOT_MOL",
+    "TOT_DENS",
+    "HEAT_VAP",
+    "MOLFRACT_ICT",
+    "MOLFRACT_IOT",
+    "MOLFRACT_NDO",
+    "MOLFRACT_NDE",
+]
+
+blk_filename = "Blk_gomc_production_run_BOX_0.dat"
+
+
+class JobDirectory:
+    """The part of a signac job used by the live analysis, for a temporary
+    directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def fn(self, filename):
+        return os.path.join(self.path, filename)
+
+    def isfile(self, filename):
+        return os.path.isfile(self.fn(filename))
+
+
+def get_reparsed_means(blk_filename_path):
+    """The column means from re-parsing the whole Blk file."""
+    data_box = pd.read_csv(
+        blk_filename_path,
+        sep=r"\s+",
+        header=0,
+        na_values="NaN",
+        index_col=False,
+    )
+
+    return np.nanmean(data_box.to_numpy(), axis=0)
+
+
+def main(number_of_rows, number_of_rows_per_chunk):
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        job = JobDirectory(tmp_dir)
+        with open(job.fn(blk_filename), "w") as fp:
+            fp.write(
+                " ".join(f"{title: >16}" for title in blk_column_titles) + "\n"
+            )
+
+        live_analysis_s = 0
+        reparse_s = 0
+        for chunk_start in range(0, number_of_rows, number_of_rows_per_chunk):
+            data = rng.normal(
+                1.0,
+                0.1,
+                size=(number_of_rows_per_chunk, len(blk_column_titles)),
+            )
+            data[:, 0] = (
+                np.arange(
+                    chunk_start + 1, chunk_start + number_of_rows_per_chunk + 1
+                )
+                * 10000
+            )
+            with open(job.fn(blk_filename), "a") as fp:
+                np.savetxt(fp, data, fmt="%16.8e")
+
+            start_time_s = time.perf_counter()
+            snapshot = update_live_analysis_snapshot(job, [blk_filename])
+            live_analysis_s += time.perf_counter() - start_time_s
+
+            start_time_s = time.perf_counter()
+            reparsed_means = get_reparsed_means(job.fn(blk_filename))
+            reparse_s += time.perf_counter() - start_time_s
+
+        running_means = [
+            column_snapshot["mean"]
+            for column_snapshot in snapshot["files"][blk_filename][
+                "columns"
+            ].values()
+        ]
+        same_means = np.allclose(
+            running_means, reparsed_means, rtol=1e-12, atol=0
+        )
+
+    number_of_chunks = -(-number_of_rows // number_of_rows_per_chunk)
+    print(
+        f"{'rows': <10} {'chunks': <8} {'reparse_total_s': <16} "
+        f"{'live_total_s': <14} "
+        f"{'speedup': <10} {'same_means': <10}"
+    )
+    print(
+        f"{number_of_rows: <10} {number_of_chunks: <8} {reparse_s: <16.3f} "
+        f"{live_analysis_s: <14.3f} "
+        f"{reparse_s / live_analysis_s: <10.1f} {str(same_means): <10}"
+    )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+    )
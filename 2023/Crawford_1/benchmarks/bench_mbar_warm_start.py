@@ -0,0 +1,300 @@
+"""Benchmark warm starting the part_5a MBAR solves from already solved MBAR free
+energies.
+
+A sweep of jobs over the temperatures and replicas is replayed, where each job's
+free energy files are synthetic files in GOMC's format, with the noble gas
+project's number of lambda windows.  The potential is linear in lambda, U =
+lambda * V, with a Gaussian V (standard deviation sigma), so the V of each
+window has a mean of V_0(T) - beta * lambda * sigma**2, and the exact free
+energy difference is beta * V_0(T) - (beta * sigma)**2 / 2, in kT.
+
+Each job's MBAR fit is started from:
+    zeros: f_k = 0 (alchemlyb 1.0's default initial guess);
+    BAR: the job's BAR free energies (alchemlyb 2's default initial guess, where
+    part_5a calculates the BAR free energies anyway);
+    default: alchemlyb's default initial guess (zeros or BAR, as above, by the
+    version);
+    replica: the first replica's MBAR f_k from an earlier part_5a, where the
+    other replicas of each temperature are seeded from it, and the first replica
+    is seeded from its BAR free energies (not used in part_5a, as it takes as
+    many iterations as the BAR starts);
+    temperature: the same replica's MBAR f_k at the previous temperature, scaled
+    by the temperatures (f_k * T_prev / T), where the first temperature is
+    seeded from BAR (not used in part_5a, as it takes more iterations than the
+    BAR starts);
+    rerun: the job's own MBAR f_k, as when part_5a is rerun on the same samples
+    ('get_part_5a_mbar_initial_f_k' in the noble gas project's part_5a, which
+    seeds the first part_5a of each job from its BAR free energies).
+
+The solver iterations are the MBAR objective's Hessian evaluations of pymbar's
+adaptive solver (one for each Newton-Raphson/self-consistent iteration), and the
+MBAR free energies of the warm starts must agree with the cold starts.
+
+Usage (from this directory):
+    python bench_mbar_warm_start.py [number_of_samples_per_window] [number_of_replicas]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "noble_gas_free_energies",
+        "project",
+    ),
+)
+
+import numpy as np
+import pymbar.mbar_solvers
+from alchemlyb.estimators import BAR, MBAR
+from alchemlyb.postprocessors.units import R_kJmol
+from bench_free_energy_parser import number_of_lambda_windows
+from src.utils.free_energy_files import get_free_energy_dataframes
+
+# the production temperatures (K), and the standard deviation (sigma) of V
+# (kJ/mol)
+temperatures = [275.0, 295.0, 315.0, 335.0, 355.0, 375.0]
+sigma = 4.0
+
+
+def get_v_0(temperature):
+    """Get the mean of V at lambda = 0 (kJ/mol), which changes with the
+    temperature.
+    """
+    return -10.0 + 0.05 * (temperature - 275.0)
+
+
+def write_linear_free_energy_file(
+    free_energy_filename, state, lambdas, number_of_samples, temperature, seed
+):
+    """Write a synthetic free energy file in GOMC's format, for the potential U
+    = lambda * V.
+    """
+    rng = np.random.default_rng(seed)
+    beta = 1 / (R_kJmol * temperature)
+    state_lambda = lambdas[state]
+    v_t = rng.normal(
+        get_v_0(temperature) - beta * state_lambda * sigma**2,
+        sigma,
+        number_of_samples,
+    )
+
+    column_titles = [
+        "#Steps",
+        "Total_En(kJ/mol)",
+        "dU/dL(Coulomb)",
+        "dU/dL(VDW)",
+    ]
+    column_titles += [
+        f"DelE({state_lambda:.4f}->({l:.4f},{l:.4f}))" for l in lambdas
+    ]
+    column_titles += ["PV(kJ/mol)"]
+    data = np.empty((number_of_samples, len(column_titles)))
+    data[:, 0] = np.arange(1, number_of_samples + 1) * 10000
+    data[:, 1] = rng.normal(-5000, 20, number_of_samples)
+    data[:, 2] = 0.0
+    data[:, 3] = v_t
+    for k, l in enumerate(lambdas):
+        data[:, 4 + k] = (l - state_lambda) * v_t
+    data[:, -1] = 1.0
+    with open(free_energy_filename, "w") as fp:
+        fp.write(
+            f"#T = {temperature:.6f} (K), Lambda State {state}: (lambda"
+            f" Coulomb, lambda VDW) = ({state_lambda:.4f},"
+            f" {state_lambda:.4f})\n"
+        )
+        fp.write(" ".join(f"{title: >28}" for title in column_titles) + "\n")
+        np.savetxt(fp, data, fmt="%28.10e")
+
+
+def fit_mbar_with_solver_counts(u_kn, initial_f_k):
+    """Fit MBAR from the initial f_k guess (None for alchemlyb's default initial
+    guess).
+
+    Returns the MBAR Hessian evaluations (solver iterations), the solver's wall
+    time (s), the MBAR fit's wall time (s), and the MBAR fit.
+    """
+    mbar_hessian = pymbar.mbar_solvers.mbar_hessian
+    solve_mbar_for_all_states = pymbar.mbar_solvers.solve_mbar_for_all_states
+    number_of_iterations = [0]
+    solver_s = [0.0]
+
+    def counted_mbar_hessian(*args, **kwargs):
+        number_of_iterations[0] += 1
+        return mbar_hessian(*args, **kwargs)
+
+    def timed_solve_mbar_for_all_states(*args, **kwargs):
+        start_time_s = time.perf_counter()
+        f_k = solve_mbar_for_all_states(*args, **kwargs)
+        solver_s[0] += time.perf_counter() - start_time_s
+        return f_k
+
+    pymbar.mbar_solvers.mbar_hessian = counted_mbar_hessian
+    pymbar.mbar_solvers.solve_mbar_for_all_states = (
+        timed_solve_mbar_for_all_states
+    )
+    try:
+        start_time_s = time.perf_counter()
+        if initial_f_k is None:
+            mbar = MBAR().fit(u_kn)
+        else:
+            mbar = MBAR(initial_f_k=np.asarray(initial_f_k, dtype=float)).fit(
+                u_kn
+            )
+        fit_s = time.perf_counter() - start_time_s
+    finally:
+        pymbar.mbar_solvers.mbar_hessian = mbar_hessian
+        pymbar.mbar_solvers.solve_mbar_for_all_states = (
+            solve_mbar_for_all_states
+        )
+
+    return number_of_iterations[0], solver_s[0], fit_s, mbar
+
+
+def main(number_of_samples, number_of_replicas):
+    starts = ["default", "zeros", "BAR", "replica", "temperature", "rerun"]
+    print(
+        f"{'T_K': <7} {'replica': <8} "
+        + " ".join(f"{'iter_' + start: <16}" for start in starts)
+        + " "
+        + " ".join(f"{start + '_solver_s': <20}" for start in starts)
+        + " "
+        + f"{'dF': <9} {'dF_exact': <9} {'max_diff': <9}"
+    )
+    lambdas = [
+        round(i / (number_of_lambda_windows - 1), 8)
+        for i in range(number_of_lambda_windows)
+    ]
+    totals = {start: [0, 0.0, 0.0] for start in starts}
+    max_difference = 0.0
+    previous_temperature_f_k = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        previous_temperature = None
+        for temperature in temperatures:
+            first_replica_f_k = None
+            for replica in range(number_of_replicas):
+                free_energy_filenames = []
+                for state in range(number_of_lambda_windows):
+                    free_energy_filenames.append(
+                        os.path.join(
+                            tmp_dir,
+                            f"{temperature}_{replica}_Free_Energy_BOX_0_"
+                            "gomc_production_run_"
+                            f"initial_state_{state}.dat",
+                        )
+                    )
+                    write_linear_free_energy_file(
+                        free_energy_filenames[-1],
+                        state,
+                        lambdas,
+                        number_of_samples,
+                        temperature,
+                        seed=[int(temperature), replica, state],
+                    )
+
+                _, u_nk = get_free_energy_dataframes(
+                    free_energy_filenames, temperature
+                )
+                bar_f_k = BAR().fit(u_nk).delta_f_.iloc[0].values
+                replica_f_k = (
+                    bar_f_k if first_replica_f_k is None else first_replica_f_k
+                )
+                if previous_temperature is None:
+                    temperature_f_k = bar_f_k
+                else:
+                    temperature_f_k = (
+                        previous_temperature_f_k[replica]
+                        * previous_temperature
+                        / temperature
+                    )
+
+                fits, counts = {}, {}
+                for start, initial_f_k in [
+                    ("default", None),
+                    ("zeros", np.zeros(number_of_lambda_windows)),
+                    ("BAR", bar_f_k),
+                    ("replica", replica_f_k),
+                    ("temperature", temperature_f_k),
+                    ("rerun", None),
+                ]:
+                    if start == "rerun":
+                        initial_f_k = fits["zeros"].delta_f_.iloc[0].values
+                    (
+                        iterations,
+                        solver_s,
+                        fit_s,
+                        fits[start],
+                    ) = fit_mbar_with_solver_counts(u_nk, initial_f_k)
+                    counts[start] = (iterations, solver_s)
+                    totals[start][0] += iterations
+                    totals[start][1] += solver_s
+                    totals[start][2] += fit_s
+                if first_replica_f_k is None:
+                    first_replica_f_k = fits["replica"].delta_f_.iloc[0].values
+                previous_temperature_f_k[replica] = (
+                    fits["temperature"].delta_f_.iloc[0].values
+                )
+
+                # the warm started free energies must agree with the cold
+                # started free energies
+                difference = max(
+                    np.max(
+                        np.abs(
+                            fits[start].delta_f_.values
+                            - fits["zeros"].delta_f_.values
+                        )
+                    )
+                    for start in starts
+                )
+                max_difference = max(max_difference, difference)
+                beta = 1 / (R_kJmol * temperature)
+                print(
+                    f"{temperature: <7} {replica: <8} "
+                    + " ".join(f"{counts[start][0]: <16}" for start in starts)
+                    + " "
+                    + " ".join(
+                        f"{counts[start][1]: <20.4f}" for start in starts
+                    )
+                    + " "
+                    + f"{fits['zeros'].delta_f_.iloc[0, -1]: <9.4f} "
+                    f"{beta * get_v_0(temperature) - (beta * sigma) ** 2 / 2: <9.4f} {difference: <9.2e}"
+                )
+            previous_temperature = temperature
+
+    for warm_start, cold_start in [
+        ("BAR", "zeros"),
+        ("replica", "zeros"),
+        ("replica", "BAR"),
+        ("temperature", "BAR"),
+        ("rerun", "BAR"),
+    ]:
+        print(
+            f"The {warm_start} starts vs. the {cold_start} starts:"
+            f" {100 * (1 - totals[warm_start][0] / totals[cold_start][0]):.1f} "
+            "%"
+            " fewer solver iterations,"
+            f" {100 * (1 - totals[warm_start][1] / totals[cold_start][1]):.1f} "
+            "%"
+            f" less solver time ({totals[cold_start][1]:.2f} s vs."
+            f" {totals[warm_start][1]:.2f} s),"
+            f" {100 * (1 - totals[warm_start][2] / totals[cold_start][2]):.1f} "
+            "%"
+            f" less MBAR fit time ({totals[cold_start][2]:.2f} s vs."
+            f" {totals[warm_start][2]:.2f} s)"
+        )
+    print(
+        "The largest free energy difference of the warm and cold starts is"
+        f" {max_difference:.2e} kT."
+    )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    )
@@ -0,0 +1,129 @@
+"""Benchmark the import time of each project's project.py file.
+
+The label only commands (i.e., 'python project.py status' and
+'python project.py submit --pretend') pay the project.py import time before
+anything is printed.  Each project.py is imported in a new Python process
+(from its project directory, like the signac-flow commands), which is timed,
+and the heavy scientific packages loaded by the import are listed.  The heavy
+packages are only imported in the operations, so the import is a regression
+if any of them are loaded, or if it takes longer than the maximum time.
+
+If project.py can not be imported (i.e., a required package is not
+installed), the error is printed for that project instead.
+
+Usage (from this directory):
+    python bench_project_import_time.py [maximum_import_time_s]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+project_names = [
+    "S8_vapor_liquid_equilibrium",
+    "adsorption_CO2_in_IRMOF_1",
+    "noble_gas_free_energies",
+]
+
+heavy_packages = [
+    "mbuild",
+    "mosdef_gomc",
+    "gmso",
+    "foyer",
+    "unyt",
+    "pandas",
+    "scipy",
+    "alchemlyb",
+    "pymbar",
+]
+
+number_of_imports = 3
+
+# the import is run in a new process, so nothing is already imported
+import_project_script = f"""
+import contextlib
+import io
+import json
+import sys
+import time
+
+start_time_s = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import project
+import_time_s = time.perf_counter() - start_time_s
+
+print(json.dumps({{
+    "import_time_s": import_time_s,
+    "heavy_packages": [
+        package for package in {heavy_packages!r} if package in sys.modules
+    ],
+}}))
+"""
+
+
+def time_project_import(project_directory):
+    """Import project.py in a new process, and return the results or the
+    error.
+    """
+    completed_process = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", import_project_script],
+        cwd=project_directory,
+        capture_output=True,
+        text=True,
+    )
+    if completed_process.returncode != 0:
+        error_lines = completed_process.stderr.strip().splitlines()
+        return (
+            None,
+            error_lines[-1] if len(error_lines) > 0 else "unknown error",
+        )
+
+    return json.loads(completed_process.stdout.strip().splitlines()[-1]), None
+
+
+def main(maximum_import_time_s):
+    benchmarks_directory = os.path.dirname(os.path.abspath(__file__))
+
+    regression_found = False
+    print(f"{'project': <32} {'best_import_s': <15} {'heavy_packages_loaded'}")
+    for project_name in project_names:
+        project_directory = os.path.join(
+            benchmarks_directory, "..", project_name, "project"
+        )
+
+        import_times_s = []
+        loaded_heavy_packages = set()
+        error = None
+        for _ in range(number_of_imports):
+            import_results, error = time_project_import(project_directory)
+            if error is not None:
+                break
+            import_times_s.append(import_results["import_time_s"])
+            loaded_heavy_packages.update(import_results["heavy_packages"])
+
+        if error is not None:
+            print(f"{project_name: <32} {'-': <15} import failed: {error}")
+            continue
+
+        best_import_time_s = min(import_times_s)
+        print(
+            f"{project_name: <32} {best_import_time_s: <15.3f} "
+            f"{sorted(loaded_heavy_packages)}"
+        )
+        if (
+            len(loaded_heavy_packages) > 0
+            or best_import_time_s > maximum_import_time_s
+        ):
+            regression_found = True
+
+    if regression_found:
+        print(
+            "REGRESSION: a project.py imports a heavy package or takes longer "
+            f"than {maximum_import_time_s} s to import."
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
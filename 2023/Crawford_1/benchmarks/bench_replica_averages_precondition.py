@@ -0,0 +1,136 @@
+"""Benchmark the status time of the part_5b_analysis_replica_averages
+precondition.
+
+Builds synthetic signac projects of increasing size, with 'replicates_per_group'
+replicates per state point and every job's individual simulation averages file
+written.  Then the status time (flow's 'print_status') is compared for a
+groupby aggregate operation using the original project wide precondition
+('all(... for j in jobs[0]._project)'), which checks every job for every
+aggregate, and the 'ProjectReadinessIndex' in 'src/utils/readiness_index.py'.
+
+Usage (from this directory):
+    python bench_replica_averages_precondition.py [number_of_jobs ...]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "S8_vapor_liquid_equilibrium",
+        "project",
+    ),
+)
+
+import signac
+from flow import FlowProject, aggregator
+from src.utils.readiness_index import ProjectReadinessIndex
+
+replicates_per_group = 5
+output_replicate_txt_file_name = "analysis_avg_data_box_0.txt"
+
+
+def statepoint_without_replica(job):
+    """Group the jobs by all the state point keys except the replica number."""
+    keys = sorted(
+        tuple(i for i in job.sp.keys() if i not in {"replica_number_int"})
+    )
+    return [(key, job.sp[key]) for key in keys]
+
+
+def make_project_class(use_readiness_index):
+    """Make a FlowProject subclass with the old or new replicate averages
+    precondition.
+    """
+
+    class BenchProject(FlowProject):
+        pass
+
+    @BenchProject.label
+    def part_5a_analysis_individual_simulation_averages_completed(*jobs):
+        return all(job.isfile(output_replicate_txt_file_name) for job in jobs)
+
+    if use_readiness_index:
+        part_5a_readiness_index = ProjectReadinessIndex(
+            part_5a_analysis_individual_simulation_averages_completed
+        )
+
+        def project_wide_precondition(*jobs):
+            return part_5a_readiness_index.all_ready(*jobs)
+
+    else:
+
+        def project_wide_precondition(*jobs):
+            return all(
+                part_5a_analysis_individual_simulation_averages_completed(j)
+                for j in jobs[0]._project
+            )
+
+    @aggregator.groupby(key=statepoint_without_replica)
+    @BenchProject.pre(project_wide_precondition)
+    @BenchProject.pre(part_5a_analysis_individual_simulation_averages_completed)
+    @BenchProject.operation
+    def part_5b_analysis_replica_averages(*jobs):
+        pass
+
+    return BenchProject
+
+
+def build_workspace(root, number_of_jobs):
+    """Initialize the jobs, with each job's individual averages file written."""
+    project = signac.init_project(root=root)
+    for job_i in range(number_of_jobs):
+        job = project.open_job(
+            {
+                "production_temperature_K": 300 + job_i // replicates_per_group,
+                "replica_number_int": job_i % replicates_per_group,
+            }
+        ).init()
+        with open(job.fn(output_replicate_txt_file_name), "w") as fp:
+            fp.write("0.0\n")
+
+
+def time_status(project_class, root):
+    """Return the wall time (s) of the project's status.
+
+    Only one status pass is timed, since the readiness index is kept between
+    passes in the same process, which would favor the index.
+    """
+    project = project_class.get_project(root=root)
+    start_time_s = time.perf_counter()
+    project.print_status(file=io.StringIO(), err=io.StringIO())
+
+    return time.perf_counter() - start_time_s
+
+
+def main(numbers_of_jobs):
+    print(
+        f"{'jobs': <8} {'aggregates': <12} {'project_wide_s': <16} "
+        f"{'readiness_index_s': <18} {'speedup': <10}"
+    )
+    original_project_class = make_project_class(use_readiness_index=False)
+    index_project_class = make_project_class(use_readiness_index=True)
+    for number_of_jobs in numbers_of_jobs:
+        with tempfile.TemporaryDirectory() as root:
+            build_workspace(root, number_of_jobs)
+            project_wide_s = time_status(original_project_class, root)
+            readiness_index_s = time_status(index_project_class, root)
+            print(
+                f"{number_of_jobs: <8} "
+                f"{-(-number_of_jobs // replicates_per_group): <12} "
+                f"{project_wide_s: <16.4f} {readiness_index_s: <18.4f} "
+                f"{project_wide_s / readiness_index_s: <10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        [int(number_of_jobs) for number_of_jobs in sys.argv[1:]]
+        or [65, 250, 1000]
+    )
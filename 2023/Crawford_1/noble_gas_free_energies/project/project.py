@@ -4,26 +4,50 @@
 
 import flow
 # from flow.environment import StandardEnvironment
-import mbuild as mb
-import mosdef_gomc.formats.gmso_charmm_writer as mf_charmm
-import mosdef_gomc.formats.gmso_gomc_conf_writer as gomc_control
-import numpy as np
-
-from alchemlyb.parsing.gomc import  extract_dHdl,  extract_u_nk
-from alchemlyb.estimators import MBAR, BAR, TI
-import alchemlyb.preprocessing.subsampling as ss
-import pandas as pd
 import numpy as np
 import os
+import shlex
+import sys
 
-import unyt as u
 from flow import FlowProject, aggregator
 from flow.environment import DefaultSlurmEnvironment
 
+from src.utils.console_output import gomc_console_output_completed
+from src.utils.console_output import namd_console_output_completed
+from src.utils.convergence_controller import convergence_record_filename
+from src.utils.convergence_controller import gomc_run_converged
+from src.utils.forcefields import LazyPathRegistry
 from src.utils.forcefields import get_ff_path
-from src.utils.forcefields import get_molecule_path
+from src.utils.forcefields import get_smiles_or_mol2_dict
+from src.utils.free_energy_files import get_free_energy_dataframes
+from src.utils.free_energy_files import get_subsampled_free_energy_dataframes
+from src.utils.label_cache import LabelCache
+from src.utils.label_prefetch import LabelPrefetch
+from src.utils.lambda_windows import (
+    get_free_energy_files_lambda_window_diagnostics,
+)
+from src.utils.lambda_windows import get_lambda_window_diagnostics
+from src.utils.lambda_windows import get_refined_lambdas
+from src.utils.live_analysis import live_analysis_snapshot_current
+from src.utils.live_analysis import update_live_analysis_snapshot
+from src.utils.output_manifest import output_files_written
+from src.utils.output_manifest import output_manifest_has_files
+from src.utils.output_manifest import remove_output_manifest_entry
+from src.utils.output_manifest import write_output_manifest
+from src.utils.process_pool import get_process_pool_size
+from src.utils.process_pool import map_in_process_pool
+from src.utils.readiness_index import ProjectReadinessIndex
 from templates.NAMD_conf_template import generate_namd_equilb_control_file
 
+# the heavy scientific packages (mbuild, mosdef_gomc, unyt, pandas, and
+# alchemlyb) are imported in the operations that use them, so the label only
+# commands (i.e., status and submit --pretend) start fast
+
+
+# the label results, which are evaluated for all the jobs on a thread pool
+# for the status and submit when label_prefetch_threads_int > 0
+label_prefetch = LabelPrefetch()
+
 
 class Project(FlowProject):
     """Subclass of FlowProject to provide custom methods and attributes."""
@@ -31,6 +55,39 @@ class Project(FlowProject):
     def __init__(self):
         super().__init__()
 
+    @classmethod
+    def label(cls, label_name_or_func=None):
+        """Designate a function as a label function, which uses the prefetched
+        results if available.
+        """
+        if callable(label_name_or_func):
+            return super().label(label_prefetch.memoized(label_name_or_func))
+
+        def label_func(func):
+            return super(Project, cls).label(label_name_or_func)(
+                label_prefetch.memoized(func)
+            )
+
+        return label_func
+
+    def print_status(self, jobs=None, *args, **kwargs):
+        """Print the status, with the labels prefetched on
+        label_prefetch_threads_int threads.
+        """
+        with label_prefetch.prefetch(
+            self, jobs, max_workers=label_prefetch_threads_int
+        ):
+            return super().print_status(jobs, *args, **kwargs)
+
+    def submit(self, bundle_size=1, jobs=None, *args, **kwargs):
+        """Submit the operations, with the labels prefetched on
+        label_prefetch_threads_int threads.
+        """
+        with label_prefetch.prefetch(
+            self, jobs, max_workers=label_prefetch_threads_int
+        ):
+            return super().submit(bundle_size, jobs, *args, **kwargs)
+
 
 class Grid(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     """Subclass of DefaultSlurmEnvironment for WSU's Grid cluster."""
@@ -39,6 +96,12 @@ class Grid(DefaultSlurmEnvironment):  # Grid(StandardEnvironment):
     template = "grid.sh"
 
 
+# the label results are cached in each job's "label_cache.json" file, and are
+# only recomputed when the (path, size, mtime) of the files the label reads
+# change.
+label_cache = LabelCache()
+
+
 
 # ******************************************************
 # users typical variables, but not all (start)
@@ -107,6 +170,123 @@ walltime_gomc_production_hr = 368
 walltime_gomc_analysis_hr = 4
 memory_needed = 16
 
+# the number of threads used to evaluate the labels for all the jobs in parallel
+# for the status and submit, which is useful on networked file systems (i.e.,
+# Lustre).  Set to 0 to evaluate the labels serially (signac-flow's default).
+# Note: 'python project.py run' always evaluates the labels serially.
+label_prefetch_threads_int = 0
+
+# the number of processes used to calculate the individual simulation averages
+# (part_5a).  If 1, each job is analyzed in its own part_5a operation
+# (signac-flow's default).  If > 1, or -1 for all the cores available to the
+# process (i.e., the Slurm allocation), the jobs of each
+# statepoint_without_replica group (i.e., the replicas) are analyzed in a single
+# part_5a operation, with the per-job calculations spread over a process pool,
+# and the files are written after all the calculations finish.  Only the group's
+# jobs with completed production runs, which are not analyzed yet, are analyzed,
+# so an unfinished job does not hold back the group's other jobs, and a new
+# replica does not re-analyze the group's analyzed jobs.
+part_5a_processes_int = 1
+
+# subsample each lambda window's uncorrelated samples before the TI, MBAR, and
+# BAR free energies (part_5a), from the window's total dH/dl (the sum of its
+# dU/dL columns), like alchemlyb's decorrelate_dhdl, so the estimators' problem
+# is smaller and their uncertainties are for uncorrelated samples.  The same
+# samples are used for the dH/dl (TI) and u_nk (MBAR and BAR).
+# "equilibrium_detection" removes each window's non-equilibrated start (t0) and
+# subsamples every statistical inefficiency (g) samples, and
+# "statistical_inefficiency" subsamples all the samples every ceil(g) samples
+# (alchemlyb's conservative subsampling).  Each window's t0_step, g, and number
+# of uncorrelated samples (Neff) are recorded in the job document's
+# "part_5a_subsampling".  If None, all the samples are used.
+part_5a_subsample_method_str = "equilibrium_detection"
+
+# warm start the MBAR solve of each job (part_5a) from its own reduced free
+# energies (f_k), recorded in the job document's "part_5a_mbar_f_k" by an
+# earlier part_5a, when part_5a is rerun (80 % fewer MBAR solver iterations, see
+# benchmarks/bench_mbar_warm_start.py).  Only this rerun seeding saves
+# iterations.  The first part_5a of each job is seeded from the job's BAR free
+# energies, which is alchemlyb 2's default MBAR initial guess (no savings
+# there), and saves 21 % of the iterations with the pinned alchemlyb 1, whose
+# default initial guess is zeros.  Seeding from another replica or temperature
+# of the job is not done, as it saves no iterations vs. the BAR free energies.
+# The converged free energies only change within the MBAR solver's tolerance.
+# If False, the MBAR solve uses alchemlyb's default initial guess.
+part_5a_mbar_warm_start_bool = True
+
+# the live analysis of the running production simulations
+# (part_3d_live_analysis_of_production_run), which reads only the data appended
+# to the Free_Energy files since the last snapshot, and writes the running
+# (Welford) averages to each job's "live_analysis_snapshot.json" file.  Set to
+# True to run it while the production simulations are running (i.e., 'python
+# project.py run -o part_3d_live_analysis_of_production_run').
+live_analysis_of_production_run_bool = False
+
+# the convergence controller of the production runs
+# (src/utils/convergence_controller.py), which runs each lambda window's GOMC
+# simulation and stops it when the standard error (sem) of each of the window's
+# dU/dL columns is at or below the target sem (in the Free_Energy file's
+# kJ/mol), and has at least the minimum number of uncorrelated samples (Neff)
+# and equilibrated fraction of the samples (after the detected start of the
+# equilibrated data), so the quickly converging windows do not run all the
+# gomc_steps_lamda_production steps.  The TI free energy is the trapezoid sum of
+# the windows' mean dU/dL, whose weights sum to 1, so its sem is at most the
+# target sem for each dU/dL column.  A constant dU/dL column (i.e., the zero
+# dU/dL(Coulomb) of the uncharged noble gases) has a zero sem and is converged.
+# The sem is checked every check interval, after the start of the equilibrated
+# data is detected.  The stopped runs are completed, as recorded in their
+# "convergence_gomc_production_run_initial_state_X.json" file.  If False, the
+# production runs run all their steps.
+production_run_convergence_controller_bool = False
+production_run_target_sem_dU_dL_kJ_per_mol = 0.1
+production_run_convergence_minimum_neff = 50
+production_run_convergence_minimum_equilibrated_fraction = 0.8
+production_run_convergence_check_interval_s = 600
+
+# the stationarity controller of the equilibration runs
+# (src/utils/convergence_controller.py), which runs GOMC and stops it when each
+# lambda window's density and energy (TOT_DENS and TOT_EN) have been stationary
+# (after the detected start of their equilibrated data) for the stationary
+# window steps, so the quickly equilibrating statepoints start their production
+# runs without running all the gomc_steps_equilb_design_ensemble steps.  Only
+# the stationary steps are checked (there is no target sem).  GOMC is only
+# stopped after the restart files, which the production runs start from, are
+# written again (every RestartFreq steps, which can be less often than the Blk
+# file rows) after the run is stationary, and are completely written.  The
+# stopped runs are completed, as recorded in their
+# "convergence_gomc_equilb_design_ensemble_initial_state_X.json" file.  If
+# False, the equilibration runs run all their steps.
+equilb_run_stationarity_controller_bool = False
+equilb_run_stationary_window_steps = 2 * 10**6
+equilb_run_stationarity_check_interval_s = 600
+
+# the lambda window diagnostics and refinement.  part_5a records the MBAR
+# overlap of each pair of neighbouring lambda windows in the job document's
+# "part_5a_lambda_window_overlaps", each window's fraction of the TI variance in
+# "part_5a_lambda_window_variance_fractions", and the suggested lambda schedule
+# in "part_5a_suggested_LambdaVDW_list", with a new window at the midpoint of
+# each pair with an overlap below the minimum overlap (the pairs with the
+# largest variances of their MBAR free energy differences first, up to the
+# maximum number of windows).  If lambda_window_refinement_bool is True, each
+# job's lambda schedule is refined in the same way after its equilibration runs,
+# from the equilibration runs' free energy files, before its production runs
+# start (part_4b_refine_lambda_windows).  The job's equilibration runs and GOMC
+# control files are moved to a "lambda_window_refinement_round_X" folder, and
+# the control files are rewritten and the equilibration runs are rerun for the
+# refined schedule, until all the neighbouring overlaps are at or above the
+# minimum overlap, or the schedule has the maximum number of windows.  Each
+# refinement round reruns the equilibration runs of ALL the refined schedule's
+# windows, not only the new windows, as each window's free energy file only has
+# the energies (DelE) of its own schedule's lambda states, which the next
+# round's overlaps and the production runs' MBAR need.  So a round costs up to
+# lambda_window_refinement_maximum_number_of_windows_int equilibration runs,
+# e.g., one round from 11 to 21 windows runs 11 + 21 = 32 equilibration runs per
+# job, 2.9 times the 11 equilibration runs without the refinement.  Each job
+# runs the GOMC simulations of its own lambda windows (the job document's
+# "InitialState_list").
+lambda_window_refinement_bool = False
+lambda_window_minimum_overlap = 0.03
+lambda_window_refinement_maximum_number_of_windows_int = 21
 
 
 # forcefield names dict
@@ -125,33 +305,14 @@ smiles_or_mol2_name_to_value_dict = {
 }
 
 
-# get the paths to the smiles or mol2 files
-smiles_or_mol2 = {}
-for smiles_or_mol2_iter_i in list(smiles_or_mol2_name_to_value_dict.keys()):
-    smiles_or_mol2.update(
-        {str(smiles_or_mol2_iter_i):
-             {"use_smiles": get_molecule_path(
-                 str(smiles_or_mol2_name_to_value_dict[str(smiles_or_mol2_iter_i)]))[0],
-              "smiles_or_mol2": get_molecule_path(
-                  str(smiles_or_mol2_name_to_value_dict[str(smiles_or_mol2_iter_i)]))[1],
-              }
-         }
-    )
-
-# get the paths to the FF xmls
-forcefield_dict = {}
-for forcefield_dict_iter_i in list(forcefield_residue_to_ff_filename_dict.keys()):
-    forcefield_dict.update(
-        {str(forcefield_dict_iter_i): get_ff_path(
-            forcefield_residue_to_ff_filename_dict[str(forcefield_dict_iter_i)])
-        }
-    )
-print("*********************")
-print("*********************")
-print("smiles_or_mol2 = " +str(smiles_or_mol2))
-print("forcefield_dict = " +str(forcefield_dict))
-print("*********************")
-print("*********************")
+# the paths to the smiles or mol2 files, and the FF xmls, which are resolved
+# on first use in the build_charmm function (not when the project is imported)
+smiles_or_mol2 = LazyPathRegistry(
+    smiles_or_mol2_name_to_value_dict, get_smiles_or_mol2_dict
+)
+forcefield_dict = LazyPathRegistry(
+    forcefield_residue_to_ff_filename_dict, get_ff_path
+)
 
 # ******************************************************
 # users typical variables, but not all (end)
@@ -252,6 +413,12 @@ def part_1a_initial_data_input_to_json(job):
 @flow.with_job
 def initial_parameters(job):
     """Set the initial job parameters into the jobs doc json file."""
+    import unyt as u
+
+    # the parameters are set in memory and written to the job document in one
+    # write, so the job document is only created if all the parameters are set
+    initial_doc = {}
+
     # select
 
     # set free energy data in doc
@@ -273,22 +440,28 @@ def initial_parameters(job):
     if LambdaVDW_list[0] != 0 and LambdaVDW_list[-1] != 1 :
         raise ValueError("ERROR: The selected lambda list values do not start with a 0 and end 1.")
 
-    job.doc.LambdaVDW_list = LambdaVDW_list
-    job.doc.InitialState_list = InitialState_list
+    initial_doc["LambdaVDW_list"] = LambdaVDW_list
+    initial_doc["InitialState_list"] = InitialState_list
 
     # set the GOMC production ensemble temp, pressure, molecule, box dimenstion and residue names
-    job.doc.production_ensemble = "NVT"
-    job.doc.production_pressure_bar = (1 * u.atm).to('bar')
-    job.doc.production_temperature_K = job.sp.production_temperature_K
+    initial_doc["production_ensemble"] = "NVT"
+    initial_doc["production_pressure_bar"] = (1 * u.atm).to("bar")
+    initial_doc["production_temperature_K"] = job.sp.production_temperature_K
 
-    job.doc.N_liquid_solvent = 1000
-    job.doc.N_liquid_solute = 1
+    initial_doc["N_liquid_solvent"] = 1000
+    initial_doc["N_liquid_solute"] = 1
 
-    job.doc.liq_box_lengths_ang = 31.07 * u.angstrom
+    initial_doc["liq_box_lengths_ang"] = 31.07 * u.angstrom
 
-    job.doc.Rcut_ang = 15 * u.angstrom  # this is the Rcut for GOMC it is the Rswitch for NAMD
-    job.doc.Rcut_for_switch_namd_ang = 17 * u.angstrom  # Switch Rcut for NAMD's Switch function
-    job.doc.neighbor_list_dist_namd_ang = 22 * u.angstrom # NAMD's neighbor list
+    initial_doc["Rcut_ang"] = (
+        15 * u.angstrom
+    )  # this is the Rcut for GOMC it is the Rswitch for NAMD
+    initial_doc["Rcut_for_switch_namd_ang"] = (
+        17 * u.angstrom
+    )  # Switch Rcut for NAMD's Switch function
+    initial_doc["neighbor_list_dist_namd_ang"] = (
+        22 * u.angstrom
+    )  # NAMD's neighbor list
 
     # list replica seed numbers
     replica_no_to_seed_dict = {
@@ -315,21 +488,30 @@ def initial_parameters(job):
         20: 20,
     }
 
-    job.doc.replica_number_int = replica_no_to_seed_dict.get(
+    initial_doc["replica_number_int"] = replica_no_to_seed_dict.get(
         int(job.sp.replica_number_int)
     )
 
     # set solvent and solute in doc
-    job.doc.solvent = "TIP4"
-    job.doc.solute = job.sp.solute
+    initial_doc["solvent"] = "TIP4"
+    initial_doc["solute"] = job.sp.solute
 
     # set rcut, ewalds
-    if job.doc.solvent in ["TIP4", "TIP3"] and job.doc.solute in ["He", "Ne", "Kr", "Ar", "Xe", "Rn"]:
-        job.doc.namd_node_ncpu = 1
-        job.doc.namd_node_ngpu = 1
-
-        job.doc.gomc_ncpu = 1  # 1 is optimal but I want data quick.  run time is set for 1 cpu
-        job.doc.gomc_ngpu = 0
+    if initial_doc["solvent"] in ["TIP4", "TIP3"] and initial_doc["solute"] in [
+        "He",
+        "Ne",
+        "Kr",
+        "Ar",
+        "Xe",
+        "Rn",
+    ]:
+        initial_doc["namd_node_ncpu"] = 1
+        initial_doc["namd_node_ngpu"] = 1
+
+        initial_doc["gomc_ncpu"] = (
+            1  # 1 is optimal but I want data quick.  run time is set for 1 cpu
+        )
+        initial_doc["gomc_ngpu"] = 0
 
     else:
         raise ValueError(
@@ -337,11 +519,11 @@ def initial_parameters(job):
         )
 
     # get the namd binary paths
-    if job.doc.namd_node_ngpu == 0:
-        job.doc.namd_cpu_or_gpu = "CPU"
+    if initial_doc["namd_node_ngpu"] == 0:
+        initial_doc["namd_cpu_or_gpu"] = "CPU"
 
-    elif job.doc.namd_node_ngpu == 1:
-        job.doc.namd_cpu_or_gpu = "GPU"
+    elif initial_doc["namd_node_ngpu"] == 1:
+        initial_doc["namd_cpu_or_gpu"] = "GPU"
 
     else:
         raise ValueError(
@@ -350,11 +532,11 @@ def initial_parameters(job):
         )
 
     # get the gomc binary paths
-    if job.doc.gomc_ngpu == 0:
-        job.doc.gomc_cpu_or_gpu = "CPU"
+    if initial_doc["gomc_ngpu"] == 0:
+        initial_doc["gomc_cpu_or_gpu"] = "CPU"
 
-    elif job.doc.gomc_ngpu == 1:
-        job.doc.gomc_cpu_or_gpu = "GPU"
+    elif initial_doc["gomc_ngpu"] == 1:
+        initial_doc["gomc_cpu_or_gpu"] = "GPU"
 
     else:
         raise ValueError(
@@ -363,25 +545,35 @@ def initial_parameters(job):
         )
 
     # set the initial iteration number of the simulation
-    job.doc.gomc_equilb_design_ensemble_dict = {}
-    job.doc.gomc_production_run_ensemble_dict = {}
+    initial_doc["gomc_equilb_design_ensemble_dict"] = {}
+    initial_doc["gomc_production_run_ensemble_dict"] = {}
 
 
-    if job.doc.production_ensemble == "NPT":
-        job.doc.namd_equilb_NPT_gomc_binary_file = f"namd2"
-        job.doc.gomc_equilb_design_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_NPT"
-        job.doc.gomc_production_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_NPT"
+    if initial_doc["production_ensemble"] == "NPT":
+        initial_doc["namd_equilb_NPT_gomc_binary_file"] = f"namd2"
+        initial_doc["gomc_equilb_design_ensemble_gomc_binary_file"] = (
+            f"GOMC_{initial_doc['gomc_cpu_or_gpu']}_NPT"
+        )
+        initial_doc["gomc_production_ensemble_gomc_binary_file"] = (
+            f"GOMC_{initial_doc['gomc_cpu_or_gpu']}_NPT"
+        )
 
-    elif job.doc.production_ensemble == "NVT":
-        job.doc.namd_equilb_NPT_gomc_binary_file = f"namd2"
-        job.doc.gomc_equilb_design_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_NPT"
-        job.doc.gomc_production_ensemble_gomc_binary_file = f"GOMC_{job.doc.gomc_cpu_or_gpu}_NVT"
+    elif initial_doc["production_ensemble"] == "NVT":
+        initial_doc["namd_equilb_NPT_gomc_binary_file"] = f"namd2"
+        initial_doc["gomc_equilb_design_ensemble_gomc_binary_file"] = (
+            f"GOMC_{initial_doc['gomc_cpu_or_gpu']}_NPT"
+        )
+        initial_doc["gomc_production_ensemble_gomc_binary_file"] = (
+            f"GOMC_{initial_doc['gomc_cpu_or_gpu']}_NVT"
+        )
 
     else:
         raise ValueError(
             "ERROR: The 'GCMC', 'GEMC_NVT', 'GEMC_NPT' ensembles is not currently available for this project.py "
         )
 
+    job.doc.update(initial_doc)
+
 
 # ******************************************************
 # ******************************************************
@@ -403,21 +595,17 @@ def initial_parameters(job):
 @flow.with_job
 def mosdef_input_written(job):
     """Check that the mosdef files (psf, pdb, and force field (FF) files) are written ."""
-    file_written_bool = False
-
-    if (
-        job.isfile(f"{namd_ff_filename_str}.inp")
-        and job.isfile(f"{gomc_ff_filename_str}.inp")
-        and job.isfile(
-            f"{mosdef_structure_box_0_name_str}.psf"
-        )
-        and job.isfile(
-            f"{mosdef_structure_box_0_name_str}.pdb"
-        )
-    ):
-        file_written_bool = True
-
-    return file_written_bool
+    # the files recorded in the output manifest are only checked for their
+    # recorded sizes, not read
+    return output_files_written(
+        job,
+        [
+            f"{namd_ff_filename_str}.inp",
+            f"{gomc_ff_filename_str}.inp",
+            f"{mosdef_structure_box_0_name_str}.psf",
+            f"{mosdef_structure_box_0_name_str}.pdb",
+        ],
+    )
 
 
 # ******************************************************
@@ -434,6 +622,21 @@ def mosdef_input_written(job):
 # function for checking if the GOMC control file is written
 def gomc_control_file_written(job, control_filename_str):
     """General check that the gomc control files are written."""
+    # the control files recorded in the output manifest (with their recorded
+    # sizes) were completely written by the build_psf_pdb_ff_gomc_conf operation
+    if output_manifest_has_files(job, [f"{control_filename_str}.conf"]):
+        return True
+
+    return gomc_control_file_has_output_name(job, control_filename_str)
+
+
+@label_cache.cached(
+    lambda job, control_filename_str: [f"{control_filename_str}.conf"]
+)
+def gomc_control_file_has_output_name(job, control_filename_str):
+    """Check that the gomc control file is written, with its 'OutputName'
+    line.
+    """
     file_written_bool = False
     control_file = f"{control_filename_str}.conf"
 
@@ -451,6 +654,21 @@ def gomc_control_file_written(job, control_filename_str):
 # function for checking if the NAMD control file is written
 def namd_control_file_written(job, control_filename_str):
     """General check that the NAMD control files are written."""
+    # the control files recorded in the output manifest (with their recorded
+    # sizes) were completely written by the build_psf_pdb_ff_gomc_conf operation
+    if output_manifest_has_files(job, [f"{control_filename_str}.conf"]):
+        return True
+
+    return namd_control_file_has_cell_basis_vector(job, control_filename_str)
+
+
+@label_cache.cached(
+    lambda job, control_filename_str: [f"{control_filename_str}.conf"]
+)
+def namd_control_file_has_cell_basis_vector(job, control_filename_str):
+    """Check that the NAMD control file is written, with its 'cellBasisVector1'
+    line.
+    """
     file_written_bool = False
     control_file = f"{control_filename_str}.conf"
     if job.isfile(control_file):
@@ -627,48 +845,36 @@ def part_part_3c_output_gomc_production_run_started(job):
 # ******************************************************
 # ******************************************************
 # function for checking if GOMC simulations are completed properly
+@label_cache.cached(
+    lambda job, control_filename_str: [
+        f"out_{control_filename_str}.dat",
+        convergence_record_filename(control_filename_str),
+    ]
+)
 def gomc_sim_completed_properly(job, control_filename_str):
-    """General check to see if the gomc simulation was completed properly."""
-    job_run_properly_bool = False
+    """General check to see if the gomc simulation was completed properly,
+    or was stopped by the convergence controller when it converged."""
     output_log_file = "out_{}.dat".format(control_filename_str)
-    if job.isfile(output_log_file):
-        with open(job.fn(f"{output_log_file}"), "r") as fp:
-            out_gomc = fp.readlines()
-            for i, line in enumerate(out_gomc):
-                if "Move" in line:
-                    split_move_line = line.split()
-                    if (
-                        split_move_line[0] == "Move"
-                        and split_move_line[1] == "Type"
-                        and split_move_line[2] == "Mol."
-                        and split_move_line[3] == "Kind"
-                    ):
-                        job_run_properly_bool = True
-    else:
-        job_run_properly_bool = False
 
-    return job_run_properly_bool
+    # only the end of the GOMC console file is read to find the 'Move Type Mol.
+    # Kind' footer
+    return gomc_console_output_completed(
+        job.fn(output_log_file)
+    ) or gomc_run_converged(
+        job.fn(convergence_record_filename(control_filename_str))
+    )
 
 # function for checking if NAMD simulations are completed properly
+@label_cache.cached(
+    lambda job, control_filename_str: [f"out_{control_filename_str}.dat"]
+)
 def namd_sim_completed_properly(job, control_filename_str):
     """General check to see if the namd simulation was completed properly."""
-    job_run_properly_bool = False
     output_log_file = "out_{}.dat".format(control_filename_str)
-    if job.isfile(output_log_file):
-        with open(job.fn(f"{output_log_file}"), "r") as fp:
-            out_namd = fp.readlines()
-            for i, line in enumerate(out_namd):
-                if "WallClock:" in line:
-                    split_move_line = line.split()
-                    if (split_move_line[0] == "WallClock:"
-                            and split_move_line[2] == "CPUTime:"
-                            and split_move_line[4] == "Memory:"
-                    ):
-                        job_run_properly_bool = True
-    else:
-        job_run_properly_bool = False
 
-    return job_run_properly_bool
+    # only the end of the NAMD console file is read to find the 'WallClock:
+    # CPUTime: Memory:' footer
+    return namd_console_output_completed(job.fn(output_log_file))
 
 # check if melt equilb NVT GOMC run completed by checking the end of the GOMC consol file
 @Project.label
@@ -735,6 +941,18 @@ def part_4c_job_production_run_completed_properly(job):
     except:
         return False
 
+
+# check if the lambda schedule is refined from the equilibration runs
+# (lambda_window_refinement_bool)
+@Project.label
+@flow.with_job
+def part_4b_lambda_windows_refined(job):
+    """Check that the lambda schedule is refined from the equilibration runs
+    (part_4b_refine_lambda_windows).
+    """
+    return job.doc.get("lambda_window_refinement_completed", False)
+
+
 # ******************************************************
 # ******************************************************
 # check if GOMC and NAMD simulation are completed properly (end)
@@ -753,15 +971,82 @@ def part_4c_job_production_run_completed_properly(job):
 @flow.with_job
 def part_5a_analysis_individual_simulation_averages_completed(job):
     """Check that the individual simulation averages files are written ."""
-    file_written_bool = False
-    if (
-        job.isfile(
-            f"{output_replicate_txt_file_name_box_0}"
-        )
+    # the files recorded in the output manifest are only checked for their
+    # recorded sizes, not read
+    if not output_files_written(
+        job,
+        [
+            output_replicate_txt_file_name_box_0,
+        ],
     ):
-        file_written_bool = True
+        return False
+
+    # the jobs analyzed before the subsample method was recorded are taken as
+    # completed
+    analyzed_subsample_method = job.doc.get(
+        "part_5a_analyzed_subsample_method", part_5a_subsample_method_str
+    )
+
+    return analyzed_subsample_method == part_5a_subsample_method_str
+
+
+# check if the individual simulation averages suggest more lambda windows, where
+# the overlaps are low
+@Project.label
+@flow.with_job
+def part_5a_lambda_windows_below_minimum_overlap(job):
+    """Check if the neighbouring lambda windows' overlaps are below the minimum
+    overlap (part_5a).
+    """
+    return job.doc.get(
+        "part_5a_suggested_LambdaVDW_list", job.doc.get("LambdaVDW_list")
+    ) != job.doc.get("LambdaVDW_list")
 
-    return file_written_bool
+
+# index of the jobs without the individual simulation averages written, so the
+# project wide precondition of the replicate averages does not check every job
+# for every aggregate
+part_5a_readiness_index = ProjectReadinessIndex(
+    part_5a_analysis_individual_simulation_averages_completed
+)
+
+
+# check if the individual simulation averages are written for all the jobs in
+# the project
+def part_5a_analysis_all_project_jobs_completed(*jobs):
+    """Check that the individual simulation averages files are written for all
+    the jobs in the project.
+    """
+    return part_5a_readiness_index.all_ready(*jobs)
+
+
+def part_5a_analysis_individual_simulation_averages_completed_for_jobs(*jobs):
+    """Check that the individual simulation averages files are written for all
+    the jobs in the aggregate.
+    """
+    return all(
+        part_5a_analysis_individual_simulation_averages_completed(job)
+        for job in jobs
+    )
+
+
+def get_part_5a_jobs_to_analyze(*jobs):
+    """Get the aggregate's jobs with completed production runs, whose individual
+    simulation averages are not written.
+    """
+    return [
+        job
+        for job in jobs
+        if part_4c_job_production_run_completed_properly(job)
+        and not part_5a_analysis_individual_simulation_averages_completed(job)
+    ]
+
+
+def part_5a_analysis_individual_simulation_averages_ready_for_jobs(*jobs):
+    """Check that any job in the aggregate is ready for its individual
+    simulation averages.
+    """
+    return len(get_part_5a_jobs_to_analyze(*jobs)) > 0
 
 
 # check if analysis for averages of all the replicates is completed
@@ -803,9 +1088,16 @@ def part_5b_analysis_replica_averages_completed(*jobs):
 # build system
 def build_charmm(job, write_files=True):
     """Build the Charmm object and potentially write the pdb, psd, and force field (FF) files."""
+    import mbuild as mb
+    import mosdef_gomc.formats.gmso_charmm_writer as mf_charmm
+    import unyt as u
+
     print("#**********************")
     print("Started: GOMC Charmm Object")
     print("#**********************")
+    print("smiles_or_mol2 = " + str(smiles_or_mol2))
+    print("forcefield_dict = " + str(forcefield_dict))
+    print("#**********************")
     mbuild_box_seed_no = job.doc.replica_number_int
 
     solvent = mb.load(smiles_or_mol2[job.doc.solvent]['smiles_or_mol2'],
@@ -929,6 +1221,9 @@ def build_charmm(job, write_files=True):
 def build_psf_pdb_ff_gomc_conf(job):
     """Build the Charmm object and write the pdb, psd, and force field (FF)
     files for all the simulations in the workspace."""
+    import mosdef_gomc.formats.gmso_gomc_conf_writer as gomc_control
+    import unyt as u
+
     [namd_charmm_object_with_files, gomc_charmm_object_with_files] = build_charmm(job, write_files=True)
 
     FreeEnergyCalc = [True, int(gomc_free_energy_output_data_every_X_steps)]
@@ -1009,6 +1304,10 @@ def build_psf_pdb_ff_gomc_conf(job):
     print("Started: equilb NPT or GEMC-NVT GOMC control file writing")
     print("#**********************")
 
+    # the control file names for each initial state are written to the job
+    # document in one write after the loop
+    gomc_equilb_design_ensemble_dict = {}
+    gomc_production_run_ensemble_dict = {}
     for initial_state_sims_i in list(job.doc.InitialState_list):
         namd_restart_pdb_psf_file_name_str = mosdef_structure_box_0_name_str
 
@@ -1017,7 +1316,7 @@ def build_psf_pdb_ff_gomc_conf(job):
             gomc_equilb_design_ensemble_control_file_name_str, initial_state_sims_i
         )
 
-        job.doc.gomc_equilb_design_ensemble_dict.update(
+        gomc_equilb_design_ensemble_dict.update(
             {
                 initial_state_sims_i: {
                     "restart_control_file_name": restart_control_file_name_str,
@@ -1158,7 +1457,7 @@ def build_psf_pdb_ff_gomc_conf(job):
         restart_control_file_name_str = "{}_initial_state_{}".format(
             gomc_equilb_design_ensemble_control_file_name_str, int(initial_state_sims_i)
         )
-        job.doc.gomc_production_run_ensemble_dict.update(
+        gomc_production_run_ensemble_dict.update(
             {
                 initial_state_sims_i: {
                     "restart_control_file_name": restart_control_file_name_str,
@@ -1298,6 +1597,35 @@ def build_psf_pdb_ff_gomc_conf(job):
         # ******************************************************
 
 
+    job.doc.update(
+        {
+            "gomc_equilb_design_ensemble_dict": gomc_equilb_design_ensemble_dict,
+            "gomc_production_run_ensemble_dict": gomc_production_run_ensemble_dict,
+        }
+    )
+
+    # record the written files in the output manifest, which the labels read
+    write_output_manifest(
+        job,
+        "build_psf_pdb_ff_gomc_conf",
+        [
+            f"{namd_ff_filename_str}.inp",
+            f"{gomc_ff_filename_str}.inp",
+            f"{mosdef_structure_box_0_name_str}.psf",
+            f"{mosdef_structure_box_0_name_str}.pdb",
+            f"{namd_equilb_NPT_control_file_name_str}.conf",
+        ]
+        + [
+            f"{job.doc.gomc_equilb_design_ensemble_dict[str(initial_state_i)]['output_name_control_file_name']}.conf"
+            for initial_state_i in list(job.doc.InitialState_list)
+        ]
+        + [
+            f"{job.doc.gomc_production_run_ensemble_dict[str(initial_state_i)]['output_name_control_file_name']}.conf"
+            for initial_state_i in list(job.doc.InitialState_list)
+        ],
+    )
+
+
 # ******************************************************
 # ******************************************************
 # Creating GOMC files (pdb, psf, force field (FF), and gomc control files (end)
@@ -1357,8 +1685,69 @@ def run_namd_equilb_NPT_gomc_command(job):
 # equilb NPT - starting the GOMC simulation (start)
 # ******************************************************
 # ******************************************************
+def get_convergence_controller_command(
+    gomc_command,
+    control_file_name_str,
+    targets,
+    minimum_neff,
+    minimum_equilibrated_fraction,
+    minimum_stationary_steps,
+    check_interval_s,
+    restart_filenames=None,
+):
+    """Get the command running the GOMC command with the convergence controller.
+
+    The targets are the (file name, column name, target sem, target sem type) of
+    each followed file's target column, and the other arguments are the
+    convergence criteria (see src/utils/convergence_controller.py).  If the
+    restart file names are given (the restart files the next simulation starts
+    from), GOMC is only stopped after they are written again after the targets
+    converged.
+    """
+    target_arguments = " ".join(
+        f"--target {filename} {shlex.quote(column_name)} {target_sem} "
+        f"{target_sem_type}"
+        for filename, column_name, target_sem, target_sem_type in targets
+    )
+    restart_arguments = " ".join(
+        f"--restart-file {restart_filename}"
+        for restart_filename in (restart_filenames or [])
+    )
+
+    return (
+        f"PYTHONPATH={shlex.quote(project_directory_path)}:$PYTHONPATH "
+        f"{shlex.quote(sys.executable)} -m src.utils.convergence_controller "
+        f"--record {convergence_record_filename(control_file_name_str)} "
+        f"{target_arguments} "
+        f"--minimum-neff {minimum_neff} "
+        f"--minimum-equilibrated-fraction {minimum_equilibrated_fraction} "
+        f"--minimum-stationary-steps {minimum_stationary_steps} "
+        f"--check-interval-s {check_interval_s} "
+        f"{restart_arguments} "
+        f"-- {gomc_command}"
+    )
+
 
-for initial_state_j in range(0, number_of_lambda_spacing_including_zero_int):
+# the operations are defined for the number of lambda windows, or the maximum
+# number of lambda windows if the lambda schedule is refined
+# (lambda_window_refinement_bool), and each job only runs the operations of its
+# own lambda windows (the job document's InitialState_list)
+if lambda_window_refinement_bool:
+    number_of_lambda_window_operations_int = max(
+        number_of_lambda_spacing_including_zero_int,
+        lambda_window_refinement_maximum_number_of_windows_int,
+    )
+else:
+    number_of_lambda_window_operations_int = (
+        number_of_lambda_spacing_including_zero_int
+    )
+
+for initial_state_j in range(0, number_of_lambda_window_operations_int):
+
+    @Project.pre(
+        lambda job, initial_state_j=initial_state_j: initial_state_j
+        in job.doc.get("InitialState_list", [])
+    )
     @Project.pre(part_2a_namd_equilb_NPT_control_file_written)
     @Project.pre(part_4a_job_namd_equilb_NPT_completed_properly)
     @Project.post(part_3b_output_gomc_equilb_design_ensemble_started)
@@ -1381,11 +1770,40 @@ for initial_state_j in range(0, number_of_lambda_spacing_including_zero_int):
         ]["output_name_control_file_name"]
 
         print(f"Running simulation job id {job}")
-        run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+        gomc_command = "{}/{} +p{} {}.conf".format(
             str(gomc_binary_path),
             str(job.doc.gomc_equilb_design_ensemble_gomc_binary_file),
             str(job.doc.gomc_ncpu),
             str(control_file_name_str),
+        )
+        if equilb_run_stationarity_controller_bool:
+            # the window's density and energy
+            gomc_command = get_convergence_controller_command(
+                gomc_command,
+                control_file_name_str,
+                [
+                    (
+                        f"Blk_{control_file_name_str}_BOX_0.dat",
+                        column_name,
+                        float("inf"),
+                        "absolute",
+                    )
+                    for column_name in ["TOT_DENS", "TOT_EN"]
+                ],
+                minimum_neff=0,
+                minimum_equilibrated_fraction=0.0,
+                minimum_stationary_steps=equilb_run_stationary_window_steps,
+                check_interval_s=equilb_run_stationarity_check_interval_s,
+                # the production run starts from the equilibration run's restart
+                # files
+                restart_filenames=[
+                    f"{control_file_name_str}_BOX_{box_i}_restart.{extension}"
+                    for box_i in [0]
+                    for extension in ["pdb", "psf", "coor", "xsc"]
+                ],
+            )
+        run_command = "{} > out_{}.dat".format(
+            gomc_command,
             str(control_file_name_str),
         )
 
@@ -1399,12 +1817,129 @@ for initial_state_j in range(0, number_of_lambda_spacing_including_zero_int):
 # ******************************************************
 
 
+# ******************************************************
+# ******************************************************
+# equilb NPT - refine the lambda windows from the GOMC equilb runs (start)
+# ******************************************************
+# ******************************************************
+def gomc_production_run_any_window_started(job):
+    """Check if the gomc production run of any lambda window is started."""
+    # the file names are not read from the job document's
+    # gomc_production_run_ensemble_dict, which only has the lambda windows of
+    # the refined schedule after the control files are rewritten
+    return any(
+        job.isfile(
+            f"out_{gomc_production_control_file_name_str}_"
+            f"initial_state_{initial_state_i}.dat"
+        )
+        for initial_state_i in list(job.doc.InitialState_list)
+    )
+
+
+@Project.pre(lambda job: lambda_window_refinement_bool)
+@Project.pre(part_4b_job_gomc_equilb_design_ensemble_completed_properly)
+@Project.pre(lambda job: not gomc_production_run_any_window_started(job))
+@Project.post(part_4b_lambda_windows_refined)
+@Project.operation.with_directives(
+    {
+        "np": 1,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }
+)
+@flow.with_job
+def part_4b_refine_lambda_windows(job):
+    """Refine the lambda schedule where the neighbouring lambda windows of the
+    equilb runs have a low overlap.
+    """
+    # the equilb runs write the free energy files, with the energies of all the
+    # lambda states, so the overlaps are known before the production runs start
+    free_energy_filenames = [
+        job.fn(
+            f"Free_Energy_BOX_0_"
+            f'{job.doc.gomc_equilb_design_ensemble_dict[str(initial_state_i)]["output_name_control_file_name"]}.dat'
+        )
+        for initial_state_i in list(job.doc.InitialState_list)
+    ]
+    lambda_window_diagnostics = get_free_energy_files_lambda_window_diagnostics(
+        free_energy_filenames,
+        job.sp.production_temperature_K,
+        subsample_method="equilibrium_detection",
+    )
+    refined_LambdaVDW_list = get_refined_lambdas(
+        list(job.doc.LambdaVDW_list),
+        lambda_window_diagnostics["neighbour_overlaps"],
+        lambda_window_diagnostics["neighbour_variances"],
+        lambda_window_minimum_overlap,
+        lambda_window_refinement_maximum_number_of_windows_int,
+    )
+
+    lambda_window_refinement_rounds = list(
+        job.doc.get("lambda_window_refinement_rounds", [])
+    )
+    lambda_window_refinement_rounds.append(
+        {
+            "LambdaVDW_list": list(job.doc.LambdaVDW_list),
+            **lambda_window_diagnostics,
+        }
+    )
+    job.doc.lambda_window_refinement_rounds = lambda_window_refinement_rounds
+    print(
+        "lambda window refinement round "
+        f"{len(lambda_window_refinement_rounds)}: "
+        f"refined_LambdaVDW_list = {refined_LambdaVDW_list}"
+    )
+
+    if refined_LambdaVDW_list == list(job.doc.LambdaVDW_list):
+        job.doc.lambda_window_refinement_completed = True
+        return
+
+    # the equilb runs and the GOMC control files of the windows (which have the
+    # old lambda schedule) are moved, not removed, and the control files are
+    # rewritten by build_psf_pdb_ff_gomc_conf
+    refinement_round_directory = (
+        f"lambda_window_refinement_round_{len(lambda_window_refinement_rounds)}"
+    )
+    os.makedirs(refinement_round_directory, exist_ok=True)
+    for filename in sorted(os.listdir(".")):
+        if os.path.isfile(filename) and (
+            f"{gomc_equilb_design_ensemble_control_file_name_str}_initial_state_"
+            in filename
+            or f"{gomc_production_control_file_name_str}_initial_state_"
+            in filename
+        ):
+            os.replace(
+                filename, os.path.join(refinement_round_directory, filename)
+            )
+    remove_output_manifest_entry(job, "build_psf_pdb_ff_gomc_conf")
+
+    job.doc.LambdaVDW_list = refined_LambdaVDW_list
+    job.doc.InitialState_list = list(range(0, len(refined_LambdaVDW_list)))
+
+
+# ******************************************************
+# ******************************************************
+# equilb NPT - refine the lambda windows from the GOMC equilb runs (end)
+# ******************************************************
+# ******************************************************
+
+
 # ******************************************************
 # ******************************************************
 # production run - starting the GOMC simulation (start)
 # ******************************************************
 # ******************************************************
-for initial_state_i in range(0, number_of_lambda_spacing_including_zero_int):
+for initial_state_i in range(0, number_of_lambda_window_operations_int):
+
+    @Project.pre(
+        lambda job, initial_state_i=initial_state_i: initial_state_i
+        in job.doc.get("InitialState_list", [])
+    )
+    @Project.pre(
+        lambda job: not lambda_window_refinement_bool
+        or part_4b_lambda_windows_refined(job)
+    )
     @Project.pre(part_2c_gomc_production_control_file_written)
     @Project.pre(part_4b_job_gomc_equilb_design_ensemble_completed_properly)
     @Project.post(part_part_3c_output_gomc_production_run_started)
@@ -1428,11 +1963,32 @@ for initial_state_i in range(0, number_of_lambda_spacing_including_zero_int):
         ]["output_name_control_file_name"]
 
         print(f"Running simulation job id {job}")
-        run_command = "{}/{} +p{} {}.conf > out_{}.dat".format(
+        gomc_command = "{}/{} +p{} {}.conf".format(
             str(gomc_binary_path),
             str(job.doc.gomc_production_ensemble_gomc_binary_file),
             str(job.doc.gomc_ncpu),
             str(control_file_name_str),
+        )
+        if production_run_convergence_controller_bool:
+            # all the window's dU/dL columns
+            gomc_command = get_convergence_controller_command(
+                gomc_command,
+                control_file_name_str,
+                [
+                    (
+                        f"Free_Energy_BOX_0_{control_file_name_str}.dat",
+                        "dU/dL",
+                        production_run_target_sem_dU_dL_kJ_per_mol,
+                        "absolute",
+                    )
+                ],
+                minimum_neff=production_run_convergence_minimum_neff,
+                minimum_equilibrated_fraction=production_run_convergence_minimum_equilibrated_fraction,
+                minimum_stationary_steps=0,
+                check_interval_s=production_run_convergence_check_interval_s,
+            )
+        run_command = "{} > out_{}.dat".format(
+            gomc_command,
             str(control_file_name_str),
         )
 
@@ -1446,34 +2002,232 @@ for initial_state_i in range(0, number_of_lambda_spacing_including_zero_int):
 # ******************************************************
 # ******************************************************
 
+
+# ******************************************************
+# ******************************************************
+# production run - live analysis of the running GOMC simulation (start)
+# ******************************************************
+# ******************************************************
+def get_live_analysis_filenames(job):
+    """Get the growing GOMC production run Free_Energy files, which are followed
+    in the live analysis.
+    """
+    return [
+        f"Free_Energy_BOX_0_{gomc_production_control_file_name_str}_"
+        f"initial_state_{initial_state_iter}.dat"
+        for initial_state_iter in list(job.doc.InitialState_list)
+    ]
+
+
+def live_analysis_of_production_run_snapshot_current(job):
+    """Check that the live analysis snapshot has all the data written to the
+    production run files.
+    """
+    return live_analysis_snapshot_current(job, get_live_analysis_filenames(job))
+
+
+@Project.pre(lambda job: live_analysis_of_production_run_bool)
+@Project.pre(part_part_3c_output_gomc_production_run_started)
+@Project.pre(lambda job: not part_4c_job_production_run_completed_properly(job))
+@Project.post(live_analysis_of_production_run_snapshot_current)
+@Project.operation.with_directives(
+    {
+        "np": 1,
+        "ngpu": 0,
+        "memory": memory_needed,
+        "walltime": walltime_gomc_analysis_hr,
+    }
+)
+@flow.with_job
+def part_3d_live_analysis_of_production_run(job):
+    """Write the running averages of the production run's growing Free_Energy
+    files to the live analysis snapshot.
+    """
+    # only the data appended since the last snapshot is read, so this can be run
+    # repeatedly while the simulation is running to spot the drifting or
+    # non-converging jobs early
+    update_live_analysis_snapshot(job, get_live_analysis_filenames(job))
+
+
+# ******************************************************
+# ******************************************************
+# production run - live analysis of the running GOMC simulation (end)
+# ******************************************************
+# ******************************************************
+
 # ******************************************************
 # ******************************************************
 # data analysis - get the average data from each individual simulation (start)
 # ******************************************************
 # ******************************************************
 
+
+def get_individual_simulation_free_energies(
+    free_energy_filenames, temperature, subsample_method, mbar_initial_f_k=None
+):
+    """Get the MBAR, TI, and BAR free energies from a simulation's free energy
+    files.
+
+    The free energies only depend on the free energy files, so this is a module
+    level function with plain arguments, which can be run on a process pool
+    (part_5a_processes_int).
+
+    Parameters
+    ----------
+    free_energy_filenames : list of str
+        The GOMC free energy file names for each lambda window, including the
+        paths.
+    temperature : float
+        The production temperature, in K.
+    subsample_method : str or None
+        The method which subsamples each lambda window's uncorrelated samples
+        (part_5a_subsample_method_str), or None to use all the samples.
+    mbar_initial_f_k : list of float, "BAR", or None, default=None
+        The initial guess of the MBAR solver's reduced free energies (f_k, in kT
+        at the temperature), i.e., the job's MBAR f_k from an earlier part_5a
+        (part_5a_mbar_warm_start_bool).  If "BAR", or the number of f_k is not
+        the number of lambda states, the BAR free energies (which are calculated
+        anyway) are the initial guess.  If None, alchemlyb's default initial
+        guess is used.
+
+    Returns
+    -------
+    dict
+        The MBAR, TI, and BAR free energies and standard deviations, in
+        kcal/mol, the MBAR reduced free energies of each lambda state,
+        'mbar_f_k' (in kT), the 'lambda_window_diagnostics' (see
+        'get_lambda_window_diagnostics'), and the 'subsampling' of each lambda
+        window, {'initial_state_X': {'t0_step', 'g', 'Neff',
+        'number_of_samples', 'number_of_subsamples'}}, or None.
+    """
+    from alchemlyb.estimators import MBAR, BAR, TI
+
+    k_b = 1.9872036e-3  # kcal/mol/K
+    k_b_T = temperature * k_b
+
+    # each free energy file is parsed once, for both the TI (dHdl) and MBAR and
+    # BAR (u_nk) estimators, into a binary cache in the job directory, which is
+    # memory-mapped when part_5a is rerun.  The lambda windows are subsampled
+    # together, from each window's total dH/dl.
+    subsampling = None
+    if subsample_method is None:
+        dHdl, u_nk = get_free_energy_dataframes(
+            free_energy_filenames, temperature
+        )
+    else:
+        dHdl, u_nk, windows_subsampling = get_subsampled_free_energy_dataframes(
+            free_energy_filenames, temperature, subsample_method
+        )
+        subsampling = {
+            f"initial_state_{initial_state_iter}": window_subsampling
+            for initial_state_iter, window_subsampling in enumerate(
+                windows_subsampling
+            )
+        }
+
+    # for TI estimator
+    ti = TI().fit(dHdl)
+    delta_ti, delta_std_ti = get_delta_TI_or_MBAR(ti, k_b_T)
+
+    # for BAR estimator
+    bar = BAR().fit(u_nk)
+    delta_bar, delta_std_bar = get_delta_BAR(bar, k_b_T)
+
+    # for MBAR estimator, warm started from the initial f_k guess
+    if mbar_initial_f_k is None:
+        mbar = MBAR()
+    else:
+        if isinstance(mbar_initial_f_k, str) or len(mbar_initial_f_k) != len(
+            u_nk.columns
+        ):
+            mbar_initial_f_k = bar.delta_f_.iloc[0].values
+        mbar = MBAR(initial_f_k=np.asarray(mbar_initial_f_k, dtype=float))
+    mbar.fit(u_nk)
+    delta_mbar, delta_std_mbar = get_delta_TI_or_MBAR(mbar, k_b_T)
+
+    return {
+        "delta_mbar": delta_mbar,
+        "delta_std_mbar": delta_std_mbar,
+        "delta_ti": delta_ti,
+        "delta_std_ti": delta_std_ti,
+        "delta_bar": delta_bar,
+        "delta_std_bar": delta_std_bar,
+        "mbar_f_k": [float(f_k) for f_k in mbar.delta_f_.iloc[0].values],
+        "lambda_window_diagnostics": get_lambda_window_diagnostics(mbar, dHdl),
+        "subsampling": subsampling,
+    }
+
+
+def get_part_5a_mbar_initial_f_k(job):
+    """Get the job's MBAR initial f_k guess, its own f_k from an earlier
+    part_5a, or "BAR".
+
+    When part_5a is rerun, the job's MBAR reduced free energies (f_k) are in its
+    job document ('part_5a_mbar_f_k'), which start the MBAR solver at the
+    solution for the same lambda schedule.  Otherwise, the job's BAR free
+    energies are the initial guess.  Other replicas and temperatures of the job
+    are not used, as they take as many or more MBAR solver iterations than the
+    BAR free energies (see benchmarks/bench_mbar_warm_start.py).
+
+    Parameters
+    ----------
+    job : signac.contrib.job.Job
+        The job analyzed in the part_5a operation.
+
+    Returns
+    -------
+    list of float or "BAR"
+        The job's f_k, in kT, or "BAR" (the job's BAR free energies) if the job
+        has no f_k for its lambda schedule.
+    """
+    f_k = job.doc.get("part_5a_mbar_f_k") or []
+    if len(f_k) == len(job.doc.LambdaVDW_list):
+        return list(f_k)
+    else:
+        return "BAR"
+
+
+# each job is analyzed in its own part_5a operation, or the jobs of each
+# statepoint_without_replica group are analyzed in a single part_5a operation on
+# a process pool, where only the group's jobs with completed production runs,
+# which are not analyzed yet, are analyzed
+if part_5a_processes_int == 1:
+    part_5a_aggregator = aggregator.groupsof(1)
+else:
+    part_5a_aggregator = aggregator.groupby(
+        key=statepoint_without_replica,
+        sort_by="replica_number_int",
+        sort_ascending=True,
+    )
+
+
+@part_5a_aggregator
 @Project.operation.with_directives(
      {
-         "np": 1,
+         "np": get_process_pool_size(part_5a_processes_int),
          "ngpu": 0,
          "memory": memory_needed,
          "walltime": walltime_gomc_analysis_hr,
      }
 )
-@FlowProject.pre(
-     lambda *jobs: all(
-         part_4c_job_production_run_completed_properly(job)
-         for job in jobs
-     )
+@Project.pre(part_5a_analysis_individual_simulation_averages_ready_for_jobs)
+@Project.post(
+    part_5a_analysis_individual_simulation_averages_completed_for_jobs
 )
-@Project.pre(part_4c_job_production_run_completed_properly)
-@Project.post(part_5a_analysis_individual_simulation_averages_completed)
-@flow.with_job
 def part_5a_analysis_individual_simulation_averages(*jobs):
+    # only the aggregate's jobs with completed production runs, which are not
+    # analyzed yet
+    jobs = get_part_5a_jobs_to_analyze(*jobs)
+
     # remove the total averaged replicate data and all analysis data after this,
     # as it is no longer valid when adding more simulations
-    if os.path.isfile(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_box_0}'):
-        os.remove(f'../../analysis/{output_avg_std_of_replicates_txt_file_name_box_0}')
+    with jobs[0]:
+        if os.path.isfile(
+            f"../../analysis/{output_avg_std_of_replicates_txt_file_name_box_0}"
+        ):
+            os.remove(
+                f"../../analysis/{output_avg_std_of_replicates_txt_file_name_box_0}"
+            )
 
     output_column_temp_title = 'temp_K'  # column title title for temp
     output_column_solute_title = 'solute'  # column title title for temp
@@ -1484,33 +2238,44 @@ def part_5a_analysis_individual_simulation_averages(*jobs):
     output_column_dFE_BAR_title = 'dFE_BAR_kcal_per_mol'  # column title title for delta_MBAR
     output_column_dFE_BAR_std_title = 'dFE_BAR_std_kcal_per_mol'  # column title title for ds_MBAR
 
-
-    # get the averages from each individual simulation and write the csv's.
+    # get the free energies from each individual simulation (on a process pool
+    # if part_5a_processes_int > 1), and then write the csv's for each job.
+    # With the MBAR warm starts, each job's MBAR solve is seeded from its own
+    # f_k, when part_5a is rerun, or its BAR free energies.
+    free_energies_args_list = []
     for job in jobs:
         files = []
-        k_b = 1.9872036E-3  # kcal/mol/K
-        temperature = job.sp.production_temperature_K
-        k_b_T = temperature * k_b
-
-        for initial_state_iter in range(0, number_of_lambda_spacing_including_zero_int):
+        for initial_state_iter in list(job.doc.InitialState_list):
             reading_filename_box_0_iter = f'Free_Energy_BOX_0_{gomc_production_control_file_name_str}_' \
                                           f'initial_state_{initial_state_iter}.dat'
-            files.append(reading_filename_box_0_iter)
-
-        # for TI estimator
-        dHdl = pd.concat([extract_dHdl(job.fn(f), T=temperature) for f in files])
-        ti = TI().fit(dHdl)
-        delta_ti, delta_std_ti = get_delta_TI_or_MBAR(ti, k_b_T)
-
-        # for MBAR estimator
-        u_nk = pd.concat([extract_u_nk(job.fn(f), T=temperature) for f in files])
-        mbar = MBAR().fit(u_nk)
-        delta_mbar, delta_std_mbar = get_delta_TI_or_MBAR(mbar, k_b_T)
+            files.append(job.fn(reading_filename_box_0_iter))
+
+        free_energies_args_list.append(
+            (
+                files,
+                job.sp.production_temperature_K,
+                part_5a_subsample_method_str,
+                (
+                    get_part_5a_mbar_initial_f_k(job)
+                    if part_5a_mbar_warm_start_bool
+                    else None
+                ),
+            )
+        )
 
-        # for BAR estimator
-        bar = BAR().fit(u_nk)
-        delta_bar, delta_std_bar = get_delta_BAR(bar, k_b_T)
+    all_free_energies = map_in_process_pool(
+        get_individual_simulation_free_energies,
+        free_energies_args_list,
+        processes=part_5a_processes_int,
+        preload_modules=[
+            "pandas",
+            "alchemlyb.estimators",
+            "src.utils.free_energy_files",
+            "src.analysis.equilibration",
+        ],
+    )
 
+    for job, job_free_energies in zip(jobs, all_free_energies):
         # write the data out in each job
         box_0_replicate_data_txt_file = open(job.fn(output_replicate_txt_file_name_box_0), "w")
         box_0_replicate_data_txt_file.write(
@@ -1527,14 +2292,58 @@ def part_5a_analysis_individual_simulation_averages(*jobs):
         box_0_replicate_data_txt_file.write(
             f"{job.sp.production_temperature_K: <30} "
             f"{job.sp.solute: <30} "
-            f"{delta_mbar: <30} "
-            f"{delta_std_mbar: <30} "
-            f"{delta_ti: <30} "
-            f"{delta_std_ti: <30} "
-            f"{delta_bar: <30} "
-            f"{delta_std_bar: <30} "
+            f"{job_free_energies['delta_mbar']: <30} "
+            f"{job_free_energies['delta_std_mbar']: <30} "
+            f"{job_free_energies['delta_ti']: <30} "
+            f"{job_free_energies['delta_std_ti']: <30} "
+            f"{job_free_energies['delta_bar']: <30} "
+            f"{job_free_energies['delta_std_bar']: <30} "
             f" \n"
         )
+        box_0_replicate_data_txt_file.close()
+
+        # record the written files in the output manifest, which the labels read
+        write_output_manifest(
+            job,
+            "part_5a_analysis_individual_simulation_averages",
+            [
+                output_replicate_txt_file_name_box_0,
+            ],
+        )
+        job.doc.part_5a_analyzed_subsample_method = part_5a_subsample_method_str
+
+        # each lambda window's start of the equilibrated data (t0_step), its
+        # statistical inefficiency (g), and its number of uncorrelated samples
+        # (Neff)
+        job.doc.part_5a_subsampling = job_free_energies["subsampling"]
+
+        # the MBAR reduced free energies (f_k, in kT), which warm start the
+        # job's MBAR solve when part_5a is rerun
+        job.doc.part_5a_mbar_f_k = job_free_energies["mbar_f_k"]
+
+        # the overlap of each pair of neighbouring lambda windows, each window's
+        # fraction of the TI variance, and the lambda schedule with the new
+        # windows where the overlaps are low
+        lambda_window_diagnostics = job_free_energies[
+            "lambda_window_diagnostics"
+        ]
+        job.doc.update(
+            {
+                "part_5a_lambda_window_overlaps": lambda_window_diagnostics[
+                    "neighbour_overlaps"
+                ],
+                "part_5a_lambda_window_variance_fractions": lambda_window_diagnostics[
+                    "window_variance_fractions"
+                ],
+                "part_5a_suggested_LambdaVDW_list": get_refined_lambdas(
+                    list(job.doc.LambdaVDW_list),
+                    lambda_window_diagnostics["neighbour_overlaps"],
+                    lambda_window_diagnostics["neighbour_variances"],
+                    lambda_window_minimum_overlap,
+                    lambda_window_refinement_maximum_number_of_windows_int,
+                ),
+            }
+        )
 
 
 # ******************************************************
@@ -1563,12 +2372,13 @@ def part_5a_analysis_individual_simulation_averages(*jobs):
      }
 )
 
-@Project.pre(lambda *jobs: all(part_5a_analysis_individual_simulation_averages_completed(j)
-                               for j in jobs[0]._project))
+@Project.pre(part_5a_analysis_all_project_jobs_completed)
 @Project.pre(part_4c_job_production_run_completed_properly)
 @Project.pre(part_5a_analysis_individual_simulation_averages_completed)
 @Project.post(part_5b_analysis_replica_averages_completed)
 def part_5b_analysis_replica_averages(*jobs):
+    import pandas as pd
+
     # ***************************************************
     #  create the required lists and file labels for the replicates (start)
     # ***************************************************
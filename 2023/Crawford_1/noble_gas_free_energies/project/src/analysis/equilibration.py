@@ -1,12 +1,512 @@
 """Timeseries and pyMBAR related methods."""
+
 import pathlib
 from typing import List
 
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
-from pymbar import timeseries
 from signac.contrib.job import Job
+from src.utils.process_pool import get_process_pool_size, map_in_process_pool
+
+# the equilibration detection engines, where "fft" is the O(N log N) (or close
+# to it) detect_equilibration in this module, and "pymbar" is pymbar's O(N^2)
+# timeseries.detectEquilibration, which both return the same [t0, g, Neff]
+equilibration_detection_engines = ["fft", "pymbar"]
+
+
+def _get_suffix_sums(values: np.ndarray) -> np.ndarray:
+    """Get the sums of values[..., t:] for every t, with a trailing zero (the
+    sum of no values).
+
+    The sums are accumulated from the end, so the short suffixes' sums are
+    accurate.
+    """
+    suffix_sums = np.zeros(
+        values.shape[:-1] + (values.shape[-1] + 1,), dtype=np.float64
+    )
+    suffix_sums[..., :-1] = np.cumsum(values[..., ::-1], axis=-1)[..., ::-1]
+
+    return suffix_sums
+
+
+def _get_lag_schedule(
+    first_lag: int, first_increment: int, last_lag: int, fast: bool
+):
+    """Get pymbar's lags (t) and increments, from the first lag up to (not
+    including) the last lag.
+    """
+    if not fast:
+        lags = np.arange(first_lag, max(first_lag, last_lag), dtype=np.int64)
+        return lags, np.full(len(lags), first_increment, dtype=np.int64)
+
+    # the lag increases by the increment, which increases by 1 each step
+    number_of_lags = 0
+    while (
+        first_lag
+        + number_of_lags * first_increment
+        + number_of_lags * (number_of_lags - 1) // 2
+        < last_lag
+    ):
+        number_of_lags += 1
+    increments = first_increment + np.arange(number_of_lags, dtype=np.int64)
+    lags = (
+        first_lag
+        + np.concatenate(([0], np.cumsum(increments[:-1])))[:number_of_lags]
+    )
+
+    return lags, increments
+
+
+def _finish_statistical_inefficiency_with_fft(
+    suffix: np.ndarray,
+    g: float,
+    lag: int,
+    increment: int,
+    fast: bool,
+    mintime: int,
+) -> float:
+    """Finish pymbar's statistical inefficiency sum of a suffix from the lag,
+    with its FFT autocovariance.
+    """
+    number_of_samples = suffix.size
+    fluctuations = suffix - suffix.mean()
+    fft_size = 1 << int(2 * number_of_samples - 1).bit_length()
+    fluctuations_fft = np.fft.rfft(fluctuations, n=fft_size)
+    autocovariance_sums = np.fft.irfft(
+        fluctuations_fft * np.conj(fluctuations_fft), n=fft_size
+    )[:number_of_samples]
+    sigma2 = autocovariance_sums[0] / number_of_samples
+
+    lags, increments = _get_lag_schedule(
+        lag, increment, number_of_samples - 1, fast
+    )
+    correlations = autocovariance_sums[lags] / (
+        (number_of_samples - lags) * sigma2
+    )
+    stop_lags = (correlations <= 0.0) & (lags > mintime)
+    number_of_summed_lags = (
+        int(np.argmax(stop_lags)) if stop_lags.any() else len(lags)
+    )
+
+    return g + np.sum(
+        2.0
+        * correlations[:number_of_summed_lags]
+        * (1.0 - lags[:number_of_summed_lags] / number_of_samples)
+        * increments[:number_of_summed_lags]
+    )
+
+
+def get_suffix_statistical_inefficiencies(
+    a_kt: npt.ArrayLike,
+    origins: npt.ArrayLike,
+    fast: bool = True,
+    mintime: int = 3,
+) -> np.ndarray:
+    """Calculate pymbar's statistical inefficiency of a_t[t:] for all the time
+    origins t at once.
+
+    This is the same estimate as pymbar's timeseries.statisticalInefficiency
+    (the normalized fluctuation autocorrelation is summed out to the first lag
+    after mintime where it is <= 0, and with fast=True the lag increment grows
+    by 1 each step).  Instead of recomputing each suffix's autocorrelation,
+    the lagged products' suffix sums (prefix sums from the end) give every
+    origin's autocorrelation at a lag in one O(N) vectorized pass, so each
+    lag costs O(N) for all the origins, and for all the rows of 2-D data.
+    Once only a few origins are still summing (i.e., slowly decaying or
+    drifting data), their remaining lags are taken from each suffix's
+    O(N log N) FFT autocovariance.
+
+    Parameters
+    ----------
+    a_kt : numpy.typing.ArrayLike
+        1-D time dependent data, or 2-D data with a time series in each row
+        (rows=properties or jobs, columns=time).
+    origins : numpy.typing.ArrayLike
+        The time origins (0 <= t < len(a_t) - 1), which are the same for every
+        row.
+    fast : bool, optional, default=True
+        Use pymbar's fast (growing lag increment) method.
+    mintime : int, optional, default=3
+        The minimum lag before the sum is stopped at a non-positive
+        autocorrelation.
+
+    Returns
+    -------
+    numpy.ndarray
+        The statistical inefficiency of each origin's suffix (rows=rows of
+        a_kt, columns=origins, or 1-D for 1-D data).  A constant suffix, for
+        which pymbar raises a ParameterError, has the statistical inefficiency
+        len(a_t[t:]) + 1, like detectEquilibration.
+    """
+    a_kt = np.asarray(a_kt, dtype=np.float64)
+    a_kt_2d = np.atleast_2d(a_kt)
+    number_of_rows, total_samples = a_kt_2d.shape
+    origins = np.asarray(origins, dtype=np.int64)
+    number_of_origins = len(origins)
+    number_of_samples = total_samples - origins
+
+    # the data is centered on its mean, so the sums do not lose precision to the
+    # offset
+    centered_a_kt = a_kt_2d - a_kt_2d.mean(axis=1, keepdims=True)
+    suffix_sums = _get_suffix_sums(centered_a_kt)
+    suffix_means = suffix_sums[:, origins] / number_of_samples
+    sigma2 = _get_suffix_sums(np.square(centered_a_kt))[
+        :, origins
+    ] / number_of_samples - np.square(suffix_means)
+
+    # the suffixes after the last change in value are constant
+    changed_values = a_kt_2d != a_kt_2d[:, -1:]
+    last_change = np.where(
+        changed_values.any(axis=1),
+        total_samples - 1 - np.argmax(changed_values[:, ::-1], axis=1),
+        -1,
+    )
+    constant_suffixes = (origins > last_change[:, np.newaxis]) | (sigma2 <= 0)
+
+    # the (row, origin) pairs are flat indices (row * number_of_origins + origin
+    # index)
+    g = np.ones((number_of_rows, number_of_origins), dtype=np.float64)
+    g_pairs = g.reshape(-1)
+
+    # the summing pairs and their values, which are removed when their sums stop
+    summing_pairs = np.flatnonzero(~constant_suffixes)
+    summing_rows = summing_pairs // number_of_origins
+    summing_origins = origins[summing_pairs % number_of_origins]
+    summing_means = suffix_means.reshape(-1)[summing_pairs]
+    summing_sigma2 = sigma2.reshape(-1)[summing_pairs]
+    # the pairs' flat indices in the (row, time) suffix sums
+    summing_suffix_sums_i = summing_rows * (total_samples + 1) + summing_origins
+    suffix_sums_flat = suffix_sums.reshape(-1)
+    summing_suffix_sums = suffix_sums_flat[summing_suffix_sums_i]
+    lag = 1
+    increment = 1
+    number_of_lag_passes = 0
+    while True:
+        summing_number_of_samples = total_samples - summing_origins
+        continuing = lag < summing_number_of_samples - 1
+        if not continuing.all():
+            summing_pairs = summing_pairs[continuing]
+            summing_rows = summing_rows[continuing]
+            summing_origins = summing_origins[continuing]
+            summing_means = summing_means[continuing]
+            summing_sigma2 = summing_sigma2[continuing]
+            summing_suffix_sums = summing_suffix_sums[continuing]
+            summing_suffix_sums_i = summing_suffix_sums_i[continuing]
+            summing_number_of_samples = summing_number_of_samples[continuing]
+        if len(summing_pairs) == 0:
+            break
+
+        # the pairs are in row order
+        first_origin = summing_origins.min()
+        last_origin = summing_origins.max()
+        new_rows = np.flatnonzero(np.diff(summing_rows, prepend=-1))
+        rows = summing_rows[new_rows]
+
+        # finish the last few pairs with their FFT autocovariance, if that is
+        # cheaper than the O(N) lag passes to reach their suffixes' ends, where
+        # the remaining passes are estimated as the passes done so far (most
+        # sums stop at short lags)
+        remaining_lag_passes = min(
+            number_of_lag_passes,
+            (
+                np.sqrt(2.0 * (total_samples - first_origin)) - increment
+                if fast
+                else total_samples - first_origin - lag
+            ),
+        )
+        fft_cost = 4.0 * np.sum(
+            summing_number_of_samples * np.log2(2 * summing_number_of_samples)
+        )
+        if fft_cost < remaining_lag_passes * len(rows) * (
+            total_samples - first_origin - lag
+        ):
+            for pair, row, origin in zip(
+                summing_pairs, summing_rows, summing_origins
+            ):
+                g_pairs[pair] = _finish_statistical_inefficiency_with_fft(
+                    a_kt_2d[row, origin:],
+                    g_pairs[pair],
+                    lag,
+                    increment,
+                    fast,
+                    mintime,
+                )
+            break
+
+        # every pair's autocovariance sum at this lag, from the lagged products'
+        # suffix sums over the summing origins' range, plus the sum of the
+        # products after them
+        if len(rows) == number_of_rows:
+            centered_rows = centered_a_kt
+            summing_rows_positions = summing_rows
+        else:
+            centered_rows = centered_a_kt[rows]
+            summing_rows_positions = np.cumsum(
+                np.diff(summing_rows, prepend=rows[0]) != 0
+            )
+        lagged_product_suffix_sums = (
+            _get_suffix_sums(
+                centered_rows[:, first_origin : last_origin + 1]
+                * centered_rows[:, first_origin + lag : last_origin + lag + 1]
+            )
+            + np.einsum(
+                "kt,kt->k",
+                centered_rows[:, last_origin + 1 : total_samples - lag],
+                centered_rows[:, last_origin + lag + 1 :],
+            )[:, np.newaxis]
+        )
+        autocovariance_sums = (
+            lagged_product_suffix_sums.reshape(-1)[
+                summing_rows_positions * lagged_product_suffix_sums.shape[1]
+                + (summing_origins - first_origin)
+            ]
+            - summing_means
+            * (
+                summing_suffix_sums
+                - suffix_sums[rows, total_samples - lag][summing_rows_positions]
+                + suffix_sums_flat[summing_suffix_sums_i + lag]
+            )
+            + (summing_number_of_samples - lag) * np.square(summing_means)
+        )
+        correlations = autocovariance_sums / (
+            (summing_number_of_samples - lag) * summing_sigma2
+        )
+
+        # pymbar stops at the first non-positive autocorrelation after mintime
+        if lag > mintime:
+            continuing = correlations > 0.0
+            summing_pairs = summing_pairs[continuing]
+            summing_rows = summing_rows[continuing]
+            summing_origins = summing_origins[continuing]
+            summing_means = summing_means[continuing]
+            summing_sigma2 = summing_sigma2[continuing]
+            summing_suffix_sums = summing_suffix_sums[continuing]
+            summing_suffix_sums_i = summing_suffix_sums_i[continuing]
+            summing_number_of_samples = summing_number_of_samples[continuing]
+            correlations = correlations[continuing]
+        g_pairs[summing_pairs] += (
+            2.0
+            * correlations
+            * (1.0 - lag / summing_number_of_samples)
+            * increment
+        )
+
+        lag += increment
+        if fast:
+            increment += 1
+        number_of_lag_passes += 1
+
+    g = np.maximum(g, 1.0)
+    g[constant_suffixes] = np.broadcast_to(number_of_samples + 1, g.shape)[
+        constant_suffixes
+    ]
+
+    return g if a_kt.ndim == 2 else g[0]
+
+
+def detect_equilibration_batch(
+    a_kt: npt.ArrayLike,
+    nskip: int = 1,
+    fast: bool = True,
+    processes: int = 1,
+) -> List:
+    """Detect the equilibrated region of each row of a 2-D dataset.
+
+    Each row (i.e., a property's time series, or one property of many jobs
+    stacked) gets the same [t0, g, Neff] as detect_equilibration (and pymbar's
+    timeseries.detectEquilibration), but all the rows are calculated together,
+    in the same vectorized passes over the data.
+
+    Parameters
+    ----------
+    a_kt : numpy.typing.Arraylike
+        2-D time dependent data (rows=properties or jobs, columns=time),
+        without nan values.
+    nskip : int, optional, default=1
+        Only every nskip time origin is checked.
+    fast : bool, optional, default=True
+        Use pymbar's fast (growing lag increment) statistical inefficiency.
+    processes : int, optional, default=1
+        The number of processes the rows are split over, or -1 for all the
+        cores available to this process.  If 1, the rows are calculated in
+        this process.
+
+    Returns
+    -------
+    [t0_k, g_k, Neff_k] : [numpy.ndarray, numpy.ndarray, numpy.ndarray]
+        Each row's start of the equilibrated data (int64), its statistical
+        inefficiency (float32), and its number of uncorrelated samples
+        (float32).
+    """
+    a_kt = np.asarray(a_kt, dtype=np.float64)
+    if a_kt.ndim != 2:
+        raise ValueError(
+            f"Passed 'a_kt' with shape {a_kt.shape}, expected a 2-D array "
+            "(rows=properties or jobs, columns=time)."
+        )
+    number_of_rows, total_samples = a_kt.shape
+
+    processes = min(get_process_pool_size(processes), number_of_rows)
+    if processes > 1:
+        rows_results = map_in_process_pool(
+            detect_equilibration_batch,
+            [(rows, nskip, fast) for rows in np.array_split(a_kt, processes)],
+            processes=processes,
+        )
+        return [np.concatenate(results) for results in zip(*rows_results)]
+
+    # Special case if timeseries is constant (like pymbar).
+    t0_k = np.zeros(number_of_rows, dtype=np.int64)
+    g_k = np.ones(number_of_rows, dtype=np.float32)
+    Neff_k = np.ones(number_of_rows, dtype=np.float32)
+    varying_rows = np.flatnonzero(a_kt.std(axis=1) != 0.0)
+    if len(varying_rows) == 0:
+        return [t0_k, g_k, Neff_k]
+
+    # pymbar keeps g and Neff in float32
+    origins = np.arange(0, total_samples - 1, nskip)
+    g_kj = get_suffix_statistical_inefficiencies(
+        a_kt[varying_rows], origins, fast=fast
+    ).astype(np.float32)
+    Neff_kj = np.empty(g_kj.shape, dtype=np.float32)
+    Neff_kj[:] = (total_samples - origins + 1) / g_kj
+    max_origins_j = Neff_kj.argmax(axis=1)
+    t0 = origins[max_origins_j]
+    g = g_kj[np.arange(len(varying_rows)), max_origins_j]
+    Neff = Neff_kj[np.arange(len(varying_rows)), max_origins_j]
+
+    # pymbar's skipped origins (nskip > 1) have g = Neff = 1, where the first is
+    # t = 1
+    if len(origins) < total_samples - 1:
+        skipped_origin_max = (Neff < 1.0) | ((Neff == 1.0) & (t0 > 1))
+        t0[skipped_origin_max] = 1
+        g[skipped_origin_max] = 1.0
+        Neff[skipped_origin_max] = 1.0
+
+    t0_k[varying_rows] = t0
+    g_k[varying_rows] = g
+    Neff_k[varying_rows] = Neff
+
+    return [t0_k, g_k, Neff_k]
+
+
+def detect_equilibration(
+    a_t: npt.ArrayLike,
+    nskip: int = 1,
+    fast: bool = True,
+) -> List:
+    """Detect the equilibrated region of a dataset, which maximizes the number
+    of uncorrelated samples.
+
+    This is a drop-in replacement for pymbar's timeseries.detectEquilibration,
+    which returns the same [t0, g, Neff].  pymbar computes the statistical
+    inefficiency of every time origin separately, which is O(N^2) in the
+    length of a_t, while this computes all the origins at once with prefix
+    sums and FFTs (see get_suffix_statistical_inefficiencies), which is
+    O(N log N) or close to it, so nskip does not need to be increased for
+    large datasets.
+
+    Parameters
+    ----------
+    a_t : numpy.typing.Arraylike
+        1-D time dependent data.
+    nskip : int, optional, default=1
+        Only every nskip time origin is checked.
+    fast : bool, optional, default=True
+        Use pymbar's fast (growing lag increment) statistical inefficiency.
+
+    Returns
+    -------
+    [t0, g, Neff] : [int, numpy.float32, numpy.float32]
+        The start of the equilibrated data, its statistical inefficiency,
+        and its number of uncorrelated samples.
+    """
+    a_t = np.asarray(a_t)
+    # Special case if timeseries is constant (like pymbar).
+    if a_t.std() == 0.0:
+        return [0, 1, 1]
+
+    [t0_k, g_k, Neff_k] = detect_equilibration_batch(
+        a_t[np.newaxis], nskip=nskip, fast=fast
+    )
+
+    return [t0_k[0], g_k[0], Neff_k[0]]
+
+
+def _check_equilibration_thresholds(
+    threshold_fraction: float, threshold_neff: int
+) -> int:
+    """Check the equilibrated fraction and Neff thresholds, and return
+    threshold_neff as an int.
+    """
+    if threshold_fraction < 0.0 or threshold_fraction > 1.0:
+        raise ValueError(
+            f"Passed 'threshold_fraction' value: {threshold_fraction}, "
+            "expected value between 0.0-1.0."
+        )
+
+    threshold_neff = int(threshold_neff)
+    if threshold_neff < 1:
+        raise ValueError(
+            f"Passed 'threshold_neff' value: {threshold_neff}, expected value "
+            "1 or greater."
+        )
+
+    return threshold_neff
+
+
+def is_equilibrated_batch(
+    a_kt: npt.ArrayLike,
+    threshold_fraction: float = 0.8,
+    threshold_neff: int = 100,
+    nskip: int = 1,
+    processes: int = 1,
+) -> List:
+    """Check if each row of a 2-D dataset is equilibrated based on a fraction of
+    equil data.
+
+    This is is_equilibrated for every row (i.e., the density, energy, pressure,
+    and mol fraction columns of a Blk file, or the same property of many jobs),
+    using detect_equilibration_batch.
+
+    Parameters
+    ----------
+    a_kt : numpy.typing.Arraylike
+        2-D time dependent data (rows=properties or jobs, columns=time),
+        without nan values.
+    threshold_fraction : float, optional, default=0.8
+        Fraction of data expected to be equilibrated.
+    threshold_neff : int, optional, default=100
+        Minimum amount of effectively correlated samples to consider a row
+        'equilibrated'.
+    nskip : int, optional, default=1
+        Only every nskip time origin is checked.
+    processes : int, optional, default=1
+        The number of processes the rows are split over, or -1 for all the
+        cores available to this process.
+
+    Returns
+    -------
+    [truth_k, t0_k, g_k, Neff_k] : [numpy.ndarray, ...]
+        Each row's equilibrated truth (bool), start of the equilibrated data,
+        statistical inefficiency, and number of uncorrelated samples, where
+        the t0, g, and Neff are returned for all the rows, including the
+        rows which are not equilibrated.
+    """
+    threshold_neff = _check_equilibration_thresholds(
+        threshold_fraction, threshold_neff
+    )
+
+    [t0_k, g_k, Neff_k] = detect_equilibration_batch(
+        a_kt, nskip=nskip, processes=processes
+    )
+    frac_equilibrated_k = 1.0 - (t0_k / np.shape(a_kt)[1])
+    truth_k = (frac_equilibrated_k >= threshold_fraction) & (
+        Neff_k >= threshold_neff
+    )
+
+    return [truth_k, t0_k, g_k, Neff_k]
 
 
 def is_equilibrated(
@@ -14,6 +514,7 @@ def is_equilibrated(
     threshold_fraction: float = 0.8,
     threshold_neff: int = 100,
     nskip: int = 1,
+    engine: str = "fft",
 ) -> List:
     """Check if a dataset is equilibrated based on a fraction of equil data.
 
@@ -43,22 +544,27 @@ def is_equilibrated(
         Since the statistical inefficiency is computed for every time origin
         in a call to timeseries.detectEquilibration, for larger datasets
         (> few hundred), increasing nskip might speed this up, while
-        discarding more data.
+        discarding more data.  This is rarely needed with the "fft" engine.
+    engine : str, optional, default="fft"
+        The equilibration detection engine, "fft" (detect_equilibration in
+        this module, which is O(N log N) or close to it) or "pymbar"
+        (timeseries.detectEquilibration, which is O(N^2)).
     """
-    if threshold_fraction < 0.0 or threshold_fraction > 1.0:
-        raise ValueError(
-            f"Passed 'threshold_fraction' value: {threshold_fraction}, "
-            "expected value between 0.0-1.0."
-        )
+    threshold_neff = _check_equilibration_thresholds(
+        threshold_fraction, threshold_neff
+    )
 
-    threshold_neff = int(threshold_neff)
-    if threshold_neff < 1:
+    if engine == "fft":
+        [t0, g, Neff] = detect_equilibration(a_t, nskip=nskip)
+    elif engine == "pymbar":
+        from pymbar import timeseries
+
+        [t0, g, Neff] = timeseries.detectEquilibration(a_t, nskip=nskip)
+    else:
         raise ValueError(
-            f"Passed 'threshold_neff' value: {threshold_neff}, expected value "
-            "1 or greater."
+            f"Passed 'engine' value: {engine}, expected one of "
+            f"{equilibration_detection_engines}."
         )
-
-    [t0, g, Neff] = timeseries.detectEquilibration(a_t, nskip=nskip)
     frac_equilibrated = 1.0 - (t0 / np.shape(a_t)[0])
 
     if (frac_equilibrated >= threshold_fraction) and (Neff >= threshold_neff):
@@ -72,6 +578,7 @@ def trim_non_equilibrated(
     threshold_fraction: float = 0.75,
     threshold_neff: int = 100,
     nskip: int = 1,
+    engine: str = "fft",
 ) -> List:
     """Prune timeseries array to just the production data.
 
@@ -98,13 +605,18 @@ def trim_non_equilibrated(
         Since the statistical inefficiency is computed for every time origin
         in a call to timeseries.detectEquilibration, for larger datasets
         (> few hundred), increasing nskip might speed this up, while
-        discarding more data.
+        discarding more data.  This is rarely needed with the "fft" engine.
+    engine : str, optional, default="fft"
+        The equilibration detection engine, "fft" (detect_equilibration in
+        this module, which is O(N log N) or close to it) or "pymbar"
+        (timeseries.detectEquilibration, which is O(N^2)).
     """
     [truth, t0, g, Neff] = is_equilibrated(
         a_t,
         threshold_fraction=threshold_fraction,
         threshold_neff=threshold_neff,
         nskip=nskip,
+        engine=engine,
     )
     if not truth:
         raise ValueError(
@@ -0,0 +1,165 @@
+"""Utilities to check the GOMC and NAMD console output files."""
+
+import os
+from typing import Callable, List
+
+
+def tail_search_file(
+    filename: str,
+    line_matches: Callable[[List[str]], bool],
+    chunk_size_bytes: int = 64 * 1024,
+    max_search_bytes: int = 1024**2,
+) -> bool:
+    """Search a text file backwards from its end for a matching line.
+
+    The file is read in fixed size chunks starting from the end of the file,
+    so only the tail of the file is read when the matching line is near the
+    end (i.e., the footer of a completed simulation's console output).
+    Any partial line at the start of a chunk is carried over and completed
+    with the next (earlier) chunk.
+
+    Parameters
+    ----------
+    filename : str
+        The file name, including the path, to search.
+    line_matches : Callable[[List[str]], bool]
+        Function that accepts the whitespace split line and returns True
+        if it is the line being searched for.
+    chunk_size_bytes : int, optional, default=64 * 1024
+        The number of bytes read per chunk.
+    max_search_bytes : int or None, optional, default=1024**2
+        The maximum number of bytes, from the end of the file, that are
+        searched.  If None, the whole file is searched if required.
+
+    Returns
+    -------
+    bool
+        True if a matching line is found, and False otherwise.
+    """
+    if chunk_size_bytes < 1:
+        raise ValueError(
+            f"Passed 'chunk_size_bytes' value: {chunk_size_bytes}, "
+            "expected value 1 or greater."
+        )
+
+    with open(filename, "rb") as fp:
+        position = fp.seek(0, os.SEEK_END)
+        if max_search_bytes is None:
+            search_start = 0
+        else:
+            search_start = max(0, position - int(max_search_bytes))
+
+        carry_over = b""
+        while position > search_start:
+            read_size = min(chunk_size_bytes, position - search_start)
+            position -= read_size
+            fp.seek(position)
+            chunk = fp.read(read_size) + carry_over
+
+            lines = chunk.split(b"\n")
+            # the first line may be incomplete, unless it starts at a line
+            # boundary.  It is completed by the next chunk, or skipped if it
+            # starts mid-line at the start of the searched region.
+            if position > search_start:
+                carry_over = lines.pop(0)
+            elif position > 0:
+                fp.seek(position - 1)
+                if fp.read(1) != b"\n":
+                    lines.pop(0)
+
+            for line in reversed(lines):
+                if line_matches(line.decode("utf-8", errors="replace").split()):
+                    return True
+
+    return False
+
+
+def _is_gomc_move_footer(split_line: List[str]) -> bool:
+    """Check if the split line is the GOMC 'Move Type Mol. Kind' footer."""
+    return split_line[:4] == ["Move", "Type", "Mol.", "Kind"]
+
+
+def _is_namd_wall_clock_footer(split_line: List[str]) -> bool:
+    """Check if the split line is the NAMD 'WallClock: CPUTime: Memory:'
+    footer.
+    """
+    return (
+        len(split_line) >= 5
+        and split_line[0] == "WallClock:"
+        and split_line[2] == "CPUTime:"
+        and split_line[4] == "Memory:"
+    )
+
+
+def gomc_console_output_completed(
+    filename: str,
+    chunk_size_bytes: int = 64 * 1024,
+    max_search_bytes: int = 1024**2,
+) -> bool:
+    """Check if the GOMC console output file has the completed simulation
+    footer.
+
+    GOMC writes the 'Move Type Mol. Kind' move acceptance block at the end
+    of a completed simulation, so only the tail of the file is searched.
+
+    Parameters
+    ----------
+    filename : str
+        The GOMC console output file name, including the path.
+    chunk_size_bytes : int, optional, default=64 * 1024
+        The number of bytes read per chunk.
+    max_search_bytes : int or None, optional, default=1024**2
+        The maximum number of bytes, from the end of the file, that are
+        searched.  If None, the whole file is searched if required.
+
+    Returns
+    -------
+    bool
+        True if the GOMC simulation completed, and False otherwise.
+    """
+    if not os.path.isfile(filename):
+        return False
+
+    return tail_search_file(
+        filename,
+        _is_gomc_move_footer,
+        chunk_size_bytes=chunk_size_bytes,
+        max_search_bytes=max_search_bytes,
+    )
+
+
+def namd_console_output_completed(
+    filename: str,
+    chunk_size_bytes: int = 64 * 1024,
+    max_search_bytes: int = 1024**2,
+) -> bool:
+    """Check if the NAMD console output file has the completed simulation
+    footer.
+
+    NAMD writes the 'WallClock: CPUTime: Memory:' line at the end
+    of a completed simulation, so only the tail of the file is searched.
+
+    Parameters
+    ----------
+    filename : str
+        The NAMD console output file name, including the path.
+    chunk_size_bytes : int, optional, default=64 * 1024
+        The number of bytes read per chunk.
+    max_search_bytes : int or None, optional, default=1024**2
+        The maximum number of bytes, from the end of the file, that are
+        searched.  If None, the whole file is searched if required.
+
+    Returns
+    -------
+    bool
+        True if the NAMD simulation completed, and False otherwise.
+    """
+    if not os.path.isfile(filename):
+        return False
+
+    return tail_search_file(
+        filename,
+        _is_namd_wall_clock_footer,
+        chunk_size_bytes=chunk_size_bytes,
+        max_search_bytes=max_search_bytes,
+    )
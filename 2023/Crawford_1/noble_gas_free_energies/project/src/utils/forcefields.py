@@ -1,6 +1,7 @@
 """Utilities to load forcefields based on forcefield names."""
 import os
-import foyer
+from collections.abc import Mapping
+from typing import Callable
 
 def get_ff_path(
     name: str = None,
@@ -50,7 +51,6 @@ def get_molecule_path(mol2_or_smiles_input):
             return [use_smiles, smiles_or_mol2_path_string]
 
         elif os.path.splitext(mol2_or_smiles_input)[1] == '.mol2':
-            from src import xmls
             use_smiles = False
             smiles_or_mol2_path_string = (
                 str(os.path.dirname(os.path.abspath(__file__))) + "/../molecules/" + mol2_or_smiles_input
@@ -61,4 +61,72 @@ def get_molecule_path(mol2_or_smiles_input):
                             "a smiles string or a mol2 file that does not have a .mol2 "
                             "file extension was not found.")
     else:
-        raise TypeError("ERROR: A string was not entered or the get_molecule_path function.")
\ No newline at end of file
+        raise TypeError("ERROR: A string was not entered or the get_molecule_path function.")
+
+
+def get_smiles_or_mol2_dict(mol2_or_smiles_input):
+    """Get the molecule input from a smiles string or mol2 file, in the
+    build_charmm format.
+
+    Parameters
+    ----------
+    mol2_or_smiles_input : str,
+        Whether to use a smiles string of mol2 file for the input.  The mol2
+        file must have the .mol2 extenstion or it will be read as a smiles
+        string
+
+    Returns
+    ----------
+    dict, {"use_smiles": bool, "smiles_or_mol2": str}
+        Whether to use a smiles string, and the smiles string or the mol2 file
+        with its path
+    """
+    [use_smiles, smiles_or_mol2_path_string] = get_molecule_path(
+        mol2_or_smiles_input
+    )
+
+    return {
+        "use_smiles": use_smiles,
+        "smiles_or_mol2": smiles_or_mol2_path_string,
+    }
+
+
+class LazyPathRegistry(Mapping):
+    """Read-only mapping of the residue names to their resolved paths.
+
+    Each residue's path is resolved on first use, and the result is reused
+    after that, so nothing is resolved when the project is imported
+    (i.e., for the status or submit) and the path is only resolved once
+    when the systems are built.
+
+    Parameters
+    ----------
+    name_to_value_dict : dict, {str: str}
+        The residue names and their force field file names, or
+        their smiles strings or mol2 file names.
+    resolver : Callable
+        The function which resolves the value to the path (i.e., get_ff_path
+        or get_smiles_or_mol2_dict).
+    """
+
+    def __init__(self, name_to_value_dict: dict, resolver: Callable):
+        self._name_to_value_dict = dict(name_to_value_dict)
+        self._resolver = resolver
+        self._resolved_paths = {}
+
+    def __getitem__(self, name):
+        if name not in self._resolved_paths:
+            self._resolved_paths[name] = self._resolver(
+                self._name_to_value_dict[name]
+            )
+
+        return self._resolved_paths[name]
+
+    def __iter__(self):
+        return iter(self._name_to_value_dict)
+
+    def __len__(self):
+        return len(self._name_to_value_dict)
+
+    def __repr__(self):
+        return repr(dict(self))
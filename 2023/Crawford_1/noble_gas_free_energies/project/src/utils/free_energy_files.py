@@ -0,0 +1,688 @@
+"""Parse and cache the GOMC free energy (Free_Energy_BOX_0_*.dat) files for
+alchemlyb's estimators.
+"""
+
+import ast
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# the column titles alchemlyb's GOMC parser reads, after the '#Steps' (time)
+# column
+free_energy_column_title_prefixes = ("Total_En", "dU/dL", "DelE", "PV")
+
+# the lambdas GOMC always writes, in alchemlyb's order
+free_energy_lambda_names = ["Coulomb", "VDW"]
+
+# the GOMC free energy files' '#Steps' column is renamed to 'time', like
+# alchemlyb
+free_energy_time_column_title = "time"
+
+# the cache files of each lambda window are written next to its free energy file
+free_energy_cache_data_extension = ".cache.npy"
+free_energy_cache_meta_extension = ".cache.json"
+free_energy_cache_version = 1
+
+# the methods which subsample each lambda window's uncorrelated samples, from
+# the window's total dH/dl (the sum of the dU/dL columns), like alchemlyb's
+# decorrelate_dhdl, where "equilibrium_detection" also removes the window's
+# non-equilibrated start (remove_burnin=True)
+free_energy_subsample_methods = [
+    "equilibrium_detection",
+    "statistical_inefficiency",
+]
+
+
+def read_free_energy_file_header(filename: str) -> Tuple[tuple, List[str], int]:
+    """Read a GOMC free energy file's header lines.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+
+    Returns
+    -------
+    state_lambdas, column_names, number_of_header_lines : tuple, list of str,
+    int
+        The lambda values of the sampled state (lambda Coulomb, lambda VDW),
+        the column names alchemlyb reads, with '#Steps' renamed to 'time',
+        and the number of header lines before the data.
+    """
+    state_lambdas = None
+    column_names = None
+    number_of_header_lines = 0
+    with open(filename, "r") as fp:
+        for line in fp:
+            line = line.strip()
+            if len(line) > 0 and not line.startswith("#"):
+                break
+            number_of_header_lines += 1
+            if line.startswith("#T") and "State" in line:
+                state_lambdas = ast.literal_eval(line.split(" = ")[-1])
+            elif line.startswith("#Steps"):
+                column_names = [free_energy_time_column_title] + [
+                    column_name
+                    for column_name in line.split()[1:]
+                    if column_name.startswith(free_energy_column_title_prefixes)
+                ]
+
+    if state_lambdas is None or column_names is None:
+        raise ValueError(
+            f"ERROR: The free energy file = {filename} does not have the "
+            "'#T ... State' and '#Steps' header lines."
+        )
+
+    return state_lambdas, column_names, number_of_header_lines
+
+
+def read_free_energy_file(
+    filename: str, dtype=np.float64
+) -> Tuple[tuple, List[str], np.ndarray]:
+    """Parse a GOMC free energy file's text.
+
+    The data is parsed directly into the float dtype (not inferred),
+    with pandas' C parser, like the Blk files (see src/utils/blk_cache.py
+    in the S8 and IRMOF-1 projects).
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    dtype : numpy.float64 or numpy.float32, optional, default=numpy.float64
+        The float dtype of the data.
+
+    Returns
+    -------
+    state_lambdas, column_names, data : tuple, list of str, numpy.ndarray
+        The lambda values of the sampled state, the column names, with '#Steps'
+        renamed to 'time', and the float data (rows=steps, columns=properties).
+    """
+    import pandas as pd
+
+    (
+        state_lambdas,
+        column_names,
+        number_of_header_lines,
+    ) = read_free_energy_file_header(filename)
+    data = pd.read_csv(
+        filename,
+        sep=r"\s+",
+        header=None,
+        skiprows=number_of_header_lines,
+        names=column_names,
+        dtype=dtype,
+        index_col=False,
+        engine="c",
+    )
+
+    return state_lambdas, column_names, data.to_numpy(dtype=dtype)
+
+
+def get_free_energy_column_indices(
+    filename: str, column_names: List[str]
+) -> Tuple[List[int], List[int], List[tuple]]:
+    """Get the column indices of the dH/dl and the DelE values, and the DelE
+    states' lambdas.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    column_names : list of str
+        The column names, from read_free_energy_file_header.
+
+    Returns
+    -------
+    dHdl_columns, u_nk_columns, u_nk_states : list of int, list of int, list of
+    tuple
+        The dU/dL columns (in free_energy_lambda_names order), the DelE columns,
+        and the lambda values of each DelE column's state.
+    """
+    dHdl_columns = [
+        column_i
+        for lambda_name in free_energy_lambda_names
+        for column_i, column_name in enumerate(column_names)
+        if lambda_name in column_name
+    ]
+    if len(dHdl_columns) != len(free_energy_lambda_names):
+        raise ValueError(
+            f"ERROR: The free energy file = {filename} does not have one dU/dL "
+            f"column for each of the lambdas = {free_energy_lambda_names}."
+        )
+
+    u_nk_columns = [
+        column_i
+        for column_i, column_name in enumerate(column_names)
+        if "DelE" in column_name
+    ]
+    u_nk_states = [
+        ast.literal_eval(column_names[column_i].split("->")[1][:-1])
+        for column_i in u_nk_columns
+    ]
+
+    return dHdl_columns, u_nk_columns, u_nk_states
+
+
+def get_free_energy_window_data(
+    filename: str, beta: float
+) -> Tuple[tuple, List[tuple], np.ndarray]:
+    """Parse a GOMC free energy file once, and get its times, dH/dl, and reduced
+    potentials.
+
+    These are the values of alchemlyb's GOMC parser (extract_dHdl and
+    extract_u_nk), where the reduced potential of each state (k) is beta *
+    (DelE_k + PV + Total_En).
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    beta : float
+        1 / (k_b * T), in mol/kJ.
+
+    Returns
+    -------
+    state_lambdas, u_nk_states, window_data : tuple, list of tuple,
+    numpy.ndarray
+        The lambda values of the sampled state, and of the reduced potentials'
+        states, and the window's data (rows=steps), which is stored column by
+        column (Fortran order),
+        with the columns: the time (steps), the dimensionless dH/dl
+        (free_energy_lambda_names), and the reduced potentials (u_nk_states).
+    """
+    state_lambdas, column_names, data = read_free_energy_file(filename)
+    dHdl_columns, u_nk_columns, u_nk_states = get_free_energy_column_indices(
+        filename, column_names
+    )
+
+    number_of_lambdas = len(free_energy_lambda_names)
+    window_data = np.empty(
+        (1 + number_of_lambdas + len(u_nk_columns), len(data))
+    ).T
+    window_data[:, 0] = data[:, 0]
+    np.multiply(
+        beta,
+        data[:, dHdl_columns],
+        out=window_data[:, 1 : 1 + number_of_lambdas],
+    )
+
+    # u_k = beta * DelE_k + beta * PV + beta * Total_En, summed in alchemlyb's
+    # order
+    u_nk = window_data[:, 1 + number_of_lambdas :]
+    np.multiply(beta, data[:, u_nk_columns], out=u_nk)
+    for column_title_prefix in ["PV", "Total_En"]:
+        matching_columns = [
+            column_i
+            for column_i, column_name in enumerate(column_names)
+            if column_title_prefix in column_name
+        ]
+        if len(matching_columns) > 0:
+            u_nk += (beta * data[:, matching_columns[0]])[:, np.newaxis]
+
+    return state_lambdas, u_nk_states, window_data
+
+
+def get_free_energy_cache_filenames(filename: str) -> Tuple[str, str]:
+    """Get the cache data and meta data file names for a free energy file.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+
+    Returns
+    -------
+    cache_data_filename, cache_meta_filename : str, str
+        The cache's .npy data file and .json meta data file names.
+    """
+    return (
+        f"{filename}{free_energy_cache_data_extension}",
+        f"{filename}{free_energy_cache_meta_extension}",
+    )
+
+
+def get_free_energy_source_key(filename: str, temperature: float) -> dict:
+    """Get the free energy file's size and mtime, and the temperature, which the
+    cache is keyed on.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    temperature : float
+        The temperature of the reduced values, in K.
+
+    Returns
+    -------
+    dict, {"version": int, "size": int, "mtime_ns": int, "temperature": float}
+        The cache version, the free energy file's size and mtime, and the
+        temperature.
+    """
+    file_stat = os.stat(filename)
+
+    return {
+        "version": free_energy_cache_version,
+        "size": file_stat.st_size,
+        "mtime_ns": file_stat.st_mtime_ns,
+        "temperature": temperature,
+    }
+
+
+def write_free_energy_cache(
+    filename: str, temperature: float, mmap_mode: Optional[str] = "r"
+) -> Tuple[tuple, List[tuple], np.ndarray]:
+    """Parse a free energy file and write its cache.
+
+    The data file is written before the meta data file, and both are
+    written atomically, so a partially written cache is never loaded.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    temperature : float
+        The temperature, in K.
+    mmap_mode : str or None, optional, default="r"
+        The numpy.load memory-map mode of the returned data, once the cache is
+        written.  If None, or the cache can not be written, the parsed data is
+        returned.
+
+    Returns
+    -------
+    state_lambdas, u_nk_states, window_data : tuple, list of tuple,
+    numpy.ndarray
+        The window's values, from get_free_energy_window_data.
+    """
+    from alchemlyb.postprocessors.units import R_kJmol
+
+    source_key = get_free_energy_source_key(filename, temperature)
+    state_lambdas, u_nk_states, window_data = get_free_energy_window_data(
+        filename, 1 / (R_kJmol * temperature)
+    )
+
+    cache_data_filename, cache_meta_filename = get_free_energy_cache_filenames(
+        filename
+    )
+    try:
+        tmp_cache_data_filename = f"{cache_data_filename}.{os.getpid()}.npy"
+        np.save(tmp_cache_data_filename, window_data)
+        os.replace(tmp_cache_data_filename, cache_data_filename)
+
+        tmp_cache_meta_filename = f"{cache_meta_filename}.{os.getpid()}"
+        with open(tmp_cache_meta_filename, "w") as fp:
+            json.dump(
+                {
+                    "source": source_key,
+                    "state_lambdas": state_lambdas,
+                    "u_nk_states": u_nk_states,
+                },
+                fp,
+            )
+        os.replace(tmp_cache_meta_filename, cache_meta_filename)
+    except OSError:
+        # the cache is optional (i.e., a read-only job directory)
+        return state_lambdas, u_nk_states, window_data
+
+    # the parsed data is released, and the written cache is memory-mapped in its
+    # place
+    if mmap_mode is not None:
+        window_data = np.load(cache_data_filename, mmap_mode=mmap_mode)
+
+    return state_lambdas, u_nk_states, window_data
+
+
+def load_free_energy_window(
+    filename: str, temperature: float, mmap_mode: Optional[str] = "r"
+) -> Tuple[tuple, List[tuple], np.ndarray]:
+    """Load a free energy file's window from its cache, which is written if it
+    is missing or out of date.
+
+    The cache is only used if the free energy file has the same size and mtime,
+    and the temperature is the same, as when the cache was written, so the text
+    is only parsed once, and the estimators can be rerun without parsing it.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    temperature : float
+        The temperature, in K.
+    mmap_mode : str or None, optional, default="r"
+        The numpy.load memory-map mode for the cached data.
+        If None, the cached data is read into memory.
+
+    Returns
+    -------
+    state_lambdas, u_nk_states, window_data : tuple, list of tuple,
+    numpy.ndarray
+        The lambda values of the sampled state, and of the reduced potentials'
+        states, and the window's data (rows=steps), with the columns: the time
+        (steps), the dimensionless dH/dl (free_energy_lambda_names), and the
+        reduced potentials (u_nk_states).
+    """
+    cache_data_filename, cache_meta_filename = get_free_energy_cache_filenames(
+        filename
+    )
+    try:
+        with open(cache_meta_filename, "r") as fp:
+            cache_meta = json.load(fp)
+        if cache_meta["source"] == get_free_energy_source_key(
+            filename, temperature
+        ):
+            return (
+                tuple(cache_meta["state_lambdas"]),
+                [tuple(u_nk_state) for u_nk_state in cache_meta["u_nk_states"]],
+                np.load(cache_data_filename, mmap_mode=mmap_mode),
+            )
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return write_free_energy_cache(filename, temperature, mmap_mode=mmap_mode)
+
+
+def clear_free_energy_cache(filename: str) -> None:
+    """Remove a free energy file's cache, if it exists.
+
+    Parameters
+    ----------
+    filename : str
+        The free energy file name, including the path.
+    """
+    for cache_filename in get_free_energy_cache_filenames(filename):
+        if os.path.isfile(cache_filename):
+            os.remove(cache_filename)
+
+
+def get_subsampled_indices(
+    number_of_samples: int, g: float, conservative: bool = False
+) -> np.ndarray:
+    """Get the indices of the uncorrelated samples, subsampled by the
+    statistical inefficiency.
+
+    These are the same indices as pymbar's timeseries.subsampleCorrelatedData,
+    which are every g samples, rounded to the nearest sample, without repeats,
+    or every ceil(g) samples if conservative.
+
+    Parameters
+    ----------
+    number_of_samples : int
+        The number of (correlated) samples.
+    g : float
+        The statistical inefficiency (1 or greater).
+    conservative : bool, optional, default=False
+        Use a uniform interval of ceil(g) samples.
+
+    Returns
+    -------
+    numpy.ndarray
+        The indices of the uncorrelated samples.
+    """
+    g = max(float(g), 1.0)
+    if conservative:
+        return np.arange(0, number_of_samples, int(np.ceil(g)), dtype=np.int64)
+
+    indices = np.rint(
+        np.arange(int(np.ceil(number_of_samples / g)) + 1) * g
+    ).astype(np.int64)
+
+    return np.unique(indices[indices < number_of_samples])
+
+
+def get_free_energy_windows_subsampling(
+    windows_series: Sequence[np.ndarray], subsample_method: str
+) -> Tuple[List[np.ndarray], List[dict]]:
+    """Get each lambda window's uncorrelated samples, from its total dH/dl
+    series.
+
+    The windows are subsampled like alchemlyb's equilibrium_detection (with
+    remove_burnin) or statistical_inefficiency (conservative) on each window's
+    series, but all the windows with the same number of samples are detected
+    together, in the same vectorized passes (see detect_equilibration_batch and
+    get_suffix_statistical_inefficiencies in 'src/analysis/equilibration.py').
+
+    Parameters
+    ----------
+    windows_series : sequence of numpy.ndarray
+        Each window's series (i.e., its total dH/dl).
+    subsample_method : str
+        The subsample method, in free_energy_subsample_methods.
+
+    Returns
+    -------
+    windows_rows, windows_subsampling : list of numpy.ndarray, list of dict
+        Each window's subsampled rows, and its start of the equilibrated data
+        ('t0'), statistical inefficiency ('g'), and number of uncorrelated
+        samples ('Neff').
+    """
+    # the analysis packages are imported when used, like pandas in the
+    # operations
+    from src.analysis.equilibration import (
+        detect_equilibration_batch,
+        get_suffix_statistical_inefficiencies,
+    )
+
+    if subsample_method not in free_energy_subsample_methods:
+        raise ValueError(
+            f"ERROR: The subsample method = {subsample_method} is not one of"
+            f" the available methods = {free_energy_subsample_methods}."
+        )
+
+    windows_rows = [None] * len(windows_series)
+    windows_subsampling = [None] * len(windows_series)
+    for number_of_samples in sorted(
+        set(len(series) for series in windows_series)
+    ):
+        window_indices = [
+            window_i
+            for window_i, series in enumerate(windows_series)
+            if len(series) == number_of_samples
+        ]
+        series_kt = np.stack(
+            [windows_series[window_i] for window_i in window_indices]
+        )
+
+        if number_of_samples < 2:
+            # there are too few samples to detect the correlation
+            t0_k = np.zeros(len(window_indices), dtype=np.int64)
+            g_k = np.ones(len(window_indices))
+            Neff_k = np.full(len(window_indices), float(number_of_samples))
+        elif subsample_method == "equilibrium_detection":
+            [t0_k, g_k, Neff_k] = detect_equilibration_batch(series_kt)
+        else:
+            t0_k = np.zeros(len(window_indices), dtype=np.int64)
+            g_k = get_suffix_statistical_inefficiencies(
+                series_kt, [0], fast=False
+            )[:, 0]
+            Neff_k = number_of_samples / g_k
+
+        for window_i, t0, g, Neff in zip(window_indices, t0_k, g_k, Neff_k):
+            windows_rows[window_i] = int(t0) + get_subsampled_indices(
+                number_of_samples - int(t0),
+                g,
+                conservative=subsample_method == "statistical_inefficiency",
+            )
+            windows_subsampling[window_i] = {
+                "t0": int(t0),
+                "g": float(g),
+                "Neff": float(Neff),
+            }
+
+    return windows_rows, windows_subsampling
+
+
+def _get_windows_dataframes(
+    windows: Sequence[tuple], temperature: float, windows_rows: Sequence
+):
+    """Get the dH/dl and u_nk DataFrames from the loaded windows' rows (None for
+    all the rows).
+    """
+    import pandas as pd
+
+    number_of_lambdas = len(free_energy_lambda_names)
+    u_nk_states = windows[0][1]
+    windows_number_of_rows = [
+        len(window_data) if rows is None else len(rows)
+        for (_, _, window_data), rows in zip(windows, windows_rows)
+    ]
+    row_starts = np.concatenate(
+        [[0], np.cumsum(windows_number_of_rows)]
+    ).astype(np.int64)
+    time_n = np.empty(row_starts[-1])
+    lambdas_ln = np.empty((number_of_lambdas, row_starts[-1]))
+    # the arrays are column-major, like the blocks of the concatenated frames,
+    # so the estimators' sums are in the same order and the free energies are
+    # bit-for-bit the same
+    dHdl_nl = np.empty((number_of_lambdas, row_starts[-1])).T
+    u_nk = np.empty((len(u_nk_states), row_starts[-1])).T
+    for (state_lambdas, _, window_data), rows, row_start, row_end in zip(
+        windows, windows_rows, row_starts[:-1], row_starts[1:]
+    ):
+        if rows is not None:
+            window_data = window_data[rows]
+        time_n[row_start:row_end] = window_data[:, 0]
+        dHdl_nl[row_start:row_end] = window_data[:, 1 : 1 + number_of_lambdas]
+        u_nk[row_start:row_end] = window_data[:, 1 + number_of_lambdas :]
+        for lambda_i in range(number_of_lambdas):
+            lambdas_ln[lambda_i, row_start:row_end] = state_lambdas[lambda_i]
+
+    index = pd.MultiIndex.from_arrays(
+        [pd.Index(time_n, dtype="Float64"), *lambdas_ln],
+        names=[free_energy_time_column_title]
+        + [f"{lambda_name}-lambda" for lambda_name in free_energy_lambda_names],
+    )
+    del time_n, lambdas_ln
+
+    dHdl = pd.DataFrame(
+        dHdl_nl, index=index, columns=free_energy_lambda_names, copy=False
+    )
+    dHdl.name = "dH/dl"
+    u_nk = pd.DataFrame(u_nk, index=index, columns=u_nk_states, copy=False)
+    u_nk.name = "u_nk"
+    for dataframe in [dHdl, u_nk]:
+        dataframe.attrs["temperature"] = temperature
+        dataframe.attrs["energy_unit"] = "kT"
+
+    return dHdl, u_nk
+
+
+def _load_free_energy_windows(
+    free_energy_filenames: Sequence[str], temperature: float
+) -> List[tuple]:
+    """Load the lambda windows from their caches, and check they have the same
+    DelE states.
+    """
+    windows = [
+        load_free_energy_window(filename, temperature)
+        for filename in free_energy_filenames
+    ]
+    u_nk_states = windows[0][1]
+    for filename, (_, file_u_nk_states, _) in zip(
+        free_energy_filenames, windows
+    ):
+        if file_u_nk_states != u_nk_states:
+            raise ValueError(
+                f"ERROR: The free energy file = {filename} does not have the"
+                f" same DelE states = {file_u_nk_states} as the other files'"
+                f" states = {u_nk_states}."
+            )
+
+    return windows
+
+
+def get_free_energy_dataframes(
+    free_energy_filenames: Sequence[str], temperature: float
+):
+    """Get the dH/dl and reduced potential (u_nk) DataFrames of all the lambda
+    windows.
+
+    Each free energy file is parsed once, for both the dH/dl (TI) and the
+    reduced potentials (MBAR and BAR), into a binary cache next to the file, and
+    the windows are memory-mapped from their caches (see
+    load_free_energy_window), so the text is not parsed again when the
+    estimators are rerun.  The windows' values are copied into a single array
+    for each DataFrame, so the DataFrames are the same as the concatenated
+    (pd.concat) frames of alchemlyb's extract_dHdl and extract_u_nk for each
+    file.
+
+    Parameters
+    ----------
+    free_energy_filenames : sequence of str
+        The GOMC free energy file names for each lambda window, including the
+        paths.
+    temperature : float
+        The temperature, in K.
+
+    Returns
+    -------
+    dHdl, u_nk : pandas.DataFrame, pandas.DataFrame
+        The dimensionless dH/dl and reduced potentials, with alchemlyb's
+        (time, Coulomb-lambda, VDW-lambda) index and attrs.
+    """
+    windows = _load_free_energy_windows(free_energy_filenames, temperature)
+
+    return _get_windows_dataframes(windows, temperature, [None] * len(windows))
+
+
+def get_subsampled_free_energy_dataframes(
+    free_energy_filenames: Sequence[str],
+    temperature: float,
+    subsample_method: str,
+):
+    """Get the dH/dl and reduced potential (u_nk) DataFrames of each lambda
+    window's uncorrelated samples.
+
+    Each window's samples are subsampled from its total dH/dl (see
+    get_free_energy_windows_subsampling), and the same samples are used for the
+    dH/dl (TI) and the reduced potentials (MBAR and BAR), so the DataFrames are
+    the same as the concatenated frames of alchemlyb's equilibrium_detection
+    (or statistical_inefficiency) of each window's extract_dHdl and extract_u_nk
+    frames, with the series dHdl.sum(axis=1).  Only the subsampled rows are
+    copied from the windows' caches.
+
+    Parameters
+    ----------
+    free_energy_filenames : sequence of str
+        The GOMC free energy file names for each lambda window, including the
+        paths.
+    temperature : float
+        The temperature, in K.
+    subsample_method : str
+        The subsample method, in free_energy_subsample_methods.
+
+    Returns
+    -------
+    dHdl, u_nk, windows_subsampling : pandas.DataFrame, pandas.DataFrame, list
+    of dict
+        The dimensionless dH/dl and reduced potentials of the uncorrelated
+        samples, with alchemlyb's (time, Coulomb-lambda, VDW-lambda) index and
+        attrs, and each window's first equilibrated step ('t0_step'),
+        statistical inefficiency ('g'), number of uncorrelated samples ('Neff'),
+        and number of samples before and after the subsampling
+        ('number_of_samples', 'number_of_subsamples').
+    """
+    windows = _load_free_energy_windows(free_energy_filenames, temperature)
+
+    number_of_lambdas = len(free_energy_lambda_names)
+    windows_series = [
+        window_data[:, 1 : 1 + number_of_lambdas].sum(axis=1)
+        for _, _, window_data in windows
+    ]
+    windows_rows, windows_subsampling = get_free_energy_windows_subsampling(
+        windows_series, subsample_method
+    )
+    for (_, _, window_data), rows, window_subsampling in zip(
+        windows, windows_rows, windows_subsampling
+    ):
+        t0 = window_subsampling.pop("t0")
+        window_subsampling["t0_step"] = (
+            int(window_data[t0, 0]) if len(window_data) > 0 else None
+        )
+        window_subsampling["number_of_samples"] = len(window_data)
+        window_subsampling["number_of_subsamples"] = len(rows)
+
+    dHdl, u_nk = _get_windows_dataframes(windows, temperature, windows_rows)
+
+    return dHdl, u_nk, windows_subsampling
@@ -0,0 +1,217 @@
+"""Diagnose the overlap and variance of the lambda windows, and refine the
+lambda schedule.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+from src.utils.free_energy_files import (
+    get_free_energy_dataframes,
+    get_subsampled_free_energy_dataframes,
+)
+
+
+def get_neighbour_overlaps(overlap_matrix) -> List[float]:
+    """Get the overlap of each pair of neighbouring lambda windows from the MBAR
+    overlap matrix.
+
+    The overlap matrix is not symmetric when the windows have different numbers
+    of samples, so the smaller of the two overlaps (O[i, i + 1] and O[i + 1, i])
+    is used.
+
+    Parameters
+    ----------
+    overlap_matrix : numpy.ndarray, shape=(K, K)
+        The MBAR overlap matrix of the K lambda windows, in order of their
+        lambdas, where each row sums to 1.
+
+    Returns
+    -------
+    list of float
+        The K - 1 overlaps of the neighbouring windows, from 0 (no overlap) to
+        0.5.
+    """
+    overlap_matrix = np.asarray(overlap_matrix)
+
+    return [
+        float(min(overlap_matrix[i, i + 1], overlap_matrix[i + 1, i]))
+        for i in range(len(overlap_matrix) - 1)
+    ]
+
+
+def get_window_variance_contributions(dHdl) -> List[float]:
+    """Get each lambda window's contribution to the variance of the TI free
+    energy.
+
+    The TI free energy is the trapezoid sum of the windows' mean dH/dl, so each
+    window's contribution is its trapezoid weight squared, times the squared
+    standard error of its mean dH/dl, summed over the lambda components, like
+    alchemlyb's TI uncertainty.
+
+    Parameters
+    ----------
+    dHdl : pandas.DataFrame
+        The dH/dl of all the lambda windows (in kT), indexed by the time and the
+        lambdas.
+
+    Returns
+    -------
+    list of float
+        The variance contribution of each window (in kT^2), in order of their
+        lambdas, which sum to the variance of the TI free energy.
+    """
+    variances = np.square(dHdl.groupby(level=dHdl.index.names[1:]).sem())
+    lambdas = variances.index.to_frame().values
+    delta_lambdas = np.diff(lambdas, axis=0)
+    no_delta_lambda = np.zeros((1, lambdas.shape[1]))
+
+    weights = (
+        np.vstack([no_delta_lambda, delta_lambdas])
+        + np.vstack([delta_lambdas, no_delta_lambda])
+    ) / 2
+
+    return [
+        float(variance)
+        for variance in (np.square(weights) * variances.values).sum(axis=1)
+    ]
+
+
+def get_lambda_window_diagnostics(mbar, dHdl) -> dict:
+    """Get the overlap and variance diagnostics of the lambda windows.
+
+    Parameters
+    ----------
+    mbar : alchemlyb.estimators.MBAR
+        The MBAR estimator, fit to the lambda windows' u_nk.
+    dHdl : pandas.DataFrame
+        The dH/dl of the same lambda windows (in kT), indexed by the time and
+        the lambdas.
+
+    Returns
+    -------
+    dict
+        The 'neighbour_overlaps' of each pair of neighbouring windows, the
+        variance of the MBAR free energy difference of each pair of neighbouring
+        windows ('neighbour_variances', in kT^2), and the fraction of the TI
+        variance from each window ('window_variance_fractions'), in order of the
+        windows' lambdas.
+    """
+    d_delta_f = mbar.d_delta_f_.values
+    window_variance_contributions = get_window_variance_contributions(dHdl)
+    ti_variance = sum(window_variance_contributions)
+
+    return {
+        "neighbour_overlaps": get_neighbour_overlaps(mbar.overlap_matrix),
+        "neighbour_variances": [
+            float(d_delta_f[i, i + 1] ** 2) for i in range(len(d_delta_f) - 1)
+        ],
+        "window_variance_fractions": [
+            variance_contribution / ti_variance if ti_variance > 0 else 0.0
+            for variance_contribution in window_variance_contributions
+        ],
+    }
+
+
+def get_free_energy_files_lambda_window_diagnostics(
+    free_energy_filenames: Sequence[str],
+    temperature: float,
+    subsample_method: str = None,
+) -> dict:
+    """Get the overlap and variance diagnostics of the lambda windows from their
+    free energy files.
+
+    Parameters
+    ----------
+    free_energy_filenames : list of str
+        The GOMC free energy file names for each lambda window, including the
+        paths, in order of the windows' lambdas.
+    temperature : float
+        The temperature, in K.
+    subsample_method : str or None, optional, default=None
+        The method which subsamples each lambda window's uncorrelated samples
+        (see 'free_energy_subsample_methods'), or None to use all the samples.
+
+    Returns
+    -------
+    dict
+        The diagnostics, see 'get_lambda_window_diagnostics'.
+    """
+    from alchemlyb.estimators import MBAR
+
+    if subsample_method is None:
+        dHdl, u_nk = get_free_energy_dataframes(
+            free_energy_filenames, temperature
+        )
+    else:
+        dHdl, u_nk, _ = get_subsampled_free_energy_dataframes(
+            free_energy_filenames, temperature, subsample_method
+        )
+
+    return get_lambda_window_diagnostics(MBAR().fit(u_nk), dHdl)
+
+
+def get_refined_lambdas(
+    lambdas: Sequence[float],
+    neighbour_overlaps: Sequence[float],
+    neighbour_variances: Sequence[float],
+    minimum_overlap: float,
+    maximum_number_of_windows: int,
+) -> List[float]:
+    """Get the lambda schedule with a new window between each pair of
+    neighbouring windows with a low overlap.
+
+    The new window is at the midpoint of the neighbouring windows' lambdas.  If
+    there are more pairs with a low overlap than the maximum number of windows
+    allows, the pairs with the largest variances of their free energy
+    differences are refined first.
+
+    Parameters
+    ----------
+    lambdas : list of float
+        The lambdas of the windows, in ascending order.
+    neighbour_overlaps : list of float
+        The overlap of each pair of neighbouring windows, see
+        'get_neighbour_overlaps'.
+    neighbour_variances : list of float
+        The variance of the free energy difference of each pair of neighbouring
+        windows.
+    minimum_overlap : float
+        The pairs of neighbouring windows with an overlap below this are
+        refined.
+    maximum_number_of_windows : int
+        The maximum number of windows in the refined schedule.
+
+    Returns
+    -------
+    list of float
+        The refined lambdas, in ascending order, which are the same lambdas if
+        no pair is refined.
+    """
+    if (
+        len(neighbour_overlaps) != len(lambdas) - 1
+        or len(neighbour_variances) != len(lambdas) - 1
+    ):
+        raise ValueError(
+            "ERROR: The number of neighbour overlaps and variances must be one"
+            " less than the number of lambdas."
+        )
+
+    low_overlap_pairs = sorted(
+        [
+            i
+            for i, neighbour_overlap in enumerate(neighbour_overlaps)
+            if neighbour_overlap < minimum_overlap
+        ],
+        key=lambda i: neighbour_variances[i],
+        reverse=True,
+    )
+    refined_pairs = low_overlap_pairs[
+        : max(maximum_number_of_windows - len(lambdas), 0)
+    ]
+
+    refined_lambdas = list(lambdas) + [
+        float(np.round((lambdas[i] + lambdas[i + 1]) / 2, decimals=8))
+        for i in refined_pairs
+    ]
+
+    return sorted(refined_lambdas)